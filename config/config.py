@@ -1,13 +1,235 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
 import yaml
-import sys
 
-def load_config(config_file='configuration.yml'):
-    """加载配置文件"""
+log = logging.getLogger(__name__)
+
+# 指定配置文件路径的环境变量，未设置时读取当前目录下的configuration.yml
+CONFIG_ENV = 'PK9019_CONFIG'
+DEFAULT_CONFIG_FILE = 'configuration.yml'
+
+# device节中各项的内置默认值，类型也由默认值确定；Tango数据库中没有设置的设备属性依次取
+# configuration.yml的device节和这里的默认值
+DEVICE_DEFAULTS: Dict[str, Any] = {
+    'host': '',
+    'port': 502,
+    'slave_address': 1,
+    'temp_humidity_host': '',
+    'temp_humidity_port': 502,
+    'temp_humidity_slave_address': 1,
+    'poll_interval': 1.0,
+    'poll_deadline': 2.0,
+    'engine': 'thread',
+    'framing': 'rtu',
+    'process_workers': 0,
+    'bus_baudrate': 9600,
+    'bus_policy': 'round_robin',
+    'bus_priority': 0,
+    'bus_response_timeout': 0.5,
+    'stale_timeout': 5.0,
+    'invalid_timeout': 30.0,
+    'poll_adaptive': False,
+    'poll_min_interval': 0.1,
+    'poll_max_interval': 10.0,
+    'poll_change_threshold': 0.2,
+    'history_size': 36000,
+    'history_window': 600,
+    'store_path': '',
+    'metrics_port': 0,
+    'metrics_host': '127.0.0.1',
+    'capture_path': '',
+    'profile_path': '',
+    'device_group': '',
+}
+
+# 取值有限的项
+DEVICE_CHOICES: Dict[str, tuple] = {
+    'engine': ('thread', 'async', 'bus', 'process'),
+    'framing': ('rtu', 'mbap', 'auto', 'serial'),
+    'bus_policy': ('round_robin', 'priority'),
+}
+
+# 顶层各节的类型
+SECTIONS: Dict[str, type] = {
+    'tango': dict,
+    'device': dict,
+    'devices': list,
+    'logging': dict,
+    'events': dict,
+    'alarms': dict,
+}
+
+
+class ConfigError(Exception):
+    """配置文件不存在、无法解析或不符合格式"""
+
+
+def _check_value(key: str, value: Any, errors: List[str], where: str):
+    # 按内置默认值的类型检查一项；整数可用于浮点项，布尔值不能当作数值
+    expected = type(DEVICE_DEFAULTS[key])
+    if expected is float:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif expected is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, expected)
+    if not valid:
+        errors.append(f"{where}.{key} 应为{expected.__name__}，实际为 {value!r}")
+    elif key in DEVICE_CHOICES and value not in DEVICE_CHOICES[key]:
+        errors.append(f"{where}.{key} 应为 {', '.join(DEVICE_CHOICES[key])} 之一，实际为 {value!r}")
+
+
+def validate_config(data: Any) -> List[str]:
+    """
+    检查配置内容
+
+    Args:
+        data: yaml解析得到的配置
+
+    Returns:
+        List[str]: 错误说明，为空表示通过
+    """
+    if data is None:
+        return []
+    if not isinstance(data, dict):
+        return [f"配置文件顶层应为映射，实际为 {type(data).__name__}"]
+    errors = []
+    for name, expected in SECTIONS.items():
+        section = data.get(name)
+        if section is not None and not isinstance(section, expected):
+            errors.append(f"{name} 应为{'映射' if expected is dict else '列表'}")
+    if errors:
+        return errors
+
+    tango = data.get('tango') or {}
+    for key in ('server_name', 'instance_name'):
+        if key in tango and not isinstance(tango[key], str):
+            errors.append(f"tango.{key} 应为str，实际为 {tango[key]!r}")
+
+    device = data.get('device') or {}
+    for key, value in device.items():
+        if key in DEVICE_DEFAULTS:
+            _check_value(key, value, errors, 'device')
+        else:
+            log.warning("配置 device 中有未知的项: %s", key)
+
+    for index, entry in enumerate(data.get('devices') or []):
+        where = f"devices[{index}]"
+        if not isinstance(entry, dict) or not isinstance(entry.get('name'), str):
+            errors.append(f"{where} 应为带name的映射")
+            continue
+        for key, value in entry.items():
+            if key in DEVICE_DEFAULTS:
+                _check_value(key, value, errors, where)
+            elif key in ('events', 'alarms') and not isinstance(value, dict):
+                errors.append(f"{where}.{key} 应为映射")
+    return errors
+
+
+class Config:
+    """
+    已校验的配置
+
+    device节按DEVICE_DEFAULTS补全默认值并按类型访问；其他节保持yaml中的原样，
+    也可以像字典一样用config['logging']、config.get('events')访问。
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, path: str = ''):
+        self.path = path
+        self.data: Dict[str, Any] = data or {}
+
+    def __getitem__(self, name: str) -> Any:
+        return self.data[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """顶层某一节，不存在时为default"""
+        value = self.data.get(name)
+        return default if value is None else value
+
+    def device(self, key: str) -> Any:
+        """
+        device节中的一项，未配置时为内置默认值
+
+        Args:
+            key: DEVICE_DEFAULTS中的项
+
+        Returns:
+            Any: 按默认值类型转换后的值
+        """
+        default = DEVICE_DEFAULTS[key]
+        value = (self.data.get('device') or {}).get(key)
+        return default if value is None else type(default)(value)
+
+    @property
+    def devices(self) -> List[Dict[str, Any]]:
+        """设备列表"""
+        return self.data.get('devices') or []
+
+    @property
+    def server_name(self) -> str:
+        return (self.data.get('tango') or {}).get('server_name', 'PK9019')
+
+    @property
+    def instance_name(self) -> str:
+        return (self.data.get('tango') or {}).get('instance_name', 'LACT')
+
+
+def config_path(path: Optional[str] = None) -> str:
+    """配置文件路径: 参数、环境变量PK9019_CONFIG、当前目录下的configuration.yml，依次取第一个"""
+    return path or os.environ.get(CONFIG_ENV) or DEFAULT_CONFIG_FILE
+
+
+def load_config(path: Optional[str] = None) -> Config:
+    """
+    读取并校验配置文件，不缓存
+
+    Args:
+        path: 配置文件路径，默认见config_path
+
+    Returns:
+        Config: 已校验的配置
+    """
+    path = config_path(path)
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    except Exception as e:
-        print(f"加载配置文件失败: {str(e)}")
-        sys.exit(1)
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError(f"加载配置文件失败 {path}: {str(e)}") from e
+    errors = validate_config(data)
+    if errors:
+        raise ConfigError(f"配置文件 {path} 有误:\n  " + "\n  ".join(errors))
+    return Config(data, path)
+
+
+_config: Optional[Config] = None
+_config_lock = threading.Lock()
+
+
+def get_config(path: Optional[str] = None) -> Config:
+    """
+    获取进程内共享的配置，第一次调用时读取，之后返回缓存
+
+    Args:
+        path: 配置文件路径，只在第一次调用时生效
+
+    Returns:
+        Config: 已校验的配置
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_config(path)
+        return _config
+
 
-config = load_config()
\ No newline at end of file
+def set_config(config: Optional[Config]):
+    """替换进程内共享的配置，None表示下次get_config时重新读取；用于测试或重新加载"""
+    global _config
+    with _config_lock:
+        _config = config
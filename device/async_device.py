@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+from pymodbus.exceptions import ModbusException
+
+from device.capture import DISCONNECT, REQUEST, RESPONSE, TIMEOUT, get_capture
+from device.connection import ConnectionState
+from device.exceptions import ExceptionResponse, FrameTimeoutError, TransportConnectionError, TransportError
+from device.metrics import get_registry
+from device.pk9019 import SNAPSHOT_POINTS, PK9019Snapshot, decode_snapshot
+from device.register_plan import RegisterPoint, plan_reads
+from device.temp_humidity import TEMP_HUMIDITY_COUNT, TEMP_HUMIDITY_START, decode_temp_humidity
+from device.transport import HEADER_SIZE, check_frame, frame_length, pack_read_request, unpack_registers
+
+log = logging.getLogger(__name__)
+
+
+class AsyncRtuOverTcpTransport:
+    """
+    基于asyncio的RTU over TCP传输
+
+    帧格式和校验与RtuOverTcpTransport相同；同一连接上的请求由asyncio.Lock串行，
+    相同的并发请求共享一次传输。退避和断路器与同步传输共用ConnectionState:
+    断路器断开后在重试时间之前不再重连，请求立即失败；从机无响应只计入该从机的断路器。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0):
+        """
+        初始化传输
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号，默认502
+            timeout: 连接和单次收发的超时时间，单位秒
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connection = ConnectionState(host, port)
+
+        self.metrics = get_registry().gateway(host, port)
+
+        self._request = bytearray(8)
+        self._lock: Optional[asyncio.Lock] = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._ever_connected = False
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None
+
+    async def connect(self) -> bool:
+        """
+        建立TCP连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        if self.writer is not None:
+            return True
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            # 每次失败只记调试日志，断路器断开时由ConnectionState记录一次错误
+            log.debug(f"连接设备失败 {self.host}:{self.port}: {str(e)}")
+            self.reader = self.writer = None
+            return False
+        self.connection.mark_connected()
+        if self._ever_connected:
+            self.metrics.record_reconnect()
+        self._ever_connected = True
+        return True
+
+    async def ensure_connected(self):
+        """
+        确认连接可用，断开时按退避重连
+
+        重连时间由断路器的重试时间决定: 断路器断开且未到重试时间时抛出CircuitOpenError，
+        重连失败时抛出TransportConnectionError。
+        """
+        self.connection.check()
+        if self.writer is not None:
+            return
+        try:
+            connected = await self.connect()
+        except asyncio.CancelledError:
+            self.connection.cancel_trial()
+            raise
+        if not connected:
+            error = f"无法连接到设备: {self.host}:{self.port}"
+            self.connection.record_failure(error)
+            raise TransportConnectionError(error)
+
+    async def close(self):
+        """关闭TCP连接"""
+        writer, self.reader, self.writer = self.writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        """
+        功能码03读取连续的保持寄存器
+
+        Args:
+            slave_address: 从机地址
+            start: 起始寄存器地址
+            count: 寄存器数量
+
+        Returns:
+            Tuple[int, ...]: 寄存器值
+        """
+        key = (slave_address, 0x03, start, count)
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._read_holding_registers(slave_address, start, count)
+        except asyncio.CancelledError:
+            # 发起者被取消(如超过采集期限)，共享的等待者按普通的读取失败处理，不随之取消
+            future.set_exception(TransportError(
+                f"共享的请求被取消: {self.host}:{self.port}/{slave_address}"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        metrics = self.metrics.device(slave_address)
+        async with self._lock:
+            try:
+                await self.ensure_connected()
+                self.connection.check_slave(slave_address)
+            except TransportError as e:
+                metrics.observe(0.0, e)
+                raise
+
+            pack_read_request(self._request, slave_address, start, count)
+            started = time.perf_counter()
+            try:
+                frame = await self._exchange(slave_address)
+            except TransportError as e:
+                metrics.observe(time.perf_counter() - started, e)
+                raise
+            metrics.observe(time.perf_counter() - started)
+            return unpack_registers(frame, count)
+
+    async def _exchange(self, slave_address: int) -> bytes:
+        # 在连接锁内发送self._request并接收、校验响应帧
+        capture = get_capture()
+        try:
+            debug = log.isEnabledFor(logging.DEBUG)
+            if debug:
+                log.debug("发送请求: %s", self._request.hex())
+            self.writer.write(self._request)
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, REQUEST, self._request)
+            frame = await asyncio.wait_for(self._read_frame(), self.timeout)
+            if debug:
+                log.debug("收到响应: %s", frame.hex())
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, RESPONSE, frame)
+            check_frame(frame, slave_address, 0x03)
+        except asyncio.TimeoutError:
+            error = f"等待响应超时: {self.host}:{self.port}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, TIMEOUT)
+            # 迟到的响应会与下一帧错位，丢弃连接后立即重连；超时只计入该从机的断路器
+            await self.close()
+            self.connection.mark_timeout(slave_address, error)
+            raise FrameTimeoutError(error)
+        except asyncio.IncompleteReadError:
+            error = f"设备关闭了连接: {self.host}:{self.port}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, DISCONNECT, error.encode())
+            await self.close()
+            self.connection.record_failure(error)
+            raise TransportConnectionError(error)
+        except OSError as e:
+            error = f"设备通信中断 {self.host}:{self.port}: {str(e)}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, DISCONNECT, error.encode())
+            await self.close()
+            self.connection.record_failure(error)
+            raise TransportConnectionError(error)
+        except asyncio.CancelledError:
+            # 响应可能只收到一半，丢弃连接以免错位；没有结果的试探交给下一个请求
+            self._abort()
+            self.connection.cancel_trial()
+            raise
+        except ExceptionResponse:
+            self.connection.mark_success(slave_address)
+            raise
+        except TransportError as e:
+            # 帧同步已丢失，重新建立连接以丢弃残留字节
+            await self.close()
+            self.connection.record_failure(str(e))
+            raise
+        self.connection.mark_success(slave_address)
+        return frame
+
+    def _abort(self):
+        writer, self.reader, self.writer = self.writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def _read_frame(self) -> bytes:
+        header = await self.reader.readexactly(HEADER_SIZE)
+        return header + await self.reader.readexactly(frame_length(header) - HEADER_SIZE)
+
+
+class AsyncPK9019:
+    """PK9019热电偶温度采集模块的asyncio客户端"""
+
+    def __init__(self, host: str, port: int = 502, slave_address: int = 1, timeout: float = 10.0,
+                 transport: Optional[AsyncRtuOverTcpTransport] = None):
+        """
+        初始化PK9019设备，连接在第一次读取时建立
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号，默认502
+            slave_address: 从机地址，默认为1
+            timeout: 连接和单次收发的超时时间，单位秒
+            transport: 共享的传输，默认为本设备单独创建
+        """
+        self.host = host
+        self.port = port
+        self.slave_address = slave_address
+        self.transport = transport or AsyncRtuOverTcpTransport(host, port, timeout)
+
+    async def read_points(self, points: Iterable[RegisterPoint]) -> Dict[str, Sequence[int]]:
+        """
+        读取一组数据点，相邻的寄存器区间合并为一次请求
+
+        Args:
+            points: 需要读取的数据点
+
+        Returns:
+            Dict[str, Sequence[int]]: 数据点名称到其寄存器值的映射
+        """
+        values = {}
+        for block in plan_reads(points):
+            registers = await self.transport.read_holding_registers(self.slave_address, block.start, block.count)
+            values.update(block.extract(registers))
+        return values
+
+    async def read_snapshot(self) -> PK9019Snapshot:
+        """
+        一次请求读取环境温度和全部通道温度
+
+        Returns:
+            PK9019Snapshot: 环境温度和8个通道的温度值
+        """
+        try:
+            values = await self.read_points(SNAPSHOT_POINTS)
+        except ModbusException as e:
+            log.error("读取温度数据失败 %s:%s: %s", self.host, self.port, e)
+            raise
+        return decode_snapshot(values)
+
+    async def close(self):
+        """关闭设备连接"""
+        await self.transport.close()
+
+
+class AsyncTempHumidity:
+    """温湿度采集模块的asyncio客户端"""
+
+    def __init__(self, host: str, port: int = 502, slave_address: int = 1, timeout: float = 10.0,
+                 transport: Optional[AsyncRtuOverTcpTransport] = None):
+        """
+        初始化温湿度采集模块，连接在第一次读取时建立
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号，默认502
+            slave_address: 从机地址，默认为1
+            timeout: 连接和单次收发的超时时间，单位秒
+            transport: 共享的传输，默认为本设备单独创建
+        """
+        self.host = host
+        self.port = port
+        self.slave_address = slave_address
+        self.transport = transport or AsyncRtuOverTcpTransport(host, port, timeout)
+
+    async def get_temp_humidity(self) -> Tuple[float, float]:
+        """
+        获取温湿度
+
+        Returns:
+            Tuple[float, float]: 温湿度值
+        """
+        try:
+            data = await self.transport.read_holding_registers(
+                self.slave_address, TEMP_HUMIDITY_START, TEMP_HUMIDITY_COUNT)
+        except ModbusException as e:
+            log.error("读取温湿度失败 %s:%s: %s", self.host, self.port, e)
+            raise
+        return decode_temp_humidity(data)
+
+    async def close(self):
+        """关闭设备连接"""
+        await self.transport.close()
@@ -0,0 +1,205 @@
+import logging
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# 抓包文件头: 魔数、版本、开始抓包时的time.time()和time.monotonic()
+FILE_MAGIC = b'PKCAP'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<5sBdd')
+# 每条记录的头: time.monotonic()、网关编号、从机地址、记录类型、数据长度，之后是数据
+RECORD_HEADER = struct.Struct('<dHBBH')
+
+# 记录类型
+REQUEST = 0  # 发出的请求帧
+RESPONSE = 1  # 收到的响应帧(含CRC错误等校验失败的帧)
+TIMEOUT = 2  # 等待响应超时，无数据
+DISCONNECT = 3  # 通信中断或对端关闭连接，数据为错误信息
+GATEWAY = 4  # 定义网关编号，数据为"host:port"，从机地址为0
+KIND_NAMES = ('request', 'response', 'timeout', 'disconnect', 'gateway')
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    """抓包文件中的一条收发记录"""
+    monotonic: float
+    gateway: str  # "host:port"
+    slave_address: int
+    kind: int
+    data: bytes
+
+
+class CaptureWriter:
+    """
+    收发帧抓包
+
+    传输在收发时调用record把记录追加到内存缓冲区，只做一次struct打包和一次拷贝；
+    后台线程每flush_interval秒(或缓冲超过batch_size字节时)把缓冲区整批写入文件，
+    采集线程不做磁盘I/O。缓冲超过max_buffer字节时(磁盘跟不上)丢弃新记录并计数。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 64 * 1024,
+                 max_buffer: int = 16 * 1024 * 1024):
+        """
+        打开抓包文件并启动写入线程
+
+        Args:
+            path: 抓包文件路径，已存在时覆盖
+            flush_interval: 写入文件的最长间隔，单位秒
+            batch_size: 缓冲达到该字节数时立即写入
+            max_buffer: 缓冲的最大字节数，超过时丢弃新记录
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.records = 0
+        self.dropped = 0
+
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, time.time(), time.monotonic()))
+        self._buffer = bytearray()
+        self._gateways: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, host: str, port: int, slave_address: int, kind: int, data=b''):
+        """
+        追加一条记录，可在任意线程调用
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号
+            slave_address: 从机地址
+            kind: 记录类型(REQUEST、RESPONSE、TIMEOUT、DISCONNECT)
+            data: 帧数据，支持bytes/bytearray/memoryview
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            gateway = self._gateways.get((host, port))
+            if gateway is None:
+                gateway = len(self._gateways)
+                self._gateways[(host, port)] = gateway
+                name = f"{host}:{port}".encode()
+                self._buffer += RECORD_HEADER.pack(now, gateway, 0, GATEWAY, len(name))
+                self._buffer += name
+            self._buffer += RECORD_HEADER.pack(now, gateway, slave_address, kind, len(data))
+            self._buffer += data
+            self.records += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._flush_event.set()
+
+    def flush(self):
+        """把缓冲区写入文件"""
+        with self._lock:
+            batch, self._buffer = self._buffer, bytearray()
+        if batch:
+            self._file.write(batch)
+            self._file.flush()
+
+    def close(self):
+        """停止写入线程，写完缓冲区后关闭文件"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._flush_event.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+        if self.dropped:
+            log.warning("抓包缓冲区已满，丢弃了 %d 条记录: %s", self.dropped, self.path)
+
+    def _run(self):
+        while not self._closed:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                log.error("写入抓包文件失败 %s: %s", self.path, e)
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+    """
+    读取抓包文件
+
+    Args:
+        path: 抓包文件路径
+
+    Returns:
+        Iterator[CaptureRecord]: 按写入顺序的收发记录，不包括网关定义；末尾不完整的记录被忽略
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"不是抓包文件: {path}")
+    magic, version, _, _ = FILE_HEADER.unpack_from(data)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise ValueError(f"不是抓包文件或版本不支持: {path}")
+
+    gateways: Dict[int, str] = {}
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        monotonic, gateway, slave_address, kind, length = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        if offset + length > len(data):
+            break
+        payload = data[offset:offset + length]
+        offset += length
+        if kind == GATEWAY:
+            gateways[gateway] = payload.decode()
+            continue
+        yield CaptureRecord(monotonic, gateways.get(gateway, str(gateway)), slave_address, kind, payload)
+
+
+_writer: Optional[CaptureWriter] = None
+_writer_lock = threading.Lock()
+
+
+def start_capture(path: str, **settings) -> CaptureWriter:
+    """
+    开始进程内所有传输的抓包，已在抓包时先停止之前的
+
+    Args:
+        path: 抓包文件路径
+        settings: 传给CaptureWriter的参数
+
+    Returns:
+        CaptureWriter: 抓包写入器
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = CaptureWriter(path, **settings)
+        log.info("开始抓包: %s", path)
+        return _writer
+
+
+def stop_capture():
+    """停止抓包并关闭文件"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+        log.info("停止抓包: %s，共 %d 条记录", writer.path, writer.records)
+
+
+def get_capture() -> Optional[CaptureWriter]:
+    """当前的抓包写入器，未抓包时为None；传输每次收发时调用，不加锁"""
+    return _writer
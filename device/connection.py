@@ -0,0 +1,355 @@
+import logging
+import random
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+from device.exceptions import CircuitOpenError, SlaveUnavailableError, TransportConnectionError
+from device.metrics import get_registry
+
+log = logging.getLogger(__name__)
+
+# 断路器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def enable_keepalive(sock: socket.socket, idle: int = 10, interval: int = 5, count: int = 3):
+    """
+    开启TCP keepalive，用于发现半开连接
+
+    Args:
+        sock: TCP套接字
+        idle: 连接空闲多久后开始探测，单位秒
+        interval: 探测间隔，单位秒
+        count: 连续多少次探测失败后判定连接断开
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+    elif hasattr(socket, 'SIO_KEEPALIVE_VALS'):
+        # Windows
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+
+
+class CircuitBreaker:
+    """
+    断路器
+
+    连续失败达到阈值后断开(OPEN)，在重试时间之前的请求直接失败；
+    到达重试时间后放行一个试探请求(HALF_OPEN)，成功则恢复(CLOSED)，失败则重新断开；
+    试探请求没有发出时(如仍在重连)用cancel_trial退回OPEN，下一个请求继续试探。
+    """
+
+    def __init__(self, failure_threshold: int = 3):
+        """
+        初始化断路器
+
+        Args:
+            failure_threshold: 连续失败多少次后断开
+        """
+        self.failure_threshold = failure_threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """当前是否允许发送请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.retry_at:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def cancel_trial(self):
+        """放行的试探请求没有发出，退回OPEN，重试时间不变"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_failure(self, retry_after: float) -> bool:
+        """
+        记录一次失败
+
+        Args:
+            retry_after: 断开后多久允许试探，单位秒
+
+        Returns:
+            bool: 本次失败是否使断路器断开
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                opened = self.state != OPEN
+                self.state = OPEN
+                self.retry_at = time.monotonic() + retry_after
+                return opened
+            return False
+
+
+class ConnectionState:
+    """
+    连接的退避和断路器状态
+
+    同步的ConnectionManager和asyncio传输共用: 网关失败按指数退避(带随机抖动)计入断路器，
+    断开期间请求立即失败；从机无响应只计入该从机自己的断路器，不影响同一网关后的其他从机。
+    """
+
+    def __init__(self, host: str, port: int, backoff_initial: float = 0.5, backoff_max: float = 30.0,
+                 jitter: float = 0.2, failure_threshold: int = 3):
+        """
+        初始化连接状态
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号
+            backoff_initial: 首次重连等待时间，单位秒
+            backoff_max: 重连等待时间上限，单位秒
+            jitter: 重连等待时间的随机抖动比例
+            failure_threshold: 连续失败多少次后断路器断开
+        """
+        self.host = host
+        self.port = port
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.failure_threshold = failure_threshold
+        self.breaker = CircuitBreaker(failure_threshold)
+        # 各从机的超时断路器
+        self.slave_breakers: Dict[int, CircuitBreaker] = {}
+        self._backoff = backoff_initial
+
+    def check(self):
+        """网关的断路器断开且未到重试时间时直接失败"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"设备不可用，等待重试: {self.host}:{self.port}")
+
+    def check_slave(self, slave_address: int):
+        """从机的断路器断开且未到重试时间时直接失败"""
+        breaker = self.slave_breakers.get(slave_address)
+        if breaker is not None and not breaker.allow():
+            # 网关的试探请求不会发出
+            self.breaker.cancel_trial()
+            raise SlaveUnavailableError(f"从机无响应，等待重试: {self.host}:{self.port}/{slave_address}")
+
+    def mark_success(self, slave_address: Optional[int] = None):
+        """
+        记录一次成功的请求
+
+        Args:
+            slave_address: 响应的从机地址，同时恢复该从机的断路器
+        """
+        if self.breaker.state != CLOSED:
+            log.info(f"设备恢复: {self.host}:{self.port}")
+        self.breaker.record_success()
+        self._backoff = self.backoff_initial
+        breaker = self.slave_breakers.get(slave_address)
+        if breaker is not None and (breaker.failures or breaker.state != CLOSED):
+            if breaker.state != CLOSED:
+                log.info("从机恢复: %s:%s/%d", self.host, self.port, slave_address)
+            breaker.record_success()
+
+    def mark_timeout(self, slave_address: int, error: str):
+        """
+        记录一次从机超时
+
+        连接保持可用，只计入该从机的断路器，断开后按指数退避(带随机抖动)重试。
+
+        Args:
+            slave_address: 超时的从机地址
+            error: 错误信息
+        """
+        # 从机超时不能说明网关是否恢复，网关的试探交给下一个请求
+        self.breaker.cancel_trial()
+        breaker = self.slave_breakers.get(slave_address)
+        if breaker is None:
+            breaker = self.slave_breakers.setdefault(slave_address, CircuitBreaker(self.failure_threshold))
+        exponent = min(max(breaker.failures + 1 - self.failure_threshold, 0), 16)
+        delay = min(self.backoff_initial * 2 ** exponent, self.backoff_max)
+        if breaker.record_failure(delay * (1 + random.uniform(-self.jitter, self.jitter))):
+            log.error("从机不可用 %s:%s/%d: %s", self.host, self.port, slave_address, error)
+
+    def cancel_trial(self):
+        """已取得的试探机会没有用于发送请求(正在重连、从机断开或请求被取消)"""
+        self.breaker.cancel_trial()
+
+    def mark_connected(self):
+        """连接已建立，网关恢复可用；退避序列在请求成功后才重置"""
+        if self.breaker.state != CLOSED:
+            log.info(f"设备恢复: {self.host}:{self.port}")
+        self.breaker.record_success()
+
+    def record_failure(self, error: str):
+        """
+        记录一次网关级的失败(连接失败、通信中断或帧同步丢失)
+
+        只在断路器断开时记录错误日志，网关长时间不可用时不会每次重连都刷日志。
+
+        Args:
+            error: 错误信息
+        """
+        if self.breaker.record_failure(self.next_backoff()):
+            log.error(f"设备不可用 {self.host}:{self.port}: {error}")
+
+    def next_backoff(self) -> float:
+        """下一次重连前的等待时间，每次调用按指数增长直到上限"""
+        delay = self._backoff * (1 + random.uniform(-self.jitter, self.jitter))
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+        return delay
+
+
+class ConnectionManager(ConnectionState):
+    """
+    TCP连接管理
+
+    连接断开后由后台线程按指数退避(带随机抖动)重连，调用者不会阻塞在连接上；
+    网关不可用期间断路器使读取立即失败。从机无响应只计入该从机自己的断路器，
+    不断开连接，也不影响同一网关后的其他从机；无响应的从机同样按退避快速失败。
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 10.0, backoff_initial: float = 0.5,
+                 backoff_max: float = 30.0, jitter: float = 0.2, failure_threshold: int = 3):
+        """
+        初始化连接管理
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号
+            timeout: 连接和收发超时时间，单位秒
+            backoff_initial: 首次重连等待时间，单位秒
+            backoff_max: 重连等待时间上限，单位秒
+            jitter: 重连等待时间的随机抖动比例
+            failure_threshold: 连续失败多少次后断路器断开
+        """
+        super().__init__(host, port, backoff_initial, backoff_max, jitter, failure_threshold)
+        self.timeout = timeout
+        self.socket: Optional[socket.socket] = None
+        self.reconnects = 0
+
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._ever_connected = False
+        self._closed = False
+        self._reconnect_thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self.socket is not None
+
+    def start(self):
+        """在后台建立连接，不阻塞调用者"""
+        self._closed = False
+        if self.socket is None:
+            self._start_reconnect()
+
+    def connect(self) -> bool:
+        """
+        立即尝试建立一次连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        with self._connect_lock:
+            if self.socket is not None:
+                return True
+            try:
+                sock = self._open()
+            except OSError as e:
+                log.debug(f"连接设备失败 {self.host}:{self.port}: {str(e)}")
+                return False
+            with self._lock:
+                self.socket = sock
+            self.mark_connected()
+            if self._ever_connected:
+                self.reconnects += 1
+                get_registry().gateway(self.host, self.port).record_reconnect()
+            self._ever_connected = True
+        return True
+
+    def _open(self) -> socket.socket:
+        # 建立一个新连接，子类可替换为其他通道(如串口)
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        enable_keepalive(sock)
+        return sock
+
+    def acquire(self) -> socket.socket:
+        """
+        获取可用的套接字
+
+        Returns:
+            socket.socket: 已连接的套接字
+        """
+        self.check()
+        if self.socket is None:
+            if self._reconnecting():
+                self.cancel_trial()
+                raise CircuitOpenError(f"设备正在重连: {self.host}:{self.port}")
+            # 没有后台重连时(如断路器试探)，同步尝试一次
+            if not self.connect():
+                self.mark_failed(f"无法连接到设备: {self.host}:{self.port}")
+                raise TransportConnectionError(f"无法连接到设备: {self.host}:{self.port}")
+        return self.socket
+
+    def mark_failed(self, error: str, drop: bool = True):
+        """
+        记录一次失败的请求
+
+        Args:
+            error: 错误信息
+            drop: 是否丢弃当前连接并在后台重连
+        """
+        if drop:
+            self._drop()
+        self.record_failure(error)
+        if drop and not self._closed:
+            self._start_reconnect()
+
+    def close(self):
+        """关闭连接并停止后台重连"""
+        self._closed = True
+        self._wakeup.set()
+        self._drop()
+
+    def _drop(self):
+        with self._lock:
+            sock, self.socket = self.socket, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _reconnecting(self) -> bool:
+        return self._reconnect_thread is not None and self._reconnect_thread.is_alive()
+
+    def _start_reconnect(self):
+        with self._lock:
+            if self._reconnecting():
+                return
+            self._wakeup.clear()
+            self._reconnect_thread = threading.Thread(
+                target=self._reconnect_loop, name=f"reconnect-{self.host}:{self.port}", daemon=True)
+            self._reconnect_thread.start()
+
+    def _reconnect_loop(self):
+        while not self._closed and self.socket is None:
+            if self.connect():
+                log.info(f"设备已连接: {self.host}:{self.port}")
+                return
+            # 重连等待时间与断路器共用同一个退避序列
+            if self._wakeup.wait(self.next_backoff()):
+                return
@@ -0,0 +1,54 @@
+from pymodbus.exceptions import ModbusException
+
+# Modbus异常码说明
+EXCEPTION_MESSAGES = {
+    0x01: "非法功能",
+    0x02: "非法数据地址",
+    0x03: "非法数据值",
+    0x04: "从机设备故障",
+    0x05: "确认",
+    0x06: "从机设备忙",
+    0x08: "存储奇偶性差错",
+    0x0A: "不可用网关路径",
+    0x0B: "网关目标设备无响应"
+}
+
+
+class TransportError(ModbusException):
+    """传输层错误基类"""
+
+
+class TransportConnectionError(TransportError):
+    """连接建立失败或连接中断"""
+
+
+class FrameTimeoutError(TransportError):
+    """等待响应帧超时"""
+
+
+class CrcError(TransportError):
+    """响应帧CRC校验失败"""
+
+
+class FrameError(TransportError):
+    """响应帧格式错误(从机地址、功能码或长度不符)"""
+
+
+class ExceptionResponse(TransportError):
+    """从机返回的Modbus异常响应"""
+
+    def __init__(self, exception_code: int):
+        self.exception_code = exception_code
+        super().__init__(f"设备返回错误: {EXCEPTION_MESSAGES.get(exception_code, '未知错误')}")
+
+
+class QueueTimeoutError(TransportError):
+    """排队等待连接超时"""
+
+
+class CircuitOpenError(TransportError):
+    """设备不可用，断路器断开期间请求直接失败"""
+
+
+class SlaveUnavailableError(CircuitOpenError):
+    """从机连续无响应，该从机的断路器断开期间请求直接失败，网关连接不受影响"""
@@ -0,0 +1,304 @@
+import asyncio
+import logging
+import socket
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+from device.async_device import AsyncRtuOverTcpTransport
+from device.connection import ConnectionState
+from device.exceptions import TransportConnectionError, TransportError
+from device.mbap import AsyncMbapTransport, MbapTransport, pack_mbap_request
+from device.serial_rtu import SerialRtuTransport
+from device.transport import RtuOverTcpTransport
+
+log = logging.getLogger(__name__)
+
+# 帧格式
+FRAMING_RTU = 'rtu'  # RTU over TCP: 原样转发RTU帧(带CRC)，一次一个请求
+FRAMING_MBAP = 'mbap'  # Modbus TCP: MBAP头 + 事务标识，可流水线并发
+FRAMING_AUTO = 'auto'  # 创建传输时探测，网关无法连接时在之后的请求前重新探测
+FRAMING_SERIAL = 'serial'  # 直连RS485串口的RTU: host为串口设备路径，port为波特率
+FRAMINGS = (FRAMING_RTU, FRAMING_MBAP, FRAMING_AUTO, FRAMING_SERIAL)
+
+# 探测请求的事务标识
+_PROBE_TRANSACTION_ID = 0x4D42
+
+# 每个网关的探测结果，同一网关只探测一次；网关无法连接时不缓存，下次连接时重新探测
+_detected: Dict[Tuple[str, int], str] = {}
+_detect_locks: Dict[Tuple[str, int], threading.Lock] = {}
+_detect_lock = threading.Lock()
+
+
+def detect_framing(host: str, port: int, timeout: float = 2.0, slave_address: int = 1) -> Optional[str]:
+    """
+    探测网关使用的帧格式
+
+    发送一个MBAP格式的读1个寄存器请求，收到事务标识相同、长度合理的MBAP响应
+    (包括异常响应)即为Modbus TCP网关；RTU over TCP网关会因CRC错误丢弃该请求而无响应。
+    网关无法连接时没有探测结果。
+
+    Args:
+        host: 网关IP地址
+        port: 网关端口号
+        timeout: 等待探测响应的时间，单位秒
+        slave_address: 探测使用的从机地址
+
+    Returns:
+        Optional[str]: FRAMING_MBAP或FRAMING_RTU，网关无法连接时为None
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(pack_mbap_request(_PROBE_TRANSACTION_ID, slave_address, 0x03, struct.pack('>HH', 0, 1)))
+            response = b''
+            while len(response) < 8:
+                chunk = sock.recv(8 - len(response))
+                if not chunk:
+                    break
+                response += chunk
+    except socket.timeout:
+        response = b''
+    except OSError as e:
+        log.warning(f"探测帧格式失败 {host}:{port}: {str(e)}，连接时重新探测")
+        return None
+
+    if len(response) == 8:
+        transaction_id, protocol_id, length, unit_id, function_code = struct.unpack('>HHHBB', response)
+        # 正常响应长度为5，异常响应为3；回显的请求长度为6，不会被误判
+        if (transaction_id == _PROBE_TRANSACTION_ID and protocol_id == 0 and unit_id == slave_address
+                and (function_code, length) in ((0x03, 5), (0x83, 3))):
+            log.info(f"网关使用Modbus TCP: {host}:{port}")
+            return FRAMING_MBAP
+    log.info(f"网关使用RTU over TCP: {host}:{port}")
+    return FRAMING_RTU
+
+
+def resolve_framing(host: str, port: int, framing: str) -> str:
+    """
+    确定网关的帧格式
+
+    framing为auto时探测网关并缓存结果；不同网关的探测可以在多个线程中并行，
+    同一网关的并发调用等待同一次探测。网关无法连接时不缓存，返回FRAMING_AUTO，
+    下一次调用重新探测。
+
+    Args:
+        host: 网关IP地址
+        port: 网关端口号
+        framing: 配置的帧格式
+
+    Returns:
+        str: FRAMING_RTU或FRAMING_MBAP，framing为auto且没有探测结果时为FRAMING_AUTO
+    """
+    if framing not in FRAMINGS:
+        raise ValueError(f"未知的帧格式: {framing}，可选 {', '.join(FRAMINGS)}")
+    if framing != FRAMING_AUTO:
+        return framing
+    key = (host, int(port))
+    with _detect_lock:
+        lock = _detect_locks.setdefault(key, threading.Lock())
+    with lock:
+        detected = _detected.get(key)
+        if detected is None:
+            detected = detect_framing(host, port)
+            if detected is None:
+                return FRAMING_AUTO
+            _detected[key] = detected
+        return detected
+
+
+class AutoFramingTransport:
+    """
+    帧格式待定的阻塞传输
+
+    创建时网关无法连接、没有探测结果；此后每次请求前重新探测(失败按退避限制频率)，
+    探测到帧格式后创建对应的传输，后续调用和其他属性都交给它。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0):
+        """
+        初始化传输
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号，默认502
+            timeout: 收发超时时间，单位秒
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport = None
+        # 探测失败的退避，与实际传输的连接状态无关
+        self.probe = ConnectionState(host, port)
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.transport is not None and self.transport.connected
+
+    def start(self):
+        """帧格式已确定时在后台建立连接，否则在第一次请求时探测"""
+        self._started = True
+        if self.transport is not None:
+            self.transport.start()
+
+    def connect(self) -> bool:
+        """
+        探测帧格式并建立连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        try:
+            transport = self._resolve()
+        except TransportError:
+            return False
+        return transport.connect()
+
+    def close(self):
+        """关闭连接"""
+        self._started = False
+        if self.transport is not None:
+            self.transport.close()
+
+    def read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        """功能码03读取连续的保持寄存器，参数同RtuOverTcpTransport"""
+        return self._resolve().read_holding_registers(slave_address, start, count)
+
+    def _resolve(self):
+        if self.transport is not None:
+            return self.transport
+        with self._lock:
+            if self.transport is None:
+                self.probe.check()
+                framing = resolve_framing(self.host, self.port, FRAMING_AUTO)
+                if framing == FRAMING_AUTO:
+                    error = f"无法连接到设备: {self.host}:{self.port}"
+                    self.probe.record_failure(error)
+                    raise TransportConnectionError(error)
+                transport = create_transport(self.host, self.port, self.timeout, framing)
+                if self._started:
+                    transport.start()
+                self.transport = transport
+        return self.transport
+
+    def __getattr__(self, name):
+        # 帧格式确定后，connection、metrics等属性取自实际的传输
+        transport = self.__dict__.get('transport')
+        if transport is None:
+            raise AttributeError(name)
+        return getattr(transport, name)
+
+
+class AsyncAutoFramingTransport:
+    """
+    帧格式待定的asyncio传输
+
+    与AutoFramingTransport相同，探测在线程池中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0):
+        """
+        初始化传输
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号，默认502
+            timeout: 连接和单次收发的超时时间，单位秒
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport = None
+        # 探测失败的退避，与实际传输的连接状态无关
+        self.probe = ConnectionState(host, port)
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.transport is not None and self.transport.connected
+
+    async def connect(self) -> bool:
+        """
+        探测帧格式并建立连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        try:
+            transport = await self._resolve()
+        except TransportError:
+            return False
+        return await transport.connect()
+
+    async def close(self):
+        """关闭连接"""
+        if self.transport is not None:
+            await self.transport.close()
+
+    async def read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        """功能码03读取连续的保持寄存器，参数同AsyncRtuOverTcpTransport"""
+        transport = await self._resolve()
+        return await transport.read_holding_registers(slave_address, start, count)
+
+    async def _resolve(self):
+        if self.transport is not None:
+            return self.transport
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.transport is None:
+                self.probe.check()
+                try:
+                    framing = await asyncio.get_running_loop().run_in_executor(
+                        None, resolve_framing, self.host, self.port, FRAMING_AUTO)
+                except asyncio.CancelledError:
+                    self.probe.cancel_trial()
+                    raise
+                if framing == FRAMING_AUTO:
+                    error = f"无法连接到设备: {self.host}:{self.port}"
+                    self.probe.record_failure(error)
+                    raise TransportConnectionError(error)
+                self.transport = create_async_transport(self.host, self.port, self.timeout, framing)
+        return self.transport
+
+    def __getattr__(self, name):
+        # 帧格式确定后，connection、metrics等属性取自实际的传输
+        transport = self.__dict__.get('transport')
+        if transport is None:
+            raise AttributeError(name)
+        return getattr(transport, name)
+
+
+def create_transport(host: str, port: int = 502, timeout: float = 10.0, framing: str = FRAMING_RTU):
+    """
+    按帧格式创建阻塞传输，可作为TransportPool的factory
+
+    Returns:
+        RtuOverTcpTransport、MbapTransport或SerialRtuTransport；auto探测没有结果时为AutoFramingTransport
+    """
+    framing = resolve_framing(host, port, framing)
+    if framing == FRAMING_AUTO:
+        return AutoFramingTransport(host, port, timeout)
+    if framing == FRAMING_SERIAL:
+        return SerialRtuTransport(host, port, timeout)
+    if framing == FRAMING_MBAP:
+        return MbapTransport(host, port, timeout)
+    return RtuOverTcpTransport(host, port, timeout)
+
+
+def create_async_transport(host: str, port: int = 502, timeout: float = 10.0, framing: str = FRAMING_RTU):
+    """
+    按帧格式创建asyncio传输，可作为TransportPool的factory
+
+    Returns:
+        AsyncRtuOverTcpTransport或AsyncMbapTransport；auto探测没有结果时为AsyncAutoFramingTransport
+    """
+    framing = resolve_framing(host, port, framing)
+    if framing == FRAMING_AUTO:
+        return AsyncAutoFramingTransport(host, port, timeout)
+    if framing == FRAMING_SERIAL:
+        raise ValueError(f"串口只支持thread和bus采集方式: {host}")
+    if framing == FRAMING_MBAP:
+        return AsyncMbapTransport(host, port, timeout)
+    return AsyncRtuOverTcpTransport(host, port, timeout)
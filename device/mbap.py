@@ -0,0 +1,413 @@
+import asyncio
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from device.capture import DISCONNECT, REQUEST, RESPONSE, TIMEOUT, get_capture
+from device.connection import ConnectionManager
+from device.exceptions import (ExceptionResponse, FrameError, FrameTimeoutError, QueueTimeoutError,
+                               TransportConnectionError, TransportError)
+from device.async_device import AsyncRtuOverTcpTransport
+from device.serializer import RequestSerializer
+from device.transport import RtuOverTcpTransport, calculate_crc, unpack_registers
+
+log = logging.getLogger(__name__)
+
+# MBAP头: 事务标识(2) + 协议标识(2) + 长度(2)，其后的单元标识计入长度
+MBAP_HEADER_SIZE = 6
+# 长度字段的合法范围: 单元标识 + 功能码 + 至多252字节数据
+MIN_MBAP_LENGTH = 3
+MAX_MBAP_LENGTH = 254
+# 默认同时在途的事务数
+MAX_OUTSTANDING = 8
+
+
+def pack_mbap_request(transaction_id: int, unit_id: int, function_code: int, data: bytes) -> bytes:
+    """
+    构建Modbus TCP请求(MBAP头 + PDU)
+
+    Args:
+        transaction_id: 事务标识，响应中原样返回
+        unit_id: 单元标识，即网关后的从机地址
+        function_code: 功能码
+        data: 功能码之后的PDU数据
+
+    Returns:
+        bytes: 完整的请求
+    """
+    return struct.pack('>HHHBB', transaction_id, 0, len(data) + 2, unit_id, function_code) + data
+
+
+def parse_mbap_header(header) -> Tuple[int, int]:
+    """
+    解析MBAP头
+
+    Args:
+        header: 响应的前6个字节
+
+    Returns:
+        Tuple[int, int]: (事务标识, 其后的字节数)
+    """
+    transaction_id, protocol_id, length = struct.unpack_from('>HHH', header)
+    if protocol_id != 0 or not MIN_MBAP_LENGTH <= length <= MAX_MBAP_LENGTH:
+        raise FrameError(f"无效的MBAP头: {bytes(header).hex()}")
+    return transaction_id, length
+
+
+def check_response(frame, unit_id: int, function_code: int):
+    """
+    校验MBAP头之后的响应(单元标识 + PDU)
+
+    布局与去掉CRC的RTU帧相同，通过校验后可直接用unpack_registers解析。
+
+    Args:
+        frame: 单元标识开始的响应
+        unit_id: 期望的单元标识
+        function_code: 期望的功能码
+    """
+    if frame[0] != unit_id:
+        raise FrameError(f"单元标识不符: 期望{unit_id}, 实际{frame[0]}")
+    if frame[1] == function_code | 0x80:
+        raise ExceptionResponse(frame[2])
+    if frame[1] != function_code:
+        raise FrameError(f"功能码不符: 期望{function_code}, 实际{frame[1]}")
+
+
+def capture_frame(capture, host: str, port: int, unit_id: int, kind: int, frame=b''):
+    """
+    抓包时把单元标识开始的帧(不含MBAP头)补上CRC按RTU帧记录，回放时统一按RTU over TCP应答
+
+    Args:
+        capture: 抓包写入器
+        host: 网关IP地址
+        port: 网关端口号
+        unit_id: 单元标识(从机地址)
+        kind: 记录类型
+        frame: 单元标识 + 功能码 + 数据，TIMEOUT时为空；DISCONNECT时为错误信息
+    """
+    if kind in (REQUEST, RESPONSE):
+        frame = bytes(frame) + calculate_crc(frame)
+    capture.record(host, port, unit_id, kind, frame)
+
+
+class _Transaction:
+    """一个在途事务，由接收响应的线程填入结果"""
+
+    __slots__ = ('frame', 'error')
+
+    def __init__(self):
+        self.frame: Optional[bytearray] = None
+        self.error: Optional[TransportError] = None
+
+
+class MbapTransport(RtuOverTcpTransport):
+    """
+    Modbus TCP(MBAP)传输
+
+    接口与RtuOverTcpTransport相同，连接管理和相同请求的合并也沿用其实现。
+    每个请求带事务标识，同一连接上最多max_outstanding个请求同时在途，
+    响应按事务标识匹配，不要求按顺序返回。不单独开接收线程: 在途请求中
+    同一时刻由一个线程读取套接字，把读到的响应交给对应事务，其余线程等待。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0, max_wait: float = 10.0,
+                 max_outstanding: int = MAX_OUTSTANDING, connection: Optional[ConnectionManager] = None):
+        """
+        初始化传输
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号，默认502
+            timeout: 单个事务等待响应的超时时间，单位秒
+            max_wait: 排队等待发送的最长时间，单位秒
+            max_outstanding: 同时在途的最大事务数
+            connection: 连接管理，默认以host、port、timeout创建
+        """
+        super().__init__(host, port, timeout, max_wait, connection)
+        self.serializer = RequestSerializer(max_wait=max_wait, concurrency=max_outstanding)
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, _Transaction] = {}
+        self._receiving = False
+        self._transaction_id = 0
+
+    def _read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        frame = self.transact(struct.pack('>HH', start, count), slave_address, 0x03)
+        return unpack_registers(frame, count)
+
+    def _transact(self, request, slave_address: int, function_code: int) -> bytearray:
+        # request为功能码之后的PDU数据，返回单元标识开始的响应
+        sock = self.connection.acquire()
+        self.connection.check_slave(slave_address)
+        transaction = _Transaction()
+        with self._condition:
+            transaction_id = self._allocate(transaction)
+        deadline = time.monotonic() + self.timeout
+        capture = get_capture()
+        try:
+            adu = pack_mbap_request(transaction_id, slave_address, function_code, request)
+            try:
+                with self._send_lock:
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("发送请求: %s", adu.hex())
+                    sock.sendall(adu)
+            except OSError as e:
+                raise TransportConnectionError(f"设备通信中断 {self.host}:{self.port}: {str(e)}")
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, REQUEST, adu[MBAP_HEADER_SIZE:])
+            frame = self._wait(sock, transaction, deadline)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("收到响应: %04x %s", transaction_id, frame.hex())
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, RESPONSE, frame)
+        except FrameTimeoutError as e:
+            # 只是本事务超时，迟到的响应会按事务标识丢弃，连接仍然可用
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, TIMEOUT)
+            self.connection.mark_timeout(slave_address, str(e))
+            raise
+        except TransportError as e:
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, DISCONNECT, str(e).encode())
+            # 由其他线程发现的连接错误已经处理过
+            if e is not transaction.error:
+                self._fail_all(e)
+            raise
+        finally:
+            with self._condition:
+                self._pending.pop(transaction_id, None)
+
+        try:
+            check_response(frame, slave_address, function_code)
+        except ExceptionResponse:
+            self.connection.mark_success(slave_address)
+            raise
+        except TransportError as e:
+            self.connection.mark_failed(str(e), drop=False)
+            raise
+        self.connection.mark_success(slave_address)
+        return frame
+
+    def _allocate(self, transaction: _Transaction) -> int:
+        # 在锁内调用，跳过仍在途的事务标识
+        while True:
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            if self._transaction_id not in self._pending:
+                self._pending[self._transaction_id] = transaction
+                return self._transaction_id
+
+    def _wait(self, sock: socket.socket, transaction: _Transaction, deadline: float) -> bytearray:
+        while True:
+            with self._condition:
+                while True:
+                    if transaction.frame is not None:
+                        return transaction.frame
+                    if transaction.error is not None:
+                        raise transaction.error
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise FrameTimeoutError(f"等待响应超时: {self.host}:{self.port}")
+                    if not self._receiving:
+                        break
+                    self._condition.wait(remaining)
+                self._receiving = True
+
+            try:
+                transaction_id, frame = self._receive(sock)
+            except BaseException:
+                with self._condition:
+                    self._receiving = False
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                self._receiving = False
+                target = self._pending.get(transaction_id)
+                if target is None:
+                    log.debug("丢弃已超时事务的响应: %04x", transaction_id)
+                else:
+                    target.frame = frame
+                self._condition.notify_all()
+
+    def _receive(self, sock: socket.socket) -> Tuple[int, bytearray]:
+        header = bytearray(MBAP_HEADER_SIZE)
+        self._recv_into(sock, header, idle_timeout=True)
+        transaction_id, length = parse_mbap_header(header)
+        frame = bytearray(length)
+        self._recv_into(sock, frame)
+        return transaction_id, frame
+
+    def _recv_into(self, sock: socket.socket, buffer: bytearray, idle_timeout: bool = False):
+        view = memoryview(buffer)
+        received = 0
+        while received < len(buffer):
+            try:
+                count = sock.recv_into(view[received:])
+            except socket.timeout:
+                if idle_timeout and received == 0:
+                    raise FrameTimeoutError(f"等待响应超时: {self.host}:{self.port}")
+                raise TransportConnectionError(f"响应不完整: {self.host}:{self.port}")
+            except OSError as e:
+                raise TransportConnectionError(f"设备通信中断 {self.host}:{self.port}: {str(e)}")
+            if count == 0:
+                raise TransportConnectionError(f"设备关闭了连接: {self.host}:{self.port}")
+            received += count
+
+    def _fail_all(self, error: TransportError):
+        # 连接已不可用(或帧同步丢失)，所有在途事务以同一个错误结束
+        with self._condition:
+            for transaction in self._pending.values():
+                if transaction.frame is None and transaction.error is None:
+                    transaction.error = error
+            self._condition.notify_all()
+        self.connection.mark_failed(str(error))
+
+
+class AsyncMbapTransport(AsyncRtuOverTcpTransport):
+    """
+    基于asyncio的Modbus TCP(MBAP)传输
+
+    接口与AsyncRtuOverTcpTransport相同，相同请求的合并沿用其实现。连接上由一个接收任务
+    读取响应并按事务标识交给等待的请求，最多max_outstanding个请求同时在途；
+    单个请求超时或被取消不影响帧同步，连接继续使用，超时只计入该从机的断路器。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0,
+                 max_outstanding: int = MAX_OUTSTANDING):
+        """
+        初始化传输
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号，默认502
+            timeout: 连接和单个事务的超时时间，单位秒
+            max_outstanding: 同时在途的最大事务数
+        """
+        super().__init__(host, port, timeout)
+        self.max_outstanding = max_outstanding
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._receiver: Optional[asyncio.Task] = None
+        self._transaction_id = 0
+
+    async def connect(self) -> bool:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.writer is not None:
+                return True
+            if not await super().connect():
+                return False
+            self._receiver = asyncio.get_running_loop().create_task(self._receive_loop(self.reader))
+        return True
+
+    async def close(self):
+        receiver, self._receiver = self._receiver, None
+        if receiver is not None:
+            receiver.cancel()
+        self._fail_all(TransportConnectionError(f"连接已关闭: {self.host}:{self.port}"))
+        await super().close()
+
+    async def _read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_outstanding)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise QueueTimeoutError(f"等待发送超时: {self.timeout}s")
+        metrics = self.metrics.device(slave_address)
+        started = time.perf_counter()
+        try:
+            frame = await self._transact(slave_address, start, count)
+        except TransportError as e:
+            metrics.observe(time.perf_counter() - started, e)
+            raise
+        finally:
+            self._slots.release()
+        metrics.observe(time.perf_counter() - started)
+        return unpack_registers(frame, count)
+
+    async def _transact(self, slave_address: int, start: int, count: int) -> bytes:
+        # 已取得在途名额，发送一个事务并等待按事务标识交回的响应
+        await self.ensure_connected()
+        self.connection.check_slave(slave_address)
+
+        future = asyncio.get_running_loop().create_future()
+        transaction_id = self._allocate(future)
+        capture = get_capture()
+        try:
+            adu = pack_mbap_request(transaction_id, slave_address, 0x03, struct.pack('>HH', start, count))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("发送请求: %s", adu.hex())
+            self.writer.write(adu)
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, REQUEST, adu[MBAP_HEADER_SIZE:])
+            frame = await asyncio.wait_for(future, self.timeout)
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, RESPONSE, frame)
+        except asyncio.TimeoutError:
+            error = f"等待响应超时: {self.host}:{self.port}"
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, TIMEOUT)
+            self.connection.mark_timeout(slave_address, error)
+            raise FrameTimeoutError(error)
+        except asyncio.CancelledError:
+            self.connection.cancel_trial()
+            raise
+        except TransportError as e:
+            if capture is not None:
+                capture_frame(capture, self.host, self.port, slave_address, DISCONNECT, str(e).encode())
+            raise
+        finally:
+            self._pending.pop(transaction_id, None)
+        try:
+            check_response(frame, slave_address, 0x03)
+        except ExceptionResponse:
+            self.connection.mark_success(slave_address)
+            raise
+        self.connection.mark_success(slave_address)
+        return frame
+
+    def _allocate(self, future: asyncio.Future) -> int:
+        while True:
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            if self._transaction_id not in self._pending:
+                self._pending[self._transaction_id] = future
+                return self._transaction_id
+
+    async def _receive_loop(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER_SIZE)
+                transaction_id, length = parse_mbap_header(header)
+                frame = await reader.readexactly(length)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("收到响应: %04x %s", transaction_id, frame.hex())
+                future = self._pending.get(transaction_id)
+                if future is None or future.done():
+                    log.debug("丢弃已超时事务的响应: %04x", transaction_id)
+                else:
+                    future.set_result(frame)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.IncompleteReadError:
+            error = TransportConnectionError(f"设备关闭了连接: {self.host}:{self.port}")
+        except OSError as e:
+            error = TransportConnectionError(f"设备通信中断 {self.host}:{self.port}: {str(e)}")
+        except TransportError as e:
+            # 帧同步已丢失，重新建立连接以丢弃残留字节
+            error = e
+        self._receiver = None
+        # 连接级的失败只计入一次，不按在途事务数重复计数
+        self.connection.record_failure(str(error))
+        self._fail_all(error)
+        self._abort()
+
+    def _fail_all(self, error: TransportError):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+                # 等待者可能已经超时离开
+                future.exception()
@@ -0,0 +1,406 @@
+import bisect
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from device.exceptions import (CircuitOpenError, CrcError, ExceptionResponse, FrameTimeoutError,
+                               TransportConnectionError)
+
+# 请求时延直方图的桶上限，单位秒，最后还有一个+Inf桶
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 错误类别
+TIMEOUT = 'timeout'
+CRC_ERROR = 'crc_error'
+FRAME_ERROR = 'frame_error'
+CONNECTION_ERROR = 'connection_error'
+UNAVAILABLE = 'unavailable'  # 断路器断开或正在重连，请求没有发出
+ERROR_KINDS = (TIMEOUT, CRC_ERROR, FRAME_ERROR, CONNECTION_ERROR, UNAVAILABLE)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    传输错误的类别
+
+    Args:
+        error: 请求抛出的异常，不含ExceptionResponse
+
+    Returns:
+        str: ERROR_KINDS之一
+    """
+    if isinstance(error, CircuitOpenError):
+        return UNAVAILABLE
+    if isinstance(error, FrameTimeoutError):
+        return TIMEOUT
+    if isinstance(error, CrcError):
+        return CRC_ERROR
+    if isinstance(error, (TransportConnectionError, OSError)):
+        return CONNECTION_ERROR
+    return FRAME_ERROR
+
+
+class Counter:
+    """按线程分片的计数器，写入不加锁"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[List[int]] = []
+
+    def inc(self, amount: int = 1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0]
+            self._shards.append(shard)
+        shard[0] += amount
+
+    @property
+    def value(self) -> int:
+        return sum(shard[0] for shard in list(self._shards))
+
+
+class _Shard:
+    """一个线程的计数，只由该线程写入"""
+
+    __slots__ = ('requests', 'errors', 'exceptions', 'buckets', 'latency_sum')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = [0] * len(ERROR_KINDS)
+        self.exceptions: Dict[int, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+
+class RequestTotals:
+    """RequestMetrics的汇总结果"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = dict.fromkeys(ERROR_KINDS, 0)
+        self.exceptions: Dict[int, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    @property
+    def responses(self) -> int:
+        """收到响应(含异常响应)的请求数，即直方图的样本数"""
+        return sum(self.buckets)
+
+    def add(self, other: 'RequestTotals') -> 'RequestTotals':
+        self.requests += other.requests
+        for kind, count in other.errors.items():
+            self.errors[kind] += count
+        for code, count in other.exceptions.items():
+            self.exceptions[code] = self.exceptions.get(code, 0) + count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.latency_sum += other.latency_sum
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        由直方图估算时延分位数，桶内按线性插值
+
+        Args:
+            q: 分位，0~1
+
+        Returns:
+            float: 时延，单位秒；没有样本时为0，落在+Inf桶时为最大的桶上限
+        """
+        total = self.responses
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            if count and cumulative + count >= rank:
+                if index == len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[-1]
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                return lower + (LATENCY_BUCKETS[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return LATENCY_BUCKETS[-1]
+
+
+class RequestMetrics:
+    """
+    一个从机的请求统计
+
+    每个线程写自己的分片，写入不加锁也不与其他线程竞争；读取时汇总所有分片，
+    读到的是各分片的近似同时刻的值，足够用于监控。asyncio传输都在事件循环线程中写入，只有一个分片。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            self._shards.append(shard)
+            return shard
+
+    def observe(self, latency: float, error: Optional[BaseException] = None):
+        """
+        记录一次请求
+
+        Args:
+            latency: 从发送请求到收到响应或失败的时间，单位秒
+            error: 请求失败时的异常；异常响应计入时延直方图，其他错误只计数
+        """
+        shard = self._shard()
+        shard.requests += 1
+        if error is None or isinstance(error, ExceptionResponse):
+            shard.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            shard.latency_sum += latency
+            if error is not None:
+                code = error.exception_code
+                shard.exceptions[code] = shard.exceptions.get(code, 0) + 1
+        else:
+            shard.errors[ERROR_KINDS.index(classify_error(error))] += 1
+
+    def totals(self) -> RequestTotals:
+        """汇总所有线程的计数"""
+        totals = RequestTotals()
+        for shard in list(self._shards):
+            totals.requests += shard.requests
+            for kind, count in zip(ERROR_KINDS, shard.errors):
+                totals.errors[kind] += count
+            for code, count in list(shard.exceptions.items()):
+                totals.exceptions[code] = totals.exceptions.get(code, 0) + count
+            totals.buckets = [a + b for a, b in zip(totals.buckets, shard.buckets)]
+            totals.latency_sum += shard.latency_sum
+        return totals
+
+
+class GatewayMetrics:
+    """一个网关(host:port)及其后各从机的统计"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.devices: Dict[int, RequestMetrics] = {}
+        self._reconnects = Counter()
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def device(self, slave_address: int) -> RequestMetrics:
+        """从机的请求统计，不存在时创建"""
+        metrics = self.devices.get(slave_address)
+        if metrics is None:
+            # setdefault是原子操作，并发创建时只保留一个
+            metrics = self.devices.setdefault(slave_address, RequestMetrics())
+        return metrics
+
+    def record_reconnect(self):
+        """记录一次断开后的重新连接"""
+        self._reconnects.inc()
+
+    @property
+    def reconnects(self) -> int:
+        return self._reconnects.value
+
+    def totals(self) -> RequestTotals:
+        """网关后所有从机的汇总"""
+        totals = RequestTotals()
+        for metrics in list(self.devices.values()):
+            totals.add(metrics.totals())
+        return totals
+
+
+class CycleMetrics:
+    """
+    一个采集任务的周期统计
+
+    只由该任务的采集线程(或事件循环)写入。jitter为实际开始时刻相对计划节拍的延迟，
+    overrun为一个周期内没有完成采集、跳过了节拍的次数。
+    """
+
+    # jitter滑动平均的权重
+    SMOOTHING = 0.1
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cycles = 0
+        self.overruns = 0
+        self.jitter = 0.0
+        self.max_jitter = 0.0
+        self.duration = 0.0
+
+    def observe(self, lateness: float, duration: float, overrun: bool):
+        """
+        记录一个采集周期
+
+        Args:
+            lateness: 实际开始时刻减去计划节拍，单位秒
+            duration: 采集耗时，单位秒
+            overrun: 采集是否超过了周期
+        """
+        lateness = abs(lateness)
+        self.cycles += 1
+        self.overruns += overrun
+        self.jitter += (lateness - self.jitter) * self.SMOOTHING
+        if lateness > self.max_jitter:
+            self.max_jitter = lateness
+        self.duration = duration
+
+
+class SubsystemTimers:
+    """
+    按子系统(解码、Tango读取等)累计调用次数和耗时
+
+    只在性能分析期间开启；关闭时被timed装饰的函数只多一次属性判断。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._totals: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, subsystem: str, seconds: float):
+        """累计一次调用的耗时"""
+        with self._lock:
+            totals = self._totals.get(subsystem)
+            if totals is None:
+                totals = self._totals[subsystem] = [0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def reset(self):
+        """清空累计值"""
+        with self._lock:
+            self._totals.clear()
+
+    def totals(self) -> Dict[str, Tuple[int, float]]:
+        """各子系统的(调用次数, 累计耗时秒)"""
+        with self._lock:
+            return {name: (int(calls), seconds) for name, (calls, seconds) in self._totals.items()}
+
+    def timed(self, subsystem: str) -> Callable:
+        """装饰器: 开启时把函数的耗时计入subsystem"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(subsystem, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+
+class MetricsRegistry:
+    """进程内所有网关和采集任务的统计"""
+
+    def __init__(self):
+        self.gateways: Dict[Tuple[str, int], GatewayMetrics] = {}
+        self.cycles: Dict[str, CycleMetrics] = {}
+        self.timers = SubsystemTimers()
+
+    def gateway(self, host: str, port: int) -> GatewayMetrics:
+        """网关的统计，不存在时创建"""
+        key = (host, int(port))
+        metrics = self.gateways.get(key)
+        if metrics is None:
+            metrics = self.gateways.setdefault(key, GatewayMetrics(host, int(port)))
+        return metrics
+
+    def device(self, host: str, port: int, slave_address: int) -> RequestMetrics:
+        """网关后一个从机的请求统计"""
+        return self.gateway(host, port).device(int(slave_address))
+
+    def cycle(self, name: str) -> CycleMetrics:
+        """采集任务的周期统计，同名任务(如设备重新初始化后)沿用原来的计数"""
+        metrics = self.cycles.get(name)
+        if metrics is None:
+            metrics = self.cycles.setdefault(name, CycleMetrics(name))
+        return metrics
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus文本格式的全部统计
+
+        Returns:
+            str: 文本格式(version 0.0.4)的指标
+        """
+        lines = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        devices = [(gateway, slave, metrics.totals())
+                   for gateway in list(self.gateways.values())
+                   for slave, metrics in sorted(list(gateway.devices.items()))]
+
+        header('pk9019_requests_total', 'counter', "Modbus requests sent")
+        for gateway, slave, totals in devices:
+            lines.append(f'pk9019_requests_total{{gateway="{gateway.name}",slave="{slave}"}} {totals.requests}')
+
+        header('pk9019_request_latency_seconds', 'histogram', "Request round-trip latency")
+        for gateway, slave, totals in devices:
+            labels = f'gateway="{gateway.name}",slave="{slave}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), totals.buckets):
+                cumulative += count
+                lines.append(f'pk9019_request_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'pk9019_request_latency_seconds_sum{{{labels}}} {totals.latency_sum!r}')
+            lines.append(f'pk9019_request_latency_seconds_count{{{labels}}} {cumulative}')
+
+        header('pk9019_request_errors_total', 'counter', "Failed requests by kind")
+        for gateway, slave, totals in devices:
+            for kind, count in totals.errors.items():
+                lines.append(f'pk9019_request_errors_total{{gateway="{gateway.name}",slave="{slave}",'
+                             f'kind="{kind}"}} {count}')
+
+        header('pk9019_exception_responses_total', 'counter', "Modbus exception responses by code")
+        for gateway, slave, totals in devices:
+            for code, count in sorted(totals.exceptions.items()):
+                lines.append(f'pk9019_exception_responses_total{{gateway="{gateway.name}",slave="{slave}",'
+                             f'code="{code}"}} {count}')
+
+        header('pk9019_reconnects_total', 'counter', "Gateway reconnects after a lost connection")
+        for gateway in list(self.gateways.values()):
+            lines.append(f'pk9019_reconnects_total{{gateway="{gateway.name}"}} {gateway.reconnects}')
+
+        cycles = sorted(list(self.cycles.values()), key=lambda c: c.name)
+        header('pk9019_poll_cycles_total', 'counter', "Completed poll cycles")
+        lines.extend(f'pk9019_poll_cycles_total{{poller="{c.name}"}} {c.cycles}' for c in cycles)
+        header('pk9019_poll_overruns_total', 'counter', "Poll cycles that exceeded the interval")
+        lines.extend(f'pk9019_poll_overruns_total{{poller="{c.name}"}} {c.overruns}' for c in cycles)
+        header('pk9019_poll_jitter_seconds', 'gauge', "Smoothed delay of poll start behind schedule")
+        lines.extend(f'pk9019_poll_jitter_seconds{{poller="{c.name}"}} {c.jitter!r}' for c in cycles)
+        header('pk9019_poll_jitter_max_seconds', 'gauge', "Largest delay of poll start behind schedule")
+        lines.extend(f'pk9019_poll_jitter_max_seconds{{poller="{c.name}"}} {c.max_jitter!r}' for c in cycles)
+        header('pk9019_poll_duration_seconds', 'gauge', "Duration of the last poll")
+        lines.extend(f'pk9019_poll_duration_seconds{{poller="{c.name}"}} {c.duration!r}' for c in cycles)
+        return "\n".join(lines) + "\n"
+
+
+def merge_totals(metrics: Iterable[RequestMetrics]) -> RequestTotals:
+    """汇总多个从机的请求统计"""
+    totals = RequestTotals()
+    for item in metrics:
+        totals.add(item.totals())
+    return totals
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """获取进程内共享的统计"""
+    return _registry
+
+
+def timed(subsystem: str) -> Callable:
+    """装饰器: 性能分析期间把函数的耗时计入进程内共享统计的subsystem子系统"""
+    return _registry.timers.timed(subsystem)
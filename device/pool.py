@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class TransportPool:
+    """
+    按网关host:port共享传输的连接池
+
+    同一网关后的多个设备共用一个连接，引用计数归零时由调用者关闭连接。
+    传输在锁外创建(factory可能探测帧格式而访问网络)，创建期间同一网关的其他调用者等待结果，
+    其他网关不受影响。
+    """
+
+    def __init__(self, factory: Callable[..., Any]):
+        """
+        初始化连接池
+
+        Args:
+            factory: 传输构造函数，以(host, port, timeout, **options)调用
+        """
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._transports: Dict[Tuple[str, int], Any] = {}
+        self._refcounts: Dict[Tuple[str, int], int] = {}
+        # 正在创建的传输，同一网关只创建一次
+        self._building: Dict[Tuple[str, int], Future] = {}
+
+    def acquire(self, host: str, port: int, timeout: float = 10.0, **options) -> Any:
+        """
+        获取网关的共享传输
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号
+            timeout: 新建传输时使用的超时时间，单位秒
+            options: 新建传输时传给factory的其他参数，如framing
+
+        Returns:
+            Any: 传输对象
+        """
+        key = (host, int(port))
+        while True:
+            with self._lock:
+                transport = self._transports.get(key)
+                if transport is not None:
+                    self._refcounts[key] += 1
+                    return transport
+                building = self._building.get(key)
+                if building is None:
+                    future = self._building[key] = Future()
+            if building is None:
+                break
+            # 其他调用者正在创建，创建失败时抛出同样的异常，成功后回到锁内取得引用
+            building.result()
+
+        try:
+            transport = self.factory(host, int(port), timeout, **options)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._building[key]
+            self._transports[key] = transport
+            self._refcounts[key] = 1
+        future.set_result(transport)
+        return transport
+
+    def release(self, transport: Any) -> Optional[Any]:
+        """
+        释放传输的一个引用
+
+        Returns:
+            Optional[Any]: 引用计数归零时返回该传输，由调用者关闭；否则返回None
+        """
+        key = (transport.host, int(transport.port))
+        with self._lock:
+            if self._transports.get(key) is not transport:
+                return None
+            self._refcounts[key] -= 1
+            if self._refcounts[key] > 0:
+                return None
+            del self._transports[key]
+            del self._refcounts[key]
+            return transport
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._transports)
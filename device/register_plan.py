@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 功能码03单帧最多读取125个寄存器
+MAX_REGISTERS_PER_READ = 125
+
+
+@dataclass(frozen=True)
+class RegisterPoint:
+    """一个需要读取的数据点，占用连续的若干保持寄存器"""
+    name: str
+    address: int
+    count: int = 1
+
+    @property
+    def end(self) -> int:
+        """数据点之后的第一个寄存器地址"""
+        return self.address + self.count
+
+
+@dataclass(frozen=True)
+class ReadBlock:
+    """一次功能码03请求读取的连续寄存器区间"""
+    start: int
+    count: int
+    points: Tuple[RegisterPoint, ...]
+
+    def extract(self, registers: Sequence[int]) -> Dict[str, Sequence[int]]:
+        """
+        从本区间的寄存器值中取出各数据点的寄存器
+
+        Args:
+            registers: 本区间读取到的寄存器值，长度为count
+
+        Returns:
+            Dict[str, Sequence[int]]: 数据点名称到其寄存器值的映射
+        """
+        return {
+            point.name: registers[point.address - self.start:point.end - self.start]
+            for point in self.points
+        }
+
+
+def plan_reads(points: Iterable[RegisterPoint], max_gap: int = 0,
+               max_count: int = MAX_REGISTERS_PER_READ) -> List[ReadBlock]:
+    """
+    将数据点合并为尽量少的读请求
+
+    相邻或重叠的数据点合并为同一个区间；间隔不超过max_gap个寄存器的数据点
+    也会合并（多读的寄存器被丢弃），单个区间不超过max_count个寄存器。
+
+    Args:
+        points: 需要读取的数据点
+        max_gap: 允许合并的最大寄存器间隔
+        max_count: 单个区间的最大寄存器数量
+
+    Returns:
+        List[ReadBlock]: 按起始地址排序的读请求列表
+    """
+    blocks = []
+    start = end = None
+    members: List[RegisterPoint] = []
+
+    for point in sorted(points, key=lambda p: (p.address, p.count)):
+        if point.count > max_count:
+            raise ValueError(f"数据点 {point.name} 超过单帧最大寄存器数量: {point.count}")
+        if members and point.address - end <= max_gap and max(end, point.end) - start <= max_count:
+            end = max(end, point.end)
+            members.append(point)
+            continue
+        if members:
+            blocks.append(ReadBlock(start, end - start, tuple(members)))
+        start, end, members = point.address, point.end, [point]
+
+    if members:
+        blocks.append(ReadBlock(start, end - start, tuple(members)))
+    return blocks
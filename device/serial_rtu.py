@@ -0,0 +1,225 @@
+import logging
+import os
+import select
+import time
+
+from device.capture import DISCONNECT, REQUEST, RESPONSE, TIMEOUT, get_capture
+from device.connection import ConnectionManager
+from device.exceptions import ExceptionResponse, FrameTimeoutError, TransportConnectionError, TransportError
+from device.transport import HEADER_SIZE, RtuOverTcpTransport, check_frame, frame_length
+
+try:
+    import termios
+except ImportError:  # Windows
+    termios = None
+
+log = logging.getLogger(__name__)
+
+# 校验位
+PARITY_NONE = 'N'
+PARITY_EVEN = 'E'
+PARITY_ODD = 'O'
+
+
+def char_time(baudrate: int, bits_per_char: int = 11) -> float:
+    """
+    一个字符在线路上的传输时间
+
+    Args:
+        baudrate: 串口波特率
+        bits_per_char: 每字符位数(起始位+8数据位+校验位+停止位)，默认11
+
+    Returns:
+        float: 单位秒
+    """
+    return bits_per_char / baudrate
+
+
+def rtu_silent_interval(baudrate: int, bits_per_char: int = 11) -> float:
+    """
+    计算RTU帧间的3.5字符静默时间
+
+    波特率高于19200时按Modbus规范固定为1.75ms。
+
+    Args:
+        baudrate: 串口波特率
+        bits_per_char: 每字符位数(起始位+8数据位+校验位+停止位)，默认11
+
+    Returns:
+        float: 静默时间，单位秒
+    """
+    if baudrate > 19200:
+        return 0.00175
+    return 3.5 * char_time(baudrate, bits_per_char)
+
+
+class SerialPort:
+    """
+    以非阻塞方式打开的串口
+
+    只使用termios，不依赖pyserial；配置为原始模式，VMIN=VTIME=0，读取由select等待。
+    """
+
+    def __init__(self, device: str, baudrate: int, parity: str = PARITY_EVEN, stopbits: int = 1):
+        """
+        打开并配置串口
+
+        Args:
+            device: 串口设备路径，如/dev/ttyUSB0
+            baudrate: 波特率
+            parity: 校验位，N、E或O
+            stopbits: 停止位，1或2
+        """
+        if termios is None:
+            raise OSError("当前平台不支持termios串口")
+        speed = getattr(termios, f'B{baudrate}', None)
+        if speed is None:
+            raise OSError(f"不支持的波特率: {baudrate}")
+        self.device = device
+        self.fd = os.open(device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.fd)
+            cflag = termios.CS8 | termios.CREAD | termios.CLOCAL
+            if parity != PARITY_NONE:
+                cflag |= termios.PARENB
+                if parity == PARITY_ODD:
+                    cflag |= termios.PARODD
+            if stopbits == 2:
+                cflag |= termios.CSTOPB
+            cc[termios.VMIN] = 0
+            cc[termios.VTIME] = 0
+            termios.tcsetattr(self.fd, termios.TCSANOW, [0, 0, cflag, 0, speed, speed, cc])
+            termios.tcflush(self.fd, termios.TCIOFLUSH)
+        except (termios.error, OSError) as e:
+            os.close(self.fd)
+            raise OSError(f"配置串口失败 {device}: {e}") from e
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def write(self, data):
+        """写入整个帧，内核发送缓冲区满时等待"""
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.fd, view)
+            except BlockingIOError:
+                select.select([], [self.fd], [])
+                continue
+            view = view[written:]
+
+    def read_into(self, buffer) -> int:
+        """读取已到达的字节，没有数据时返回0"""
+        try:
+            return os.readv(self.fd, [buffer])
+        except BlockingIOError:
+            return 0
+
+    def flush_input(self):
+        """丢弃接收缓冲区中的残留字节"""
+        termios.tcflush(self.fd, termios.TCIFLUSH)
+
+    def close(self):
+        if self.fd >= 0:
+            fd, self.fd = self.fd, -1
+            os.close(fd)
+
+
+class SerialConnection(ConnectionManager):
+    """串口连接管理，打开失败或通信中断后与TCP连接一样在后台按退避重新打开"""
+
+    def __init__(self, device: str, baudrate: int, timeout: float = 1.0, parity: str = PARITY_EVEN,
+                 stopbits: int = 1, **options):
+        super().__init__(device, baudrate, timeout, **options)
+        self.parity = parity
+        self.stopbits = stopbits
+
+    def _open(self) -> SerialPort:
+        return SerialPort(self.host, int(self.port), self.parity, self.stopbits)
+
+
+class SerialRtuTransport(RtuOverTcpTransport):
+    """
+    直连RS485串口的Modbus RTU传输
+
+    接口与RtuOverTcpTransport相同，PK9019、TempHumidity和总线调度器可直接使用；
+    host为串口设备路径，port为波特率(也用于统计和连接池的键)。
+    帧间的3.5字符静默时间按波特率计算，从上一帧收完的时刻起算，只等待不足的部分；
+    响应按帧头中的长度判断收完，收完即返回，不等待字符间超时。
+    """
+
+    def __init__(self, device: str, baudrate: int = 9600, timeout: float = 1.0, max_wait: float = 10.0,
+                 parity: str = PARITY_EVEN, stopbits: int = 1):
+        """
+        初始化传输
+
+        Args:
+            device: 串口设备路径，如/dev/ttyUSB0
+            baudrate: 波特率
+            timeout: 从发送请求到收完响应的超时时间，单位秒
+            max_wait: 排队等待的最长时间，单位秒
+            parity: 校验位，N、E或O
+            stopbits: 停止位，1或2
+        """
+        super().__init__(device, int(baudrate), timeout, max_wait,
+                         connection=SerialConnection(device, int(baudrate), timeout, parity, stopbits))
+        bits_per_char = 1 + 8 + (parity != PARITY_NONE) + stopbits
+        self.char_time = char_time(int(baudrate), bits_per_char)
+        self.silent_interval = rtu_silent_interval(int(baudrate), bits_per_char)
+        # 线路上最近一次有数据的时刻，下一帧在此之后静默silent_interval再发送
+        self._idle_since = 0.0
+
+    def _transact(self, request, slave_address: int, function_code: int) -> memoryview:
+        port = self.connection.acquire()
+        self.connection.check_slave(slave_address)
+        capture = get_capture()
+        try:
+            wait = self._idle_since + self.silent_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            port.flush_input()
+            port.write(request)
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, REQUEST, request)
+            # 超时从请求发送完毕算起
+            deadline = time.monotonic() + len(request) * self.char_time + self.timeout
+            frame = self._read_serial_frame(port, deadline)
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, RESPONSE, frame)
+            check_frame(frame, slave_address, function_code)
+        except FrameTimeoutError as e:
+            # 串口没有连接状态，从机无响应时不重新打开串口，下一次请求前清空残留字节即可
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, TIMEOUT)
+            self.connection.mark_timeout(slave_address, str(e))
+            raise
+        except OSError as e:
+            error = f"串口通信中断 {self.host}: {str(e)}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, DISCONNECT, error.encode())
+            self.connection.mark_failed(error)
+            raise TransportConnectionError(error)
+        except ExceptionResponse:
+            self.connection.mark_success(slave_address)
+            raise
+        except TransportError as e:
+            self.connection.mark_failed(str(e), drop=False)
+            raise
+        finally:
+            self._idle_since = time.monotonic()
+        self.connection.mark_success(slave_address)
+        return frame
+
+    def _read_serial_frame(self, port: SerialPort, deadline: float) -> memoryview:
+        self._read_until(port, 0, HEADER_SIZE, deadline)
+        length = frame_length(self._buffer)
+        self._read_until(port, HEADER_SIZE, length, deadline)
+        return self._view[:length]
+
+    def _read_until(self, port: SerialPort, start: int, end: int, deadline: float):
+        view = self._view
+        while start < end:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([port], [], [], remaining)[0]:
+                raise FrameTimeoutError(f"等待响应超时: {self.host}")
+            start += port.read_into(view[start:end])
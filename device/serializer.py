@@ -0,0 +1,85 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from device.exceptions import QueueTimeoutError
+
+
+class _Call:
+    """一次在途请求，由发起者执行，相同请求的其他调用者共享结果"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestSerializer:
+    """
+    单连接请求串行器
+
+    同一时刻最多concurrency个请求占用连接(RTU为1，MBAP可按事务标识并发)，
+    其余请求按到达顺序排队；key相同的并发请求合并为一次传输并共享结果。
+    """
+
+    def __init__(self, max_wait: float = 10.0, concurrency: int = 1):
+        """
+        初始化请求串行器
+
+        Args:
+            max_wait: 排队等待连接的最长时间，单位秒
+            concurrency: 同时在途的最大请求数
+        """
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._inflight: Dict[Hashable, _Call] = {}
+
+    def submit(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        串行执行请求
+
+        Args:
+            key: 请求标识，key相同的并发请求只执行一次
+            func: 实际执行传输的函数
+
+        Returns:
+            Any: func的返回值
+        """
+        with self._condition:
+            call = self._inflight.get(key)
+            if call is None:
+                call = _Call()
+                self._inflight[key] = call
+                self._queue.append(call)
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._condition:
+                if not self._condition.wait_for(lambda: self._queue.index(call) < self.concurrency,
+                                                self.max_wait):
+                    raise QueueTimeoutError(f"等待连接超时: {self.max_wait}s")
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._condition:
+                del self._inflight[key]
+                self._queue.remove(call)
+                self._condition.notify_all()
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,317 @@
+import logging
+import select
+import socket
+import struct
+import time
+from typing import Optional, Tuple
+
+from device.capture import DISCONNECT, REQUEST, RESPONSE, TIMEOUT, get_capture
+from device.connection import ConnectionManager
+from device.exceptions import (CrcError, ExceptionResponse, FrameError, FrameTimeoutError,
+                               TransportConnectionError, TransportError)
+from device.metrics import get_registry
+from device.serializer import RequestSerializer
+
+log = logging.getLogger(__name__)
+
+# RTU帧最大长度256字节
+MAX_FRAME_SIZE = 256
+
+
+def _build_crc_table() -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _build_crc_table()
+
+
+def crc16(data) -> int:
+    """
+    查表法计算Modbus CRC16
+
+    Args:
+        data: 需要计算CRC的数据，支持bytes/bytearray/memoryview
+
+    Returns:
+        int: CRC16值
+    """
+    crc = 0xFFFF
+    table = CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def calculate_crc(data) -> bytes:
+    """
+    计算CRC校验码
+
+    Args:
+        data: 需要计算CRC的数据
+
+    Returns:
+        bytes: 2字节的CRC校验码
+    """
+    return struct.pack('<H', crc16(data))
+
+
+# RTU帧头长度: 从机地址 + 功能码 + 字节数(异常响应时为异常码)
+HEADER_SIZE = 3
+
+
+def pack_read_request(buffer, slave_address: int, start: int, count: int):
+    """
+    在buffer中构建功能码03读保持寄存器请求帧(8字节，含CRC)
+
+    Args:
+        buffer: 至少8字节的可写缓冲区
+        slave_address: 从机地址
+        start: 起始寄存器地址
+        count: 寄存器数量
+    """
+    struct.pack_into('>BBHH', buffer, 0, slave_address, 0x03, start, count)
+    struct.pack_into('<H', buffer, 6, crc16(memoryview(buffer)[:6]))
+
+
+def frame_length(header) -> int:
+    """
+    根据帧头计算完整响应帧长度
+
+    Args:
+        header: 响应帧的前3个字节
+
+    Returns:
+        int: 含CRC的响应帧长度
+    """
+    if header[1] & 0x80:
+        return 5
+    return HEADER_SIZE + header[2] + 2
+
+
+def check_frame(frame, slave_address: int, function_code: int):
+    """
+    校验完整响应帧的CRC、从机地址和功能码
+
+    Args:
+        frame: 完整响应帧
+        slave_address: 期望的响应从机地址
+        function_code: 期望的响应功能码
+    """
+    length = len(frame)
+    if crc16(frame[:-2]) != struct.unpack_from('<H', frame, length - 2)[0]:
+        raise CrcError(f"响应CRC校验失败: {frame.hex()}")
+    if frame[0] != slave_address:
+        raise FrameError(f"从机地址不符: 期望{slave_address}, 实际{frame[0]}")
+    if frame[1] == function_code | 0x80:
+        raise ExceptionResponse(frame[2])
+    if frame[1] != function_code:
+        raise FrameError(f"功能码不符: 期望{function_code}, 实际{frame[1]}")
+
+
+def unpack_registers(frame, count: int) -> Tuple[int, ...]:
+    """
+    从功能码03响应帧中解析寄存器值
+
+    Args:
+        frame: 已校验的完整响应帧
+        count: 请求的寄存器数量
+
+    Returns:
+        Tuple[int, ...]: 寄存器值
+    """
+    if frame[2] != count * 2:
+        raise FrameError(f"响应字节数不符: 期望{count * 2}, 实际{frame[2]}")
+    return struct.unpack_from(f'>{count}H', frame, HEADER_SIZE)
+
+
+class RtuOverTcpTransport:
+    """
+    RTU over TCP传输
+
+    每次请求只读取一个完整的响应帧：先读3字节帧头，再根据字节数读取剩余部分，
+    收发都使用预分配的缓冲区，解析时通过memoryview访问不产生拷贝。
+    多线程调用时请求经RequestSerializer串行执行，相同的并发请求只发送一次。
+    连接由ConnectionManager在后台维护，设备不可用时请求立即失败。
+    """
+
+    def __init__(self, host: str, port: int = 502, timeout: float = 10.0, max_wait: float = 10.0,
+                 connection: Optional[ConnectionManager] = None):
+        """
+        初始化传输
+
+        Args:
+            host: 设备IP地址
+            port: 设备端口号，默认502
+            timeout: 收发超时时间，单位秒
+            max_wait: 排队等待连接的最长时间，单位秒
+            connection: 连接管理，默认以host、port、timeout创建
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = connection or ConnectionManager(host, port, timeout)
+        self.serializer = RequestSerializer(max_wait=max_wait)
+        self.metrics = get_registry().gateway(host, port)
+
+        self._request = bytearray(8)
+        self._buffer = bytearray(MAX_FRAME_SIZE)
+        self._view = memoryview(self._buffer)
+
+    @property
+    def connected(self) -> bool:
+        return self.connection.connected
+
+    def start(self):
+        """在后台建立连接，不阻塞调用者"""
+        self.connection.start()
+
+    def connect(self) -> bool:
+        """
+        立即建立TCP连接
+
+        Returns:
+            bool: 连接是否成功
+        """
+        return self.connection.connect()
+
+    def close(self):
+        """关闭TCP连接"""
+        self.connection.close()
+
+    def read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        """
+        功能码03读取连续的保持寄存器
+
+        Args:
+            slave_address: 从机地址
+            start: 起始寄存器地址
+            count: 寄存器数量
+
+        Returns:
+            Tuple[int, ...]: 寄存器值
+        """
+        return self.serializer.submit(
+            (slave_address, 0x03, start, count),
+            lambda: self._read_holding_registers(slave_address, start, count)
+        )
+
+    def _read_holding_registers(self, slave_address: int, start: int, count: int) -> Tuple[int, ...]:
+        pack_read_request(self._request, slave_address, start, count)
+        frame = self.transact(self._request, slave_address, 0x03)
+        return unpack_registers(frame, count)
+
+    def transact(self, request, slave_address: int, function_code: int) -> memoryview:
+        """
+        发送请求并接收一个完整的响应帧
+
+        Args:
+            request: 已带CRC的请求帧
+            slave_address: 期望的响应从机地址
+            function_code: 期望的响应功能码
+
+        Returns:
+            memoryview: 指向内部缓冲区的完整响应帧，下一次请求前有效
+
+        必须在串行器内调用，否则并发请求会共用同一个缓冲区。
+        """
+        metrics = self.metrics.device(slave_address)
+        start = time.perf_counter()
+        try:
+            frame = self._transact(request, slave_address, function_code)
+        except TransportError as e:
+            metrics.observe(time.perf_counter() - start, e)
+            raise
+        metrics.observe(time.perf_counter() - start)
+        return frame
+
+    def _transact(self, request, slave_address: int, function_code: int) -> memoryview:
+        sock = self.connection.acquire()
+        self.connection.check_slave(slave_address)
+        capture = get_capture()
+        try:
+            self._discard_input(sock)
+            debug = log.isEnabledFor(logging.DEBUG)
+            if debug:
+                log.debug("发送请求: %s", request.hex())
+            sock.sendall(request)
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, REQUEST, request)
+            frame = self._read_frame(sock)
+            while frame[0] != slave_address and self._is_intact(frame):
+                # 之前超时的从机迟到的响应，丢弃后继续等待本次的响应
+                log.debug("丢弃从机%d迟到的响应: %s", frame[0], frame.hex())
+                frame = self._read_frame(sock)
+            if debug:
+                log.debug("收到响应: %s", frame.hex())
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, RESPONSE, frame)
+            check_frame(frame, slave_address, function_code)
+        except socket.timeout:
+            # 只是该从机没有响应: 保留连接，迟到的响应在下一次请求前丢弃或按从机地址跳过
+            error = f"等待响应超时: {self.host}:{self.port}/{slave_address}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, TIMEOUT)
+            self.connection.mark_timeout(slave_address, error)
+            raise FrameTimeoutError(error)
+        except OSError as e:
+            error = f"设备通信中断 {self.host}:{self.port}: {str(e)}"
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, DISCONNECT, error.encode())
+            self.connection.mark_failed(error)
+            raise TransportConnectionError(error)
+        except TransportConnectionError as e:
+            # 对端关闭了连接，或响应只收到一部分
+            if capture is not None:
+                capture.record(self.host, self.port, slave_address, DISCONNECT, str(e).encode())
+            self.connection.mark_failed(str(e))
+            raise
+        except ExceptionResponse:
+            # 异常响应帧完整，设备在线，连接仍然可用
+            self.connection.mark_success(slave_address)
+            raise
+        except TransportError as e:
+            # 帧同步已丢失，重新建立连接以丢弃残留字节
+            self.connection.mark_failed(str(e))
+            raise
+        self.connection.mark_success(slave_address)
+        return frame
+
+    @staticmethod
+    def _is_intact(frame) -> bool:
+        # CRC正确的完整帧
+        return crc16(frame[:-2]) == struct.unpack_from('<H', frame, len(frame) - 2)[0]
+
+    def _read_frame(self, sock: socket.socket) -> memoryview:
+        self._recv_exact(sock, 0, HEADER_SIZE)
+        length = frame_length(self._buffer)
+        self._recv_exact(sock, HEADER_SIZE, length)
+        return self._view[:length]
+
+    def _recv_exact(self, sock: socket.socket, start: int, end: int):
+        view = self._view
+        while start < end:
+            try:
+                received = sock.recv_into(view[start:end])
+            except socket.timeout:
+                if start == 0:
+                    raise
+                # 帧只收到一部分，剩余字节可能随后到达，只能重新建立连接
+                raise TransportConnectionError(f"响应不完整: {self.host}:{self.port}")
+            if received == 0:
+                raise TransportConnectionError(f"设备关闭了连接: {self.host}:{self.port}")
+            start += received
+
+    def _discard_input(self, sock: socket.socket):
+        # 丢弃上一次请求之后到达的多余字节
+        while select.select([sock], [], [], 0)[0]:
+            if sock.recv_into(self._view) == 0:
+                raise TransportConnectionError(f"设备关闭了连接: {self.host}:{self.port}")
@@ -1,51 +1,37 @@
+import argparse
 import logging
 import sys
+from server.logsetup import setup_logging
 from server.server_pk9019 import PK9019Server, run
-from config.config import config
-
-def setup_logging():
-    """配置日志系统"""
-    log_config = config['logging']
-    root_config = log_config['root']
-    
-    # 创建日志格式器
-    formatter = logging.Formatter(root_config['format'])
-    
-    # 创建并配置文件处理器
-    file_handler = logging.FileHandler(root_config['file'], encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    
-    # 创建并配置控制台处理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    
-    # 配置根日志记录器
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, root_config['level']))
-    # 清除现有的处理器
-    root_logger.handlers.clear()
-    # 添加新的处理器
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
-    # 配置各个模块的日志级别
-    for module, level in log_config['modules'].items():
-        module_logger = logging.getLogger(module)
-        module_logger.setLevel(getattr(logging, level))
+from server.fleet import create_fleet_devices, fleet_devices
+from config.config import CONFIG_ENV, ConfigError, get_config
 
 def main():
-    # 设置日志
-    setup_logging()
-    
+    # 配置文件路径: --config参数、环境变量PK9019_CONFIG、当前目录下的configuration.yml
+    parser = argparse.ArgumentParser(description="PK9019 Tango设备服务器")
+    parser.add_argument('--config', help=f"配置文件路径，默认取环境变量{CONFIG_ENV}或configuration.yml")
+    args, _ = parser.parse_known_args()
+    try:
+        config = get_config(args.config)
+    except ConfigError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    # 设置日志: 经队列由后台线程写入控制台和轮转的日志文件
+    setup_logging(config.get('logging', {}))
+
     # 记录启动信息
-    logging.info("PK9019服务启动中...")
-    
-    # 运行服务器
+    logging.info("PK9019服务启动中... 配置文件 %s", config.path)
+
+    # 运行服务器，配置了设备列表时在启动后按列表创建设备
+    devices = fleet_devices()
+    if devices:
+        logging.info(f"按设备列表启动 {len(devices)} 个设备")
     try:
         run([PK9019Server], [
-            config['tango']['server_name'],
-            config['tango']['instance_name']
-        ])
+            config.server_name,
+            config.instance_name
+        ], post_init_callback=create_fleet_devices if devices else None)
     except Exception as e:
         logging.error(f"服务器启动失败: {str(e)}")
         sys.exit(1)
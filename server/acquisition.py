@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from device.metrics import get_registry
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """一次采集的结果快照"""
+    value: Any
+    timestamp: float  # 采集完成时刻(time.time())
+    monotonic: float  # 采集完成时刻(time.monotonic())，用于计算数据年龄
+
+    def age(self) -> float:
+        """快照距今的时间，单位秒"""
+        return time.monotonic() - self.monotonic
+
+
+def update_snapshot(target, value: Any) -> Snapshot:
+    """
+    为采集任务写入新快照并调用其on_update回调
+
+    Args:
+        target: 采集任务(AcquisitionLoop、PollJob或BusSlave)
+        value: 本次采集的值
+
+    Returns:
+        Snapshot: 新快照
+    """
+    snapshot = Snapshot(value=value, timestamp=time.time(), monotonic=time.monotonic())
+    target.snapshot = snapshot
+    if target.on_update is not None:
+        try:
+            target.on_update(snapshot)
+        except Exception as e:
+            log.error(f"快照回调失败 {target.name}: {str(e)}")
+    return snapshot
+
+
+class AcquisitionLoop:
+    """
+    后台采集循环
+
+    以固定周期调用 read_func 刷新快照，Tango 的 read_* 方法直接返回最新快照，
+    客户端读取不再触发设备通信。
+    """
+
+    def __init__(self, name: str, read_func: Callable[[], Any], interval: float = 1.0):
+        """
+        初始化采集循环
+
+        Args:
+            name: 采集循环名称，用于日志和线程名
+            read_func: 采集函数，每个周期调用一次
+            interval: 采集周期，单位秒
+        """
+        self.name = name
+        self.read_func = read_func
+        self.interval = interval
+        self.snapshot: Optional[Snapshot] = None
+        self.error: Optional[str] = None
+        # 每次采集成功后在采集线程中调用，参数为新快照
+        self.on_update: Optional[Callable[[Snapshot], None]] = None
+        self.metrics = get_registry().cycle(name)
+
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动采集线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"acq-{self.name}", daemon=True)
+        self._thread.start()
+        log.info(f"采集循环已启动: {self.name}, 周期 {self.interval}s")
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止采集线程"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        log.info(f"采集循环已停止: {self.name}")
+
+    def set_interval(self, interval: float):
+        """
+        修改采集周期，可在任意线程调用
+
+        周期缩短时立即按新周期重新安排下一次采集，不必等完旧周期。
+        """
+        shorter = interval < self.interval
+        self.interval = interval
+        if shorter:
+            self._wakeup.set()
+
+    def poll_once(self) -> Optional[Snapshot]:
+        """执行一次采集并更新快照，失败时保留上一次快照"""
+        try:
+            value = self.read_func()
+        except Exception as e:
+            if self.error is None:
+                log.error(f"采集失败 {self.name}: {str(e)}")
+            self.error = str(e)
+            return self.snapshot
+
+        if self.error is not None:
+            log.info(f"采集恢复: {self.name}")
+        self.error = None
+        return update_snapshot(self, value)
+
+    def _run(self):
+        # 以固定节拍运行，采集耗时不累积到周期中
+        next_time = time.monotonic()
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            finished = time.monotonic()
+            lateness = started - next_time
+            next_time += self.interval
+            delay = next_time - finished
+            self.metrics.observe(lateness, finished - started, delay < 0)
+            if delay < 0:
+                # 采集超时，跳过错过的节拍
+                next_time = finished
+            while not self._stop_event.is_set():
+                delay = next_time - time.monotonic()
+                if delay <= 0 or not self._wakeup.wait(delay):
+                    break
+                self._wakeup.clear()
+                # 周期被缩短，按新周期提前下一次采集
+                next_time = min(next_time, max(started + self.interval, time.monotonic()))
@@ -0,0 +1,73 @@
+import math
+from typing import Optional, Sequence
+
+
+class AdaptiveInterval:
+    """
+    按数值变化速率和订阅情况调整采集周期
+
+    以各通道变化速率的最大值估算"数值变化change_threshold所需的时间"作为目标周期：
+    变化快时立即缩短到目标周期，平稳时每次按backoff倍数逐步放慢，不超过上限。
+    有客户端订阅事件时上限为subscribed_interval，没有订阅时为max_interval。
+    断线(NaN)通道不参与计算。
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, subscribed_interval: float,
+                 change_threshold: float, backoff: float = 1.5):
+        """
+        初始化自适应周期
+
+        Args:
+            min_interval: 最短采集周期，单位秒
+            max_interval: 无人订阅且数值平稳时的最长采集周期，单位秒
+            subscribed_interval: 有客户端订阅事件时的最长采集周期，单位秒
+            change_threshold: 希望一个周期内数值变化不超过的量(如0.5℃)
+            backoff: 平稳时每次放慢的倍数
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f"采集周期上下限无效: {min_interval}~{max_interval}")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.subscribed_interval = min(max(subscribed_interval, min_interval), max_interval)
+        self.change_threshold = change_threshold
+        self.backoff = backoff
+        self.interval = self.subscribed_interval
+        self.rate = 0.0  # 最近一次估算的最大变化速率(每秒)
+
+        self._last_values: Optional[Sequence[float]] = None
+        self._last_time = 0.0
+
+    def update(self, values: Sequence[float], monotonic: float, subscribed: bool) -> float:
+        """
+        根据新采集的数值计算下一个采集周期
+
+        Args:
+            values: 本次采集的数值，断线为NaN
+            monotonic: 采集时刻(time.monotonic())
+            subscribed: 是否有客户端订阅了相关事件
+
+        Returns:
+            float: 新的采集周期，单位秒
+        """
+        last, elapsed = self._last_values, monotonic - self._last_time
+        self._last_values, self._last_time = values, monotonic
+        ceiling = self.subscribed_interval if subscribed else self.max_interval
+        if last is None or elapsed <= 0:
+            self.interval = min(self.interval, ceiling)
+            return self.interval
+
+        change = 0.0
+        for old, new in zip(last, values):
+            delta = abs(new - old)
+            # NaN参与比较时结果为False，断线通道自然被跳过
+            if delta > change:
+                change = delta
+        self.rate = change / elapsed
+
+        target = self.change_threshold / self.rate if self.rate > 0 else math.inf
+        target = min(max(target, self.min_interval), ceiling)
+        if target < self.interval:
+            self.interval = target
+        else:
+            self.interval = min(target, self.interval * self.backoff)
+        return self.interval
@@ -0,0 +1,332 @@
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# 告警位，每个通道的告警状态为以下各位的组合
+ALARM_HI = 1  # 高于上限
+ALARM_LO = 2  # 低于下限
+ALARM_RATE = 4  # 变化速率超限
+ALARM_DISCONNECT = 8  # 断线
+ALARM_STALE = 16  # 长时间未更新
+ALARM_NAMES = ('hi', 'lo', 'rate', 'disconnect', 'stale')
+_BIT_COUNT = len(ALARM_NAMES)
+_BIT_VALUES = (1 << np.arange(_BIT_COUNT)).astype(np.int64)
+HI, LO, RATE, DISCONNECT, STALE = range(_BIT_COUNT)
+
+
+def alarm_names(bits: int) -> List[str]:
+    """把告警位转换为名称列表，如 ['hi', 'rate']"""
+    return [name for i, name in enumerate(ALARM_NAMES) if bits & (1 << i)]
+
+
+@dataclass(frozen=True)
+class AlarmRule:
+    """
+    单个通道的告警规则
+
+    上下限和速率为NaN时不检查；hysteresis为上下限告警的回差，告警后数值需回到
+    限值以内hysteresis才恢复；delay为条件持续多久才告警(恢复同样需要持续delay)；
+    stale为0时不检查长时间未更新。
+    """
+    hi: float = math.nan
+    lo: float = math.nan
+    rate: float = math.nan  # 最大变化速率(每秒)，按相邻两次采集计算
+    hysteresis: float = 0.0
+    delay: float = 0.0  # 单位秒
+    stale: float = 0.0  # 单位秒
+    disconnect: bool = True  # 是否对断线(NaN)告警
+
+
+def parse_alarm_rules(settings: Optional[Dict[str, Any]], channels: int) -> List[AlarmRule]:
+    """
+    解析一个属性的告警配置，单个数值对所有通道生效，列表按通道分别配置
+
+    configuration.yml示例：
+        alarms:
+          channel_temps:
+            hi: [80, 80, 80, 80, 120, 120, 120, 120]
+            lo: -10
+            rate: 2.0          # ℃/s
+            hysteresis: 1.0
+            delay: 3
+            stale: 10
+            disconnect: true
+
+    Args:
+        settings: 属性的告警配置
+        channels: 通道数
+
+    Returns:
+        List[AlarmRule]: 每个通道的告警规则
+    """
+    settings = settings or {}
+    defaults = AlarmRule()
+
+    def per_channel(key: str, convert) -> list:
+        value = settings.get(key)
+        if value is None:
+            return [getattr(defaults, key)] * channels
+        if isinstance(value, (list, tuple)):
+            if len(value) != channels:
+                raise ValueError(f"告警配置 {key} 需要 {channels} 个值，实际 {len(value)} 个")
+            return [getattr(defaults, key) if v is None else convert(v) for v in value]
+        return [convert(value)] * channels
+
+    unknown = set(settings) - set(AlarmRule.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"告警配置中有未知的项: {', '.join(sorted(unknown))}")
+    keys = list(AlarmRule.__dataclass_fields__)
+    columns = [per_channel(key, bool if key == 'disconnect' else float) for key in keys]
+    return [AlarmRule(*values) for values in zip(*columns)]
+
+
+class AlarmBlock:
+    """
+    告警表中属于一个属性的连续通道
+
+    采集回调通过submit写入新值，读取属性时通过bits、active等取出最近一次评估的结果。
+    """
+
+    def __init__(self, engine: 'AlarmEngine', name: str, offset: int, rules: Sequence[AlarmRule]):
+        self.engine = engine
+        self.name = name
+        self.offset = offset
+        self.size = len(rules)
+        self.rules = list(rules)
+        # 告警状态变化时在评估线程中调用，参数为本对象
+        self.on_change: Optional[Callable[['AlarmBlock'], None]] = None
+
+    def submit(self, values: Sequence[float], monotonic: float):
+        """写入一次采集的数值，断线为NaN；告警在下一次评估时更新"""
+        self.engine.submit(self, values, monotonic)
+
+    def bits(self) -> np.ndarray:
+        """各通道最近一次评估的告警位"""
+        return self.engine.bits(self)
+
+    @property
+    def active(self) -> bool:
+        """是否有任一通道处于告警"""
+        return bool(self.bits().any())
+
+    def mask(self, bit: int) -> int:
+        """指定告警位的通道位掩码，第i位表示通道i，如mask(ALARM_DISCONNECT)为断线位掩码"""
+        mask = 0
+        for i, value in enumerate(self.bits()):
+            if value & bit:
+                mask |= 1 << i
+        return mask
+
+
+class AlarmEngine:
+    """
+    进程内所有设备共享的告警评估
+
+    所有通道的数值、规则和告警状态按通道存放在一组NumPy数组中，采集回调只写入数值，
+    评估线程在有新数据时(或每tick秒，用于延时和未更新检查)对全部通道做一次向量化计算，
+    同一时间到达的多个快照合并为一次评估。每个客户端读取时不再重复判断阈值。
+    """
+
+    def __init__(self, tick: float = 0.5, capacity: int = 64):
+        """
+        初始化告警评估
+
+        Args:
+            tick: 没有新数据时的评估间隔，单位秒，决定delay和stale的分辨率
+            capacity: 初始通道数，不够时自动扩容
+        """
+        self.tick = tick
+        self.evaluations = 0
+        self._blocks: Dict[int, AlarmBlock] = {}
+        self._free: List[AlarmBlock] = []
+        self._size = 0
+        self._allocate(capacity)
+
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _allocate(self, capacity: int):
+        """按capacity重新分配数组，保留已有通道"""
+        columns = (
+            ('_value', np.nan, np.float64), ('_previous', np.nan, np.float64),
+            ('_time', np.nan, np.float64), ('_previous_time', np.nan, np.float64),
+            ('_hi', np.nan, np.float64), ('_lo', np.nan, np.float64),
+            ('_rate', np.nan, np.float64), ('_hysteresis', 0.0, np.float64),
+            ('_delay', 0.0, np.float64), ('_stale', 0.0, np.float64),
+            ('_disconnect', False, bool), ('_owner', -1, np.int64), ('_bits', 0, np.int64),
+        )
+        for name, fill, dtype in columns:
+            array = np.full(capacity, fill, dtype=dtype)
+            if hasattr(self, name):
+                array[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, array)
+        # 每个通道每个告警位的状态，和条件开始与状态不同的时刻(NaN表示相同)
+        for name, fill, dtype in (('_active', False, bool), ('_since', np.nan, np.float64)):
+            array = np.full((capacity, _BIT_COUNT), fill, dtype=dtype)
+            if hasattr(self, name):
+                array[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def register(self, name: str, rules: Sequence[AlarmRule]) -> AlarmBlock:
+        """
+        为一个属性的通道分配告警表中的位置
+
+        Args:
+            name: 名称，用于日志，如 "lact/pk9019/1/channel_temps"
+            rules: 每个通道的规则
+
+        Returns:
+            AlarmBlock: 通道块
+        """
+        with self._lock:
+            block = next((b for b in self._free if b.size == len(rules)), None)
+            if block is not None:
+                self._free.remove(block)
+                offset = block.offset
+            else:
+                offset = self._size
+                if offset + len(rules) > self.capacity:
+                    self._allocate(max(self.capacity * 2, offset + len(rules)))
+                self._size = offset + len(rules)
+            block = AlarmBlock(self, name, offset, rules)
+            span = slice(offset, offset + block.size)
+            for key in ('hi', 'lo', 'rate', 'hysteresis', 'delay', 'stale', 'disconnect'):
+                getattr(self, f'_{key}')[span] = [getattr(rule, key) for rule in rules]
+            for array, fill in ((self._value, np.nan), (self._previous, np.nan), (self._time, np.nan),
+                                (self._previous_time, np.nan), (self._active, False), (self._since, np.nan),
+                                (self._bits, 0)):
+                array[span] = fill
+            self._owner[span] = offset
+            self._blocks[offset] = block
+        return block
+
+    def unregister(self, block: AlarmBlock):
+        """释放通道块，位置留给之后注册的同样大小的块"""
+        with self._lock:
+            if self._blocks.get(block.offset) is not block:
+                return
+            del self._blocks[block.offset]
+            block.on_change = None
+            span = slice(block.offset, block.offset + block.size)
+            self._owner[span] = -1
+            self._bits[span] = 0
+            self._active[span] = False
+            self._free.append(block)
+
+    def submit(self, block: AlarmBlock, values: Sequence[float], monotonic: float):
+        """写入一个通道块的新数值并唤醒评估线程"""
+        span = slice(block.offset, block.offset + block.size)
+        with self._lock:
+            self._previous[span] = self._value[span]
+            self._previous_time[span] = self._time[span]
+            self._value[span] = values
+            self._time[span] = monotonic
+        self._pending.set()
+
+    def bits(self, block: AlarmBlock) -> np.ndarray:
+        """通道块各通道的告警位"""
+        return self._bits[block.offset:block.offset + block.size].copy()
+
+    def evaluate(self, now: Optional[float] = None) -> List[AlarmBlock]:
+        """
+        对全部通道评估一次告警
+
+        Args:
+            now: 当前时刻(time.monotonic())
+
+        Returns:
+            List[AlarmBlock]: 告警状态有变化的通道块
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            n = self._size
+            value, active, since = self._value[:n], self._active[:n], self._since[:n]
+            hysteresis = self._hysteresis[:n]
+            used = self._owner[:n] >= 0
+            sampled = used & ~np.isnan(self._time[:n])
+
+            condition = np.zeros((n, _BIT_COUNT), dtype=bool)
+            # NaN参与比较时结果为False，未配置的限值和断线通道自然不触发
+            with np.errstate(invalid='ignore', divide='ignore'):
+                condition[:, HI] = (value > self._hi[:n]) | (active[:, HI] & (value > self._hi[:n] - hysteresis))
+                condition[:, LO] = (value < self._lo[:n]) | (active[:, LO] & (value < self._lo[:n] + hysteresis))
+                elapsed = self._time[:n] - self._previous_time[:n]
+                rate = np.abs(value - self._previous[:n]) / elapsed
+                condition[:, RATE] = (elapsed > 0) & (rate > self._rate[:n])
+            condition[:, DISCONNECT] = sampled & self._disconnect[:n] & np.isnan(value)
+            condition[:, STALE] = sampled & (self._stale[:n] > 0) & (now - self._time[:n] > self._stale[:n])
+            condition &= used[:, None]
+
+            # 条件与当前状态不同并持续delay后才切换，期间恢复原状则重新计时
+            differs = condition != active
+            since[:] = np.where(differs, np.where(np.isnan(since), now, since), np.nan)
+            flip = differs & (now - since >= self._delay[:n, None])
+            active ^= flip
+            since[flip] = np.nan
+
+            bits = active @ _BIT_VALUES
+            changed = np.flatnonzero(bits != self._bits[:n])
+            self._bits[:n] = bits
+            blocks = [self._blocks[offset] for offset in np.unique(self._owner[changed]) if offset >= 0]
+            self.evaluations += 1
+        return blocks
+
+    def start(self):
+        """启动评估线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="alarm-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止评估线程"""
+        self._stop_event.set()
+        self._pending.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._pending.wait(self.tick)
+            self._pending.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                changed = self.evaluate()
+            except Exception as e:
+                log.error("告警评估失败: %s", e)
+                continue
+            for block in changed:
+                callback = block.on_change
+                if callback is None:
+                    continue
+                try:
+                    callback(block)
+                except Exception as e:
+                    log.error("告警回调失败 %s: %s", block.name, e)
+
+
+_engine: Optional[AlarmEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_alarm_engine() -> AlarmEngine:
+    """获取进程内共享的告警评估，首次调用时启动评估线程"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlarmEngine()
+            _engine.start()
+        return _engine
@@ -0,0 +1,221 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Callable, List, Optional
+
+from device.metrics import get_registry
+from server.acquisition import Snapshot, update_snapshot
+
+log = logging.getLogger(__name__)
+
+
+class PollJob:
+    """
+    调度器中的一个采集任务
+
+    与AcquisitionLoop一样对外提供snapshot和error，
+    PK9019Server读取属性时不区分两种采集方式。
+    """
+
+    def __init__(self, name: str, read_func: Callable[[], Awaitable[Any]], interval: float = 1.0,
+                 deadline: Optional[float] = None):
+        """
+        初始化采集任务
+
+        Args:
+            name: 任务名称，用于日志
+            read_func: 采集协程函数，每个周期调用一次
+            interval: 采集周期，单位秒
+            deadline: 单次采集的截止时间，单位秒，默认等于采集周期
+        """
+        self.name = name
+        self.read_func = read_func
+        self.interval = interval
+        self.deadline = deadline if deadline is not None else interval
+        self.snapshot: Optional[Snapshot] = None
+        self.error: Optional[str] = None
+        # 每次采集成功后在事件循环线程中调用，参数为新快照
+        self.on_update: Optional[Callable[[Snapshot], None]] = None
+        self.task: Optional[asyncio.Task] = None
+        self.metrics = get_registry().cycle(name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sleeper: Optional[asyncio.Future] = None
+
+    def set_interval(self, interval: float):
+        """
+        修改采集周期，可在任意线程调用
+
+        周期缩短时立即按新周期重新安排下一次采集，不必等完旧周期。
+        """
+        shorter = interval < self.interval
+        self.interval = interval
+        if shorter and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if self._sleeper is not None and not self._sleeper.done():
+            self._sleeper.set_result(None)
+
+    async def poll_once(self) -> Optional[Snapshot]:
+        """执行一次采集并更新快照，失败或超过截止时间时保留上一次快照"""
+        try:
+            value = await asyncio.wait_for(self.read_func(), self.deadline)
+        except asyncio.TimeoutError:
+            self._set_error(f"采集超过截止时间 {self.deadline}s")
+            return self.snapshot
+        except Exception as e:
+            self._set_error(str(e))
+            return self.snapshot
+
+        if self.error is not None:
+            log.info(f"采集恢复: {self.name}")
+        self.error = None
+        return update_snapshot(self, value)
+
+    def _set_error(self, error: str):
+        if self.error is None:
+            log.error(f"采集失败 {self.name}: {error}")
+        self.error = error
+
+    async def run(self):
+        # 以固定节拍运行，采集耗时不累积到周期中
+        loop = self._loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            started = loop.time()
+            await self.poll_once()
+            finished = loop.time()
+            lateness = started - next_time
+            next_time += self.interval
+            delay = next_time - finished
+            self.metrics.observe(lateness, finished - started, delay < 0)
+            if delay < 0:
+                # 采集超时，跳过错过的节拍
+                next_time = finished
+                await asyncio.sleep(0)
+            # 与asyncio.sleep相同的定时future，set_interval可提前唤醒
+            while loop.time() < next_time:
+                self._sleeper = loop.create_future()
+                timer = loop.call_at(next_time, self._wake)
+                try:
+                    await self._sleeper
+                finally:
+                    timer.cancel()
+                    self._sleeper = None
+                # 周期被缩短时按新周期提前下一次采集
+                next_time = min(next_time, max(started + self.interval, loop.time()))
+
+
+class AsyncPollScheduler:
+    """
+    asyncio采集调度器
+
+    在独立线程中运行一个事件循环，所有设备的采集任务并发执行、互不阻塞，
+    单个设备变慢或掉线只影响它自己的任务。
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.jobs: List[PollJob] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动事件循环线程"""
+        with self._lock:
+            if self.running:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="async-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+        log.info("采集调度器已启动")
+
+    def stop(self, timeout: Optional[float] = None):
+        """取消所有采集任务并停止事件循环"""
+        with self._lock:
+            if not self.running:
+                return
+            for job in list(self.jobs):
+                self.remove_job(job)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+        log.info("采集调度器已停止")
+
+    def add_job(self, name: str, read_func: Callable[[], Awaitable[Any]], interval: float = 1.0,
+                deadline: Optional[float] = None) -> PollJob:
+        """
+        添加采集任务，调度器未启动时自动启动
+
+        Args:
+            name: 任务名称
+            read_func: 采集协程函数
+            interval: 采集周期，单位秒
+            deadline: 单次采集的截止时间，单位秒
+
+        Returns:
+            PollJob: 采集任务，其snapshot由调度器持续刷新
+        """
+        self.start()
+        job = PollJob(name, read_func, interval, deadline)
+        self.jobs.append(job)
+        self.loop.call_soon_threadsafe(self._start_job, job)
+        return job
+
+    def remove_job(self, job: PollJob):
+        """取消采集任务"""
+        if job in self.jobs:
+            self.jobs.remove(job)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._cancel_job, job)
+
+    def run_coroutine(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """
+        在调度器的事件循环中执行协程，可在任意线程调用
+
+        Returns:
+            concurrent.futures.Future: 协程结果
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _start_job(self, job: PollJob):
+        job.task = self.loop.create_task(job.run())
+
+    @staticmethod
+    def _cancel_job(job: PollJob):
+        if job.task is not None:
+            job.task.cancel()
+            job.task = None
+
+    def _run(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+
+_scheduler: Optional[AsyncPollScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> AsyncPollScheduler:
+    """获取进程内共享的采集调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AsyncPollScheduler()
+        return _scheduler
@@ -0,0 +1,191 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# 数值质量，与Tango AttrQuality的数值相同
+QUALITY_VALID = 0
+QUALITY_INVALID = 1
+QUALITY_ALARM = 2
+
+# 打包结果中数值数组前的头部: [通道数, 设备数]
+HEADER_SIZE = 2
+
+
+@dataclass
+class BulkSource:
+    """
+    一个设备属性的批量读取来源
+
+    read返回(各通道数值, 采集时间戳, 质量)，尚未采集到数据时返回None。
+    """
+    device: str
+    attribute: str
+    channels: int
+    read: Callable[[], Optional[Tuple[Sequence[float], float, int]]]
+    group: str = ''
+
+
+@dataclass
+class BulkSnapshot:
+    """全部(或一组)设备的最新数值，各数组按通道对齐"""
+    values: np.ndarray  # float64，无数据时为NaN
+    timestamps: np.ndarray  # float64，time.time()，无数据时为0
+    quality: np.ndarray  # int8，QUALITY_*
+    device_index: np.ndarray  # int32，通道所属设备在devices中的位置
+    devices: List[str]
+    channels: List[str]  # 通道名称，如 channel_temps[3]
+
+    def labels(self) -> List[str]:
+        """通道的完整名称，如 lact/pk9019/1/channel_temps[3]"""
+        return [f"{self.devices[d]}/{c}" for d, c in zip(self.device_index, self.channels)]
+
+
+class _Layout:
+    # 一组来源的通道排列，来源变化前一直复用
+
+    def __init__(self, sources: List[BulkSource]):
+        self.sources = sources
+        self.devices: List[str] = []
+        positions: Dict[str, int] = {}
+        index, self.channels, self.offsets = [], [], []
+        for source in sources:
+            if source.device not in positions:
+                positions[source.device] = len(self.devices)
+                self.devices.append(source.device)
+            device = positions[source.device]
+            self.offsets.append(len(self.channels))
+            index += [device] * source.channels
+            self.channels += ([f"{source.attribute}[{i}]" for i in range(source.channels)]
+                              if source.channels > 1 else [source.attribute])
+        self.device_index = np.array(index, dtype=np.int32)
+
+
+class BulkRegistry:
+    """
+    进程内所有设备属性的批量读取
+
+    设备初始化时注册各属性的来源，read一次取出全部来源的最新快照并按通道排列，
+    客户端一次调用即可刷新全部通道，不再逐个设备读取属性。
+    """
+
+    def __init__(self):
+        self._sources: List[BulkSource] = []
+        self._layouts: Dict[Tuple[str, ...], _Layout] = {}
+        self._lock = threading.Lock()
+
+    def register(self, source: BulkSource):
+        """注册一个来源，同一设备的同名属性替换旧的来源"""
+        with self._lock:
+            self._sources = [s for s in self._sources
+                             if (s.device, s.attribute) != (source.device, source.attribute)]
+            self._sources.append(source)
+            self._layouts.clear()
+
+    def unregister(self, device: str):
+        """移除设备的全部来源"""
+        with self._lock:
+            self._sources = [s for s in self._sources if s.device != device]
+            self._layouts.clear()
+
+    def _layout(self, groups: Tuple[str, ...]) -> _Layout:
+        with self._lock:
+            layout = self._layouts.get(groups)
+            if layout is None:
+                sources = [s for s in self._sources if not groups or s.group in groups]
+                layout = self._layouts[groups] = _Layout(sources)
+            return layout
+
+    def read(self, group: str = '') -> BulkSnapshot:
+        """
+        读取全部来源的最新快照
+
+        Args:
+            group: 设备组，多个组用逗号分隔，为空表示全部设备
+
+        Returns:
+            BulkSnapshot: 按设备注册顺序排列的通道数值
+        """
+        groups = tuple(sorted({g.strip() for g in group.split(',') if g.strip()}))
+        layout = self._layout(groups)
+        size = len(layout.channels)
+        values = np.full(size, math.nan)
+        timestamps = np.zeros(size)
+        quality = np.full(size, QUALITY_INVALID, dtype=np.int8)
+        for source, offset in zip(layout.sources, layout.offsets):
+            try:
+                result = source.read()
+            except Exception as e:
+                log.debug("批量读取失败 %s/%s: %s", source.device, source.attribute, e)
+                continue
+            if result is None:
+                continue
+            value, timestamp, value_quality = result
+            end = offset + source.channels
+            values[offset:end] = value
+            timestamps[offset:end] = timestamp
+            quality[offset:end] = int(value_quality)
+        return BulkSnapshot(values, timestamps, quality, layout.device_index, layout.devices, layout.channels)
+
+
+def pack_bulk(snapshot: BulkSnapshot) -> Tuple[List[float], List[str]]:
+    """
+    打包为Tango的DevVarDoubleStringArray
+
+    Returns:
+        Tuple[List[float], List[str]]:
+            数值部分为 [通道数N, 设备数D, 数值xN, 时间戳xN, 质量xN, 设备序号xN]，
+            字符串部分为 [设备名称xD, 通道名称xN]
+    """
+    size = len(snapshot.channels)
+    doubles = np.empty(HEADER_SIZE + 4 * size)
+    doubles[0] = size
+    doubles[1] = len(snapshot.devices)
+    for i, column in enumerate((snapshot.values, snapshot.timestamps, snapshot.quality, snapshot.device_index)):
+        start = HEADER_SIZE + i * size
+        doubles[start:start + size] = column
+    return doubles.tolist(), list(snapshot.devices) + list(snapshot.channels)
+
+
+def unpack_bulk(doubles: Sequence[float], strings: Sequence[str]) -> BulkSnapshot:
+    """
+    解析pack_bulk的结果，供客户端使用
+
+    Args:
+        doubles: ReadAll返回的数值部分
+        strings: ReadAll返回的字符串部分
+
+    Returns:
+        BulkSnapshot: 全部通道的数值
+    """
+    doubles = np.asarray(doubles, dtype=np.float64)
+    size, count = int(doubles[0]), int(doubles[1])
+    if len(doubles) != HEADER_SIZE + 4 * size or len(strings) != count + size:
+        raise ValueError(f"批量读取结果长度不符: {len(doubles)} 个数值, {len(strings)} 个字符串")
+    columns = doubles[HEADER_SIZE:].reshape(4, size)
+    return BulkSnapshot(
+        values=columns[0].copy(),
+        timestamps=columns[1].copy(),
+        quality=columns[2].astype(np.int8),
+        device_index=columns[3].astype(np.int32),
+        devices=list(strings[:count]),
+        channels=list(strings[count:])
+    )
+
+
+_registry: Optional[BulkRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_bulk_registry() -> BulkRegistry:
+    """获取进程内共享的批量读取注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BulkRegistry()
+        return _registry
@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from device.exceptions import ExceptionResponse, FrameTimeoutError, SlaveUnavailableError
+from device.framing import FRAMING_RTU, FRAMING_SERIAL, create_transport
+from device.metrics import get_registry
+from device.serial_rtu import rtu_silent_interval
+from server.acquisition import Snapshot, update_snapshot
+
+log = logging.getLogger(__name__)
+
+# 调度策略
+ROUND_ROBIN = 'round_robin'
+PRIORITY = 'priority'
+
+# 计入从机退避的错误: 从机超时、异常响应或从机断路器断开
+SLAVE_ERRORS = (FrameTimeoutError, ExceptionResponse, SlaveUnavailableError)
+
+
+class BusSlave:
+    """
+    总线上的一个从机采集任务
+
+    与AcquisitionLoop一样对外提供snapshot和error。
+    """
+
+    def __init__(self, name: str, read_func: Callable[[], Any], priority: int = 0):
+        self.name = name
+        self.read_func = read_func
+        self.priority = priority
+        self.snapshot: Optional[Snapshot] = None
+        self.error: Optional[str] = None
+        self.failures = 0
+        self.skip_cycles = 0
+        # 本从机的采集周期，None表示每轮都访问；短于总线周期时按总线周期
+        self.interval: Optional[float] = None
+        self.next_due = 0.0
+        # 每次采集成功后在总线线程中调用，参数为新快照
+        self.on_update: Optional[Callable[[Snapshot], None]] = None
+
+    def set_interval(self, interval: float):
+        """修改本从机的采集周期，未到期的轮次跳过本从机"""
+        if self.interval is None or interval < self.interval:
+            # 周期缩短时下一轮立即访问
+            self.next_due = 0.0
+        self.interval = interval
+
+
+class BusScheduler:
+    """
+    网关级总线调度器
+
+    一个串口转TCP网关后的所有从机共用一个连接，由一个线程轮流访问，
+    帧之间保证RTU静默时间；连续无响应的从机按指数退避跳过若干轮，避免占用总线。
+    """
+
+    def __init__(self, host: str, port: int, interval: float = 1.0, baudrate: int = 9600,
+                 response_timeout: float = 0.5, policy: str = ROUND_ROBIN, max_skip: int = 16,
+                 framing: str = FRAMING_RTU):
+        """
+        初始化总线调度器
+
+        Args:
+            host: 网关IP地址
+            port: 网关端口号
+            interval: 轮询周期，单位秒；一轮耗时超过周期时立即开始下一轮
+            baudrate: 总线波特率，用于计算帧间静默时间
+            response_timeout: 从机响应超时时间，单位秒
+            policy: 调度策略，round_robin(每轮轮换起点) 或 priority(按优先级从高到低)
+            max_skip: 无响应从机最多跳过的轮数
+            framing: 帧格式，serial时host为串口设备路径、port为波特率，baudrate取port
+        """
+        if framing == FRAMING_SERIAL:
+            baudrate = int(port)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.inter_frame_gap = rtu_silent_interval(baudrate)
+        self.policy = policy
+        self.max_skip = max_skip
+        self.transport = create_transport(host, port, response_timeout, framing)
+        self.slaves: List[BusSlave] = []
+
+        # 统计
+        self.cycle_time = 0.0
+        self.utilization = 0.0
+        self.cycles = 0
+        self.metrics = get_registry().cycle(f"bus-{host}:{port}")
+
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_slave(self, name: str, read_func: Callable[[], Any], priority: int = 0) -> BusSlave:
+        """
+        添加从机采集任务，调度器未启动时自动启动
+
+        Args:
+            name: 任务名称
+            read_func: 采集函数，需使用本调度器的transport
+            priority: 优先级，priority策略下数值大的先访问
+
+        Returns:
+            BusSlave: 采集任务，其snapshot由调度器持续刷新
+        """
+        slave = BusSlave(name, read_func, priority)
+        with self._lock:
+            self.slaves.append(slave)
+        self.start()
+        return slave
+
+    def remove_slave(self, slave: BusSlave) -> bool:
+        """
+        移除从机采集任务
+
+        Returns:
+            bool: 总线上是否已没有从机
+        """
+        with self._lock:
+            if slave in self.slaves:
+                self.slaves.remove(slave)
+            return not self.slaves
+
+    def start(self):
+        """启动调度线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"bus-{self.host}:{self.port}", daemon=True)
+        self._thread.start()
+        log.info(f"总线调度器已启动: {self.host}:{self.port}, 帧间隔 {self.inter_frame_gap * 1000:.2f}ms")
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止调度线程并关闭连接"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.transport.close()
+        log.info(f"总线调度器已停止: {self.host}:{self.port}")
+
+    def stats(self) -> Dict[str, float]:
+        """
+        总线统计
+
+        Returns:
+            Dict[str, float]: cycle_time(上一轮耗时，秒)、utilization(上一周期总线占用率)、cycles(已完成轮数)
+        """
+        return {
+            'cycle_time': self.cycle_time,
+            'utilization': self.utilization,
+            'cycles': self.cycles,
+        }
+
+    def _ordered_slaves(self) -> List[BusSlave]:
+        with self._lock:
+            slaves = list(self.slaves)
+        if self.policy == PRIORITY:
+            return sorted(slaves, key=lambda s: -s.priority)
+        if slaves:
+            # 每轮轮换起点，避免排在后面的从机总是被前面的超时拖延
+            self._offset = (self._offset + 1) % len(slaves)
+            slaves = slaves[self._offset:] + slaves[:self._offset]
+        return slaves
+
+    def poll_cycle(self):
+        """执行一轮总线访问并更新统计"""
+        cycle_start = time.monotonic()
+        busy = 0.0
+        last_frame_end = 0.0
+
+        for slave in self._ordered_slaves():
+            if self._stop_event.is_set():
+                return
+            if slave.skip_cycles > 0:
+                slave.skip_cycles -= 1
+                continue
+            if slave.interval is not None and time.monotonic() < slave.next_due:
+                continue
+
+            # 保证帧间静默时间
+            gap = last_frame_end + self.inter_frame_gap - time.monotonic()
+            if gap > 0:
+                time.sleep(gap)
+
+            start = time.monotonic()
+            if slave.interval is not None:
+                # 留半个总线周期的余量，周期为总线周期整数倍的从机不会被推迟一轮
+                slave.next_due = start + slave.interval - self.interval / 2
+            try:
+                value = slave.read_func()
+            except Exception as e:
+                self._on_failure(slave, e)
+            else:
+                if slave.error is not None:
+                    log.info(f"从机恢复: {slave.name}")
+                slave.error = None
+                slave.failures = 0
+                update_snapshot(slave, value)
+            last_frame_end = time.monotonic()
+            busy += last_frame_end - start
+
+        self.cycle_time = time.monotonic() - cycle_start
+        # 占用率按实际周期计算，一轮耗时不足周期时剩余时间总线空闲
+        period = max(self.cycle_time, self.interval)
+        self.utilization = busy / period if period > 0 else 0.0
+        self.cycles += 1
+
+    def _on_failure(self, slave: BusSlave, error: Exception):
+        if slave.error is None:
+            log.error(f"从机无响应 {slave.name}: {error}")
+        slave.error = str(error)
+        if not isinstance(error, SLAVE_ERRORS):
+            # 网关连接中断或正在重连，不是该从机的问题，不推迟它的采集
+            return
+        slave.failures += 1
+        slave.skip_cycles = min(2 ** (slave.failures - 1), self.max_skip)
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.poll_cycle()
+            finished = time.monotonic()
+            lateness = started - next_time
+            next_time += self.interval
+            delay = next_time - finished
+            self.metrics.observe(lateness, finished - started, delay < 0)
+            if delay < 0:
+                next_time = finished
+                delay = 0
+            self._stop_event.wait(delay)
@@ -0,0 +1,110 @@
+from typing import Tuple
+
+import numpy as np
+
+from server.history import COLUMNS, TIMESTAMP, VALUES
+
+# 降采样结果中的数值列
+VALUE_COLUMNS = COLUMNS[VALUES]
+# 每个数值列的聚合统计量
+AGGREGATES = ('min', 'max', 'mean', 'last')
+
+
+def aggregate(records: np.ndarray, start: float, end: float, buckets: int) -> np.ndarray:
+    """
+    按等宽时间桶聚合采集记录
+
+    所有数值列一次性向量化计算，记录须按时间排序；NaN(断线或缺失)不参与min/max/mean。
+
+    Args:
+        records: 采集记录，形状为(n, len(COLUMNS))
+        start: 起始时间戳
+        end: 结束时间戳
+        buckets: 时间桶数量
+
+    Returns:
+        np.ndarray: 形状为(m, 1 + len(VALUE_COLUMNS) * 4)，m为非空桶数；
+            第0列为桶起始时间戳，之后每个数值列依次为min、max、mean、last
+    """
+    if buckets <= 0 or end <= start:
+        raise ValueError(f"无效的降采样参数: start={start}, end={end}, buckets={buckets}")
+
+    timestamps = records[:, TIMESTAMP]
+    # 按列连续存储后沿时间轴归约，HistoryBuffer的查询结果转置后即是连续的，不产生拷贝
+    values = np.ascontiguousarray(records[:, VALUES].T)
+    columns = values.shape[0]
+    width = (end - start) / buckets
+    if not len(records):
+        return np.empty((0, 1 + columns * len(AGGREGATES)))
+
+    # 记录已按时间排序，每个桶对应一段连续的行
+    bucket_ids = np.clip(((timestamps - start) // width).astype(np.int64), 0, buckets - 1)
+    offsets = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+    lasts = np.r_[offsets[1:], len(records)] - 1
+
+    missing = np.isnan(values)
+    counts = np.add.reduceat(~missing, offsets, axis=1, dtype=np.int64)
+    sums = np.add.reduceat(np.where(missing, 0.0, values), offsets, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    result = np.empty((len(offsets), 1 + columns * len(AGGREGATES)))
+    result[:, 0] = start + bucket_ids[offsets] * width
+    stats = result[:, 1:].reshape(len(offsets), columns, len(AGGREGATES))
+    stats[:, :, 0] = np.fmin.reduceat(values, offsets, axis=1).T
+    stats[:, :, 1] = np.fmax.reduceat(values, offsets, axis=1).T
+    stats[:, :, 2] = means.T
+    stats[:, :, 3] = values[:, lasts].T
+    return result
+
+
+def lttb(records: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets降采样，保留峰谷形状
+
+    对所有数值列同时计算，每列独立选点。
+
+    Args:
+        records: 按时间排序的采集记录，形状为(n, len(COLUMNS))
+        points: 每列保留的点数，至少为3
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (timestamps, values)，形状均为(k, len(VALUE_COLUMNS))，
+            第j列为数值列j选中的点；n不超过points时原样返回
+    """
+    if points < 3:
+        raise ValueError(f"LTTB至少需要3个点: {points}")
+
+    x = records[:, TIMESTAMP]
+    y = records[:, VALUES]
+    n, columns = y.shape
+    if n <= points:
+        return np.repeat(x[:, None], columns, axis=1), y.copy()
+
+    cols = np.arange(columns)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty((points, columns), dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = np.zeros(columns, dtype=np.int64)
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        # 下一个桶的均值点，NaN(断线)不参与；整桶断线时面积为NaN，取桶内第一个点
+        segment = y[hi:next_hi]
+        valid = ~np.isnan(segment)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            next_y = np.where(valid, segment, 0.0).sum(axis=0) / valid.sum(axis=0)
+
+        ax = x[a]
+        ay = y[a, cols]
+        bx = x[lo:hi, None]
+        by = y[lo:hi]
+        area = np.abs((ax - next_x) * (by - ay) - (ax - bx) * (next_y - ay))
+        area = np.where(np.isnan(area), -1.0, area)
+        a = lo + np.argmax(area, axis=0)
+        selected[i + 1] = a
+
+    return x[selected], y[selected, cols]
@@ -0,0 +1,161 @@
+import logging
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """
+    单个通道的事件死区
+
+    abs_change和rel_change都为0时任何变化都推送；max_period为0时不做周期推送。
+    """
+    abs_change: float = 0.0
+    rel_change: float = 0.0  # 相对上次推送值的比例，如0.01表示1%
+    max_period: float = 0.0  # 无变化时最长多久推送一次，单位秒
+
+    def exceeded(self, last: float, value: float) -> bool:
+        """value相对last的变化是否超出死区"""
+        last_nan, value_nan = math.isnan(last), math.isnan(value)
+        if last_nan or value_nan:
+            # 断线与恢复总是推送
+            return last_nan != value_nan
+        delta = abs(value - last)
+        if self.abs_change <= 0 and self.rel_change <= 0:
+            return delta > 0
+        if self.abs_change > 0 and delta >= self.abs_change:
+            return True
+        if self.rel_change > 0 and delta >= self.rel_change * abs(last):
+            return True
+        return False
+
+
+def parse_deadbands(settings: Optional[Dict[str, Any]], channels: int) -> List[Deadband]:
+    """
+    解析一个属性的事件配置，单个数值对所有通道生效，列表按通道分别配置
+
+    configuration.yml示例：
+        events:
+          channel_temps:
+            abs_change: [0.5, 0.5, 0.5, 0.5, 1.0, 1.0, 1.0, 1.0]
+            rel_change: 0
+            max_period: 10
+
+    Args:
+        settings: 属性的事件配置
+        channels: 通道数
+
+    Returns:
+        List[Deadband]: 每个通道的死区
+    """
+    settings = settings or {}
+    if not isinstance(settings, dict):
+        raise ValueError(f"事件配置需要为字典，实际为 {settings!r}")
+
+    def per_channel(key: str) -> List[float]:
+        value = settings.get(key, 0.0)
+        if isinstance(value, (list, tuple)):
+            if len(value) != channels:
+                raise ValueError(f"事件配置 {key} 需要 {channels} 个值，实际 {len(value)} 个")
+            return [float(v) for v in value]
+        return [float(value)] * channels
+
+    unknown = set(settings) - set(Deadband.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"事件配置中有未知的项: {', '.join(sorted(unknown))}")
+    return [Deadband(*values) for values in zip(
+        per_channel('abs_change'), per_channel('rel_change'), per_channel('max_period'))]
+
+
+class EventFilter:
+    """按通道死区和最长推送周期决定一个属性是否需要推送事件"""
+
+    def __init__(self, deadbands: Sequence[Deadband]):
+        self.deadbands = list(deadbands)
+        self._last: Optional[List[float]] = None
+        self._last_time = 0.0
+
+    def update(self, values: Sequence[float], now: Optional[float] = None) -> bool:
+        """
+        提交新值
+
+        Args:
+            values: 各通道的新值，断线用NaN表示
+            now: 当前时刻(time.monotonic())
+
+        Returns:
+            bool: 是否需要推送；需要推送时新值成为下一次比较的基准
+        """
+        now = time.monotonic() if now is None else now
+        push = self._last is None
+        if not push:
+            elapsed = now - self._last_time
+            for deadband, last, value in zip(self.deadbands, self._last, values):
+                if deadband.exceeded(last, value) or 0 < deadband.max_period <= elapsed:
+                    push = True
+                    break
+        if push:
+            self._last = list(values)
+            self._last_time = now
+        return push
+
+
+class EventPublisher:
+    """
+    事件推送线程
+
+    采集线程只把推送任务放入队列，由本线程调用Tango的push_*_event，
+    Tango推送的耗时不影响采集节拍。
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, push: Callable[[], None]):
+        """提交一个推送任务，队列满时丢弃"""
+        self._start()
+        try:
+            self._queue.put_nowait(push)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        from tango import EnsureOmniThread
+
+        with EnsureOmniThread():
+            while True:
+                push = self._queue.get()
+                try:
+                    push()
+                except Exception as e:
+                    log.error(f"推送事件失败: {str(e)}")
+
+
+_publisher: Optional[EventPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> EventPublisher:
+    """获取进程内共享的事件推送线程"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = EventPublisher()
+        return _publisher
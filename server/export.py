@@ -0,0 +1,117 @@
+"""
+把磁盘存储中的采集记录导出为CSV或Parquet
+
+用法：
+    python -m server.export <存储目录> --start 2024-05-01T00:00:00 --end 2024-05-02T00:00:00 \
+        --format csv --output data.csv
+
+记录按块流式读取和写出，内存占用与时间范围无关。
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+import time
+from typing import Iterable
+
+import numpy as np
+
+from server.history import COLUMNS, DISCONNECT_MASK
+from server.store import SampleStore
+
+
+def parse_time(value: str) -> float:
+    """解析时间参数，支持时间戳(秒)和ISO格式的本地时间，如2024-05-01T08:00:00"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def export_csv(chunks: Iterable[np.ndarray], output):
+    """
+    导出为CSV，第一行为列名，断线值为空
+
+    Args:
+        chunks: 记录块
+        output: 文本文件对象
+
+    Returns:
+        int: 导出的记录数
+    """
+    writer = csv.writer(output)
+    writer.writerow(COLUMNS)
+    rows = 0
+    for chunk in chunks:
+        for record in chunk.tolist():
+            record[DISCONNECT_MASK] = int(record[DISCONNECT_MASK])
+            writer.writerow(['' if value != value else value for value in record])
+        rows += len(chunk)
+    return rows
+
+
+def export_parquet(chunks: Iterable[np.ndarray], path: str):
+    """
+    导出为Parquet，每个记录块写为一个row group，需要安装pyarrow
+
+    Args:
+        chunks: 记录块
+        path: 输出文件路径
+
+    Returns:
+        int: 导出的记录数
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("导出Parquet需要安装pyarrow: pip install pyarrow")
+
+    schema = pa.schema(
+        [pa.field('timestamp', pa.timestamp('us', tz='UTC'))]
+        + [pa.field(name, pa.float64()) for name in COLUMNS[1:DISCONNECT_MASK]]
+        + [pa.field('disconnect_mask', pa.uint8())])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [pa.array((chunk[:, 0] * 1e6).astype(np.int64), pa.timestamp('us', tz='UTC'))]
+            arrays += [pa.array(chunk[:, i], from_pandas=True) for i in range(1, DISCONNECT_MASK)]
+            arrays.append(pa.array(chunk[:, DISCONNECT_MASK].astype(np.uint8)))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出PK9019采集记录")
+    parser.add_argument('directory', help="设备的存储目录")
+    parser.add_argument('--start', type=parse_time, default=0.0,
+                        help="起始时间(不含)，时间戳或ISO格式本地时间，默认为最早")
+    parser.add_argument('--end', type=parse_time, default=None,
+                        help="结束时间(含)，时间戳或ISO格式本地时间，默认为当前时刻")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv', help="导出格式")
+    parser.add_argument('--output', default='-', help="输出文件，CSV默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"存储目录不存在: {args.directory}")
+    end = args.end if args.end is not None else time.time()
+    chunks = SampleStore(args.directory).query(args.start, end)
+    if args.format == 'parquet':
+        if args.output == '-':
+            parser.error("导出Parquet需要指定--output")
+        try:
+            rows = export_parquet(chunks, args.output)
+        except RuntimeError as e:
+            parser.error(str(e))
+    elif args.output == '-':
+        rows = export_csv(chunks, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            rows = export_csv(chunks, f)
+    print(f"已导出 {rows} 条记录", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from device.framing import create_async_transport, create_transport
+from device.pool import TransportPool
+from server.bus import BusScheduler
+from config.config import get_config
+
+log = logging.getLogger(__name__)
+
+# 进程内所有设备按网关host:port共享连接
+SYNC_POOL = TransportPool(create_transport)
+ASYNC_POOL = TransportPool(create_async_transport)
+
+# engine为bus时，每个网关一个总线调度器
+_buses: Dict[Tuple[str, int], BusScheduler] = {}
+_buses_lock = threading.Lock()
+
+# 设备后台初始化的并发数，启动时各设备的探测和连接并行进行
+SETUP_WORKERS = 32
+_setup_executor: Optional[ThreadPoolExecutor] = None
+_setup_lock = threading.Lock()
+
+# 设备列表中每项可覆盖的设备属性
+DEVICE_KEYS = (
+    'host', 'port', 'slave_address',
+    'temp_humidity_host', 'temp_humidity_port', 'temp_humidity_slave_address',
+    'poll_interval', 'poll_deadline', 'engine', 'stale_timeout', 'invalid_timeout',
+    'bus_baudrate', 'bus_policy', 'bus_priority', 'bus_response_timeout', 'events',
+    'history_size', 'history_window', 'store_path', 'process_workers', 'framing',
+    'metrics_port', 'metrics_host',
+    'poll_adaptive', 'poll_min_interval', 'poll_max_interval', 'poll_change_threshold',
+    'alarms', 'capture_path', 'device_group',
+)
+
+
+def fleet_devices() -> List[Dict[str, Any]]:
+    """
+    配置文件中的设备列表
+
+    configuration.yml示例：
+        devices:
+          - name: "lact/pk9019/1"
+            host: "10.2.101.14"
+            port: 4197
+            slave_address: 1
+            temp_humidity_host: ""   # 为空表示该设备没有温湿度模块
+
+    Returns:
+        List[Dict[str, Any]]: 设备配置列表
+    """
+    return get_config().devices
+
+
+def device_overrides(name: str) -> Dict[str, Any]:
+    """
+    获取设备列表中指定设备的属性
+
+    Args:
+        name: Tango设备名称
+
+    Returns:
+        Dict[str, Any]: 需要覆盖的设备属性，设备不在列表中时为空
+    """
+    for entry in fleet_devices():
+        if str(entry.get('name', '')).lower() == name.lower():
+            unknown = set(entry) - set(DEVICE_KEYS) - {'name'}
+            if unknown:
+                log.warning(f"设备 {name} 配置中有未知的项: {', '.join(sorted(unknown))}")
+            return {key: entry[key] for key in DEVICE_KEYS if key in entry}
+    return {}
+
+
+def get_bus(host: str, port: int, **settings) -> BusScheduler:
+    """
+    获取网关的总线调度器，不存在时以settings创建
+
+    Args:
+        host: 网关IP地址
+        port: 网关端口号
+        settings: 传给BusScheduler的参数，只在创建时生效
+
+    Returns:
+        BusScheduler: 总线调度器
+    """
+    key = (host, int(port))
+    with _buses_lock:
+        bus = _buses.get(key)
+        if bus is None:
+            bus = BusScheduler(host, int(port), **settings)
+            _buses[key] = bus
+        return bus
+
+
+def release_bus(bus: BusScheduler, slave):
+    """移除总线上的从机，总线上没有从机时停止调度器"""
+    with _buses_lock:
+        if bus.remove_slave(slave) and _buses.get((bus.host, int(bus.port))) is bus:
+            del _buses[(bus.host, int(bus.port))]
+            bus.stop(timeout=bus.interval + 1)
+
+
+def get_setup_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的设备初始化线程池"""
+    global _setup_executor
+    with _setup_lock:
+        if _setup_executor is None:
+            _setup_executor = ThreadPoolExecutor(max_workers=SETUP_WORKERS, thread_name_prefix="device-setup")
+        return _setup_executor
+
+
+def create_fleet_devices(class_name: str = 'PK9019Server'):
+    """
+    按设备列表创建Tango设备，作为run()的post_init_callback调用
+
+    已在数据库中注册到本服务器的设备会在启动时自动创建，这里只创建新增的设备。
+
+    Args:
+        class_name: 设备类名称
+    """
+    from tango import Util
+
+    util = Util.instance()
+    existing = {device.get_name().lower() for device in util.get_device_list_by_class(class_name)}
+    for entry in fleet_devices():
+        name = entry['name']
+        if name.lower() in existing:
+            continue
+        try:
+            util.create_device(class_name, name)
+            log.info(f"已创建设备: {name}")
+        except Exception as e:
+            log.error(f"创建设备失败 {name}: {str(e)}")
@@ -0,0 +1,160 @@
+import math
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+# 每条记录的列，disconnect_mask的第i位表示通道i断线
+COLUMNS = (
+    'timestamp', 'environment_temp',
+    'channel_0', 'channel_1', 'channel_2', 'channel_3',
+    'channel_4', 'channel_5', 'channel_6', 'channel_7',
+    'temperature', 'humidity', 'disconnect_mask',
+)
+TIMESTAMP = COLUMNS.index('timestamp')
+ENVIRONMENT_TEMP = COLUMNS.index('environment_temp')
+CHANNELS = slice(COLUMNS.index('channel_0'), COLUMNS.index('channel_7') + 1)
+TEMPERATURE = COLUMNS.index('temperature')
+HUMIDITY = COLUMNS.index('humidity')
+DISCONNECT_MASK = COLUMNS.index('disconnect_mask')
+# 数值列: 环境温度、8个通道、温度、湿度
+VALUES = slice(ENVIRONMENT_TEMP, HUMIDITY + 1)
+
+
+def encode_record(row: np.ndarray, timestamp: float, environment_temp: float, channels: Sequence,
+                  temperature: float = math.nan, humidity: float = math.nan) -> np.ndarray:
+    """
+    把一次采集结果写入一条记录，断线通道写为NaN并置位disconnect_mask
+
+    Args:
+        row: 长度为len(COLUMNS)的float64数组(或视图)，原地写入
+        timestamp: 采集时间戳(time.time())
+        environment_temp: 环境温度
+        channels: 8个通道的温度值，断线为'断线'或NaN
+        temperature: 温湿度模块的温度
+        humidity: 温湿度模块的湿度
+
+    Returns:
+        np.ndarray: row本身
+    """
+    row[TIMESTAMP] = timestamp
+    row[ENVIRONMENT_TEMP] = environment_temp
+    mask = 0
+    for i, value in enumerate(channels):
+        if value == '断线' or value != value:
+            row[CHANNELS.start + i] = math.nan
+            mask |= 1 << i
+        else:
+            row[CHANNELS.start + i] = value
+    row[TEMPERATURE] = temperature
+    row[HUMIDITY] = humidity
+    row[DISCONNECT_MASK] = mask
+    return row
+
+
+class HistoryBuffer:
+    """
+    定长采集历史环形缓冲区
+
+    所有记录保存在一个预分配的float64二维数组中，按列存储(len(COLUMNS)行 x capacity列)，
+    每一列的时间范围在内存中连续，便于按列向量化计算；内存占用在创建时确定，
+    写入不产生Python对象。查询结果形状为(n, len(COLUMNS))，是按列存储数组的转置视图。
+    """
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 最多保存的记录数，如10Hz下保存1小时需要36000
+        """
+        if capacity <= 0:
+            raise ValueError(f"历史记录容量必须大于0: {capacity}")
+        self.capacity = capacity
+        self._data = np.full((len(COLUMNS), capacity), np.nan)
+        self._head = 0  # 下一条记录的写入位置
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区占用的内存，单位字节"""
+        return self._data.nbytes
+
+    def append(self, timestamp: float, environment_temp: float, channels: Sequence,
+               temperature: float = math.nan, humidity: float = math.nan):
+        """
+        写入一条记录，缓冲区满时覆盖最早的记录
+
+        Args:
+            timestamp: 采集时间戳(time.time())
+            environment_temp: 环境温度
+            channels: 8个通道的温度值，断线为'断线'或NaN
+            temperature: 温湿度模块的温度
+            humidity: 温湿度模块的湿度
+        """
+        with self._lock:
+            encode_record(self._data[:, self._head], timestamp, environment_temp, channels,
+                          temperature, humidity)
+            self._head = (self._head + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def since(self, timestamp: float) -> np.ndarray:
+        """
+        取出时间戳晚于timestamp的记录
+
+        Args:
+            timestamp: 起始时间戳(不含)
+
+        Returns:
+            np.ndarray: 按时间排序的记录，形状为(n, len(COLUMNS))；
+                由缓冲区中每列至多两段连续内存整块拷贝得到，不逐条复制
+        """
+        with self._lock:
+            older, newer = self._segments()
+            start = np.searchsorted(older[TIMESTAMP], timestamp, side='right')
+            if start < older.shape[1]:
+                return np.concatenate((older[:, start:], newer), axis=1).T
+            return newer[:, np.searchsorted(newer[TIMESTAMP], timestamp, side='right'):].copy().T
+
+    def between(self, start: float, end: float) -> np.ndarray:
+        """
+        取出时间戳在(start, end]内的记录
+
+        Args:
+            start: 起始时间戳(不含)
+            end: 结束时间戳(含)
+
+        Returns:
+            np.ndarray: 按时间排序的记录，形状为(n, len(COLUMNS))
+        """
+        records = self.since(start)
+        return records[:np.searchsorted(records[:, TIMESTAMP], end, side='right')]
+
+    def latest(self, count: Optional[int] = None) -> np.ndarray:
+        """
+        取出最近的count条记录
+
+        Args:
+            count: 记录数，默认为全部
+
+        Returns:
+            np.ndarray: 按时间排序的记录，形状为(n, len(COLUMNS))
+        """
+        with self._lock:
+            older, newer = self._segments()
+            total = older.shape[1] + newer.shape[1]
+            count = total if count is None else min(count, total)
+            if count <= newer.shape[1]:
+                return newer[:, newer.shape[1] - count:].copy().T
+            return np.concatenate((older[:, older.shape[1] - (count - newer.shape[1]):], newer), axis=1).T
+
+    def _segments(self):
+        # 按时间顺序返回缓冲区的两段视图: 较早的一段和较新的一段
+        if self._count < self.capacity:
+            return self._data[:, :0], self._data[:, :self._count]
+        return self._data[:, self._head:], self._data[:, :self._head]
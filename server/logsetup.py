@@ -0,0 +1,164 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# 默认日志格式
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    重复日志限流
+
+    同一logger、同一级别、内容相同的日志在interval秒内只输出第一条，其余计数；
+    窗口结束后的下一条附带被抑制的次数。设备掉线时每个采集周期都失败，
+    限流后只按interval输出，不会写满磁盘。
+    """
+
+    def __init__(self, interval: float = 60.0, level: int = logging.WARNING, max_keys: int = 10000):
+        """
+        初始化限流过滤器
+
+        Args:
+            interval: 相同日志的最短输出间隔，单位秒
+            level: 只对该级别及以上的日志限流
+            max_keys: 最多跟踪的不同日志数，超过时清理过期的记录
+        """
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.max_keys = max_keys
+        # 日志键 -> [窗口开始时刻, 窗口内被抑制的次数]
+        self._seen: Dict[Tuple[str, int, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            suppressed = entry[1] if entry is not None else 0
+            if entry is None and len(self._seen) >= self.max_keys:
+                self._prune(now)
+            self._seen[key] = [now, 0]
+        if suppressed:
+            record.msg = f"{record.getMessage()}（过去{self.interval:g}秒内重复{suppressed}次）"
+            record.args = None
+        return True
+
+    def _prune(self, now: float):
+        for key in [k for k, (start, _) in self._seen.items() if now - start >= self.interval]:
+            del self._seen[key]
+        if len(self._seen) >= self.max_keys:
+            self._seen.clear()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    队列满时丢弃日志的QueueHandler
+
+    写文件变慢(如磁盘繁忙)时不阻塞采集线程，丢弃的条数在队列恢复后补记一条警告。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                        f"日志队列已满，丢弃了 {dropped} 条日志", None, None)
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                self.dropped += dropped
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(log_config: Optional[Dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    """
+    配置日志系统
+
+    各线程的日志只经过限流后放入队列，由QueueListener线程格式化并写入控制台和按大小轮转的日志文件，
+    采集线程不做任何磁盘I/O。重复调用时先停止之前的监听线程。
+
+    Args:
+        log_config: configuration.yml中的logging配置：
+            root.level / root.format / root.file：根日志级别、格式、日志文件路径(为空时只输出到控制台)
+            root.max_bytes / root.backup_count：单个日志文件的最大字节数和保留的历史文件数
+            root.queue_size：日志队列长度，队列满时丢弃新日志
+            root.rate_limit：相同错误日志的最短输出间隔(秒)，0表示不限流
+            modules：各模块的日志级别
+
+    Returns:
+        logging.handlers.QueueListener: 已启动的监听线程
+    """
+    global _listener
+    log_config = log_config or {}
+    root_config = log_config.get('root') or {}
+
+    formatter = logging.Formatter(root_config.get('format', DEFAULT_FORMAT))
+    handlers = []
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+    if root_config.get('file'):
+        file_handler = logging.handlers.RotatingFileHandler(
+            root_config['file'],
+            maxBytes=int(root_config.get('max_bytes', 10 * 1024 * 1024)),
+            backupCount=int(root_config.get('backup_count', 5)),
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(int(root_config.get('queue_size', 10000))))
+    rate_limit = float(root_config.get('rate_limit', 60.0))
+    if rate_limit > 0:
+        queue_handler.addFilter(RateLimitFilter(rate_limit))
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, root_config.get('level', 'INFO')))
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+    root_logger.addHandler(queue_handler)
+
+    for module, level in (log_config.get('modules') or {}).items():
+        logging.getLogger(module).setLevel(getattr(logging, level))
+
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """停止监听线程，写完队列中剩余的日志"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
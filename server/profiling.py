@@ -0,0 +1,290 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from device.metrics import get_registry
+
+log = logging.getLogger(__name__)
+
+# 默认采样间隔，单位秒
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# tracemalloc默认记录的调用栈深度
+DEFAULT_TRACE_FRAMES = 10
+# 报告中的内存分配位置数
+TOP_ALLOCATIONS = 20
+
+
+class SamplingProfiler:
+    """
+    采样分析器
+
+    后台线程每interval秒通过sys._current_frames()取一次所有线程的调用栈，按栈累计次数，
+    输出flamegraph.pl/speedscope可直接读取的折叠栈文本。不使用sys.setprofile，
+    被分析的线程不受影响；停止后没有任何开销。
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        初始化采样分析器
+
+        Args:
+            interval: 采样间隔，单位秒
+        """
+        self.interval = interval
+        self.samples = 0
+        self._stacks: collections.Counter = collections.Counter()
+        self._names: Dict[int, str] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """开始采样"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采样"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def collapsed(self) -> str:
+        """
+        折叠栈文本
+
+        Returns:
+            str: 每行一个调用栈，"线程;外层函数;...;内层函数 次数"
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                self._stacks[self._stack(ident, frame)] += 1
+            self.samples += 1
+            del frames
+
+    def _stack(self, ident: int, frame) -> str:
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.get(ident, str(ident))
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(name.replace(' ', '_'))
+        parts.reverse()
+        return ";".join(parts)
+
+
+@dataclass
+class ProfileReport:
+    """一次性能分析窗口的结果"""
+    started: float  # 开始时刻(time.time())
+    duration: float  # 单位秒
+    samples: int
+    collapsed: str  # 折叠栈文本
+    allocations: str  # 内存分配位置文本，未开启tracemalloc时为空
+    timers: str  # 各子系统耗时文本
+    files: List[str]  # 写入的文件
+
+    def summary(self) -> str:
+        """文本摘要: 各子系统耗时、内存分配位置和写入的文件；折叠栈只列出文件"""
+        lines = [f"分析时长 {self.duration:.1f}s，采样 {self.samples} 次", "", self.timers]
+        if self.allocations:
+            lines += ["", self.allocations]
+        if self.files:
+            lines += ["", "已写入:"] + self.files
+        else:
+            lines += ["", "调用栈(折叠格式):", self.collapsed]
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    进程内的性能分析开关
+
+    一次只有一个分析窗口: start开启采样分析器、tracemalloc和子系统计时，
+    stop关闭它们并生成报告；duration到达后自动停止。传输耗时取自请求统计的时延累计，
+    不增加额外计时。
+    """
+
+    def __init__(self):
+        self.report: Optional[ProfileReport] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._trace_frames = 0
+        self._baseline = None
+        self._transport_start = (0, 0.0)
+        self._started = 0.0
+        self._started_monotonic = 0.0
+        self._output_dir = ''
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None
+
+    def start(self, duration: float = 0.0, interval: float = DEFAULT_SAMPLE_INTERVAL,
+              trace_frames: int = DEFAULT_TRACE_FRAMES, output_dir: str = ''):
+        """
+        开始一个分析窗口
+
+        Args:
+            duration: 窗口长度，单位秒，0表示直到调用stop
+            interval: 采样间隔，单位秒
+            trace_frames: tracemalloc记录的调用栈深度，0表示不跟踪内存分配
+            output_dir: 报告写入的目录，为空时不写文件
+        """
+        with self._lock:
+            if self._sampler is not None:
+                raise RuntimeError("性能分析已在运行")
+            if interval <= 0:
+                raise ValueError(f"采样间隔必须大于0: {interval}")
+            self._trace_frames = trace_frames if not tracemalloc.is_tracing() else 0
+            if self._trace_frames > 0:
+                tracemalloc.start(self._trace_frames)
+                self._baseline = tracemalloc.take_snapshot()
+            registry = get_registry()
+            registry.timers.reset()
+            registry.timers.enabled = True
+            self._transport_start = self._transport_totals()
+            self._output_dir = output_dir
+            self._started = time.time()
+            self._started_monotonic = time.monotonic()
+            self._sampler = SamplingProfiler(interval)
+            self._sampler.start()
+            if duration > 0:
+                self._timer = threading.Timer(duration, self._expire)
+                self._timer.daemon = True
+                self._timer.start()
+        log.info("开始性能分析: 时长 %s，采样间隔 %ss，tracemalloc栈深度 %d",
+                 f"{duration}s" if duration > 0 else "不限", interval, self._trace_frames)
+
+    def stop(self) -> ProfileReport:
+        """
+        停止分析窗口并生成报告
+
+        Returns:
+            ProfileReport: 本次的报告；没有在运行时返回上一次的报告
+        """
+        with self._lock:
+            sampler, self._sampler = self._sampler, None
+            if sampler is None:
+                if self.report is None:
+                    raise RuntimeError("性能分析未运行")
+                return self.report
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            sampler.stop()
+            registry = get_registry()
+            registry.timers.enabled = False
+
+            allocations = ''
+            if self._trace_frames > 0:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                allocations = self._format_allocations(snapshot)
+                self._baseline = None
+
+            report = ProfileReport(
+                started=self._started,
+                duration=time.monotonic() - self._started_monotonic,
+                samples=sampler.samples,
+                collapsed=sampler.collapsed(),
+                allocations=allocations,
+                timers=self._format_timers(registry.timers.totals()),
+                files=[]
+            )
+            if self._output_dir:
+                report.files = self._write(report)
+            self.report = report
+        log.info("性能分析结束: %.1fs，采样 %d 次", report.duration, report.samples)
+        return report
+
+    def _expire(self):
+        try:
+            self.stop()
+        except Exception as e:
+            log.error("性能分析自动停止失败: %s", e)
+
+    @staticmethod
+    def _transport_totals():
+        registry = get_registry()
+        requests, latency = 0, 0.0
+        for gateway in list(registry.gateways.values()):
+            totals = gateway.totals()
+            requests += totals.requests
+            latency += totals.latency_sum
+        return requests, latency
+
+    def _format_timers(self, totals: Dict[str, tuple]) -> str:
+        requests, latency = self._transport_totals()
+        rows = dict(totals)
+        rows['transport'] = (requests - self._transport_start[0], latency - self._transport_start[1])
+        lines = ["各子系统耗时:"]
+        for name, (calls, seconds) in sorted(rows.items()):
+            average = seconds / calls * 1000 if calls else 0.0
+            lines.append(f"  {name:<12} {calls:8d} 次 {seconds:10.4f} s  平均 {average:.3f} ms")
+        return "\n".join(lines)
+
+    def _format_allocations(self, snapshot) -> str:
+        # 不统计分析器自身的分配
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        snapshot = snapshot.filter_traces(filters)
+        lines = [f"内存占用最多的 {TOP_ALLOCATIONS} 个分配位置:"]
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            lines.append(f"  {stat.size / 1024:10.1f} KiB {stat.count:8d} 块  {stat.traceback[0]}")
+        if self._baseline is not None:
+            lines.append(f"窗口内增长最多的 {TOP_ALLOCATIONS} 个分配位置:")
+            baseline = self._baseline.filter_traces(filters)
+            for stat in snapshot.compare_to(baseline, 'lineno')[:TOP_ALLOCATIONS]:
+                lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} 块  {stat.traceback[0]}")
+        return "\n".join(lines)
+
+    def _write(self, report: ProfileReport) -> List[str]:
+        os.makedirs(self._output_dir, exist_ok=True)
+        prefix = os.path.join(self._output_dir, time.strftime('profile-%Y%m%d-%H%M%S',
+                                                              time.localtime(report.started)))
+        contents = {f"{prefix}.collapsed": report.collapsed, f"{prefix}-timers.txt": report.timers}
+        if report.allocations:
+            contents[f"{prefix}-alloc.txt"] = report.allocations
+        for path, text in contents.items():
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+        return list(contents)
+
+
+_profiler: Optional[Profiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    """获取进程内共享的性能分析开关"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+        return _profiler
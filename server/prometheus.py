@@ -0,0 +1,90 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from device.metrics import MetricsRegistry, get_registry
+
+log = logging.getLogger(__name__)
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求很频繁，不写入日志
+        pass
+
+
+class MetricsServer:
+    """
+    以Prometheus文本格式提供统计的HTTP服务
+
+    在后台线程中运行，只在被抓取时汇总计数，不影响采集。
+    """
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: Optional[MetricsRegistry] = None):
+        """
+        初始化HTTP服务
+
+        Args:
+            port: 监听端口，0表示由系统分配
+            host: 监听地址，默认只允许本机访问
+            registry: 提供的统计，默认为进程内共享的统计
+        """
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry or get_registry()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> 'MetricsServer':
+        """启动服务线程"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        log.info(f"统计服务已启动: http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_server: Optional[MetricsServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> MetricsServer:
+    """
+    启动进程内共享的统计服务，已启动时直接返回
+
+    Args:
+        port: 监听端口，只在第一次调用时生效
+        host: 监听地址
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = MetricsServer(port, host).start()
+        return _server
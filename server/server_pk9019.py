@@ -1,55 +1,173 @@
+import functools
 import logging
-from tango import DevShort, DevState, DevFloat, AttrWriteType
-from tango.server import Device, attribute, run, device_property
+import math
+import os
+import time
+import numpy as np
+from tango import (DevShort, DevState, DevFloat, DevLong64, DevVarDoubleStringArray, AttrWriteType, AttrQuality,
+                   EventType)
+from tango.server import Device, attribute, command, run, device_property
 from device.pk9019 import PK9019
 from device.temp_humidity import TempHumidity
-from config.config import config
+from device.async_device import AsyncPK9019, AsyncTempHumidity
+from device.capture import get_capture, start_capture, stop_capture
+from device.framing import resolve_framing
+from device.metrics import LATENCY_BUCKETS, get_registry, merge_totals, timed
+from server.acquisition import AcquisitionLoop
+from server.adaptive import AdaptiveInterval
+from server.alarms import ALARM_DISCONNECT, alarm_names, get_alarm_engine, parse_alarm_rules
+from server.async_engine import PollJob, get_scheduler
+from server.bulk import BulkSource, get_bulk_registry, pack_bulk
+from server.bus import BusSlave
+from server.events import EventFilter, get_publisher, parse_deadbands
+from server.history import COLUMNS, HistoryBuffer
+from server.downsample import aggregate, lttb
+from server.store import SampleStore
+from server.workers import PK9019_MODULE, TEMP_HUMIDITY_MODULE, SharedSlot, get_supervisor
+from server.profiling import DEFAULT_SAMPLE_INTERVAL, DEFAULT_TRACE_FRAMES, get_profiler
+from server.prometheus import start_metrics_server
+from server.fleet import ASYNC_POOL, SYNC_POOL, device_overrides, get_bus, get_setup_executor, release_bus
+from config.config import DEVICE_DEFAULTS, get_config
 log = logging.getLogger(__name__)
 
+# history图像属性的最大行数
+HISTORY_MAX_ROWS = 10000
+# QueryRange单次返回的最多记录数，更长的范围使用导出工具
+QUERY_MAX_ROWS = 1000000
+# 自适应采集时检查事件订阅的间隔，单位秒
+SUBSCRIBER_CHECK_INTERVAL = 5.0
+
 
 
 class PK9019Server(Device):
     """PK9019热电偶温度采集模块Tango设备服务器"""
     pk9019_device = None
     temp_humidity_device = None
+    pk9019_poller = None
+    temp_humidity_poller = None
+    pk9019_bus = None
+    temp_humidity_bus = None
+    # 事件死区配置，设备列表中的events优先于configuration.yml中的events
+    events = None
+    # 告警规则配置，设备列表中的alarms优先于configuration.yml中的alarms
+    alarms = None
+    alarm_blocks = None
+    history_buffer = None
+    sample_store = None
+    pk9019_adaptive = None
+    temp_humidity_adaptive = None
+    # 后台初始化(_setup_device)的Future和失败原因
+    _setup = None
+    _setup_error = None
     
     # 定义属性
     temp_humidity_host = device_property(
         dtype="str",
-        default_value=config['device']['temp_humidity_host'],
         doc="温度湿度采集模块IP地址"
     )   
     
     temp_humidity_port = device_property(
         dtype="int",
-        default_value=config['device']['temp_humidity_port'],
         doc="温度湿度采集模块端口号"
     )   
     
     temp_humidity_slave_address = device_property(
         dtype=DevShort,
-        default_value=config['device']['temp_humidity_slave_address'],
         doc="温度湿度采集模块从机地址"
     )   
     
     
     host = device_property(
         dtype="str",
-        default_value=config['device']['host'],
         doc="PK9019 IP Address"
     )
 
     port = device_property(
         dtype="int",
-        default_value=config['device']['port'],
         doc="PORT Address"
     )
 
     slave_address = device_property(
         dtype=DevShort,
-        default_value=config['device']['slave_address'],
         doc="Slave Address"
     )
+
+    poll_interval = device_property(
+        dtype="float",
+        doc="后台采集周期，单位秒"
+    )
+
+    poll_deadline = device_property(
+        dtype="float",
+        doc="异步采集时单次读取的截止时间，单位秒"
+    )
+
+    engine = device_property(
+        dtype="str",
+        doc="采集方式: thread(每设备一个线程)、async(共享asyncio调度器)、bus(每个网关一个总线调度器) "
+            "或 process(多个工作进程分片采集)"
+    )
+
+    framing = device_property(
+        dtype="str",
+        doc="网关帧格式: rtu(RTU over TCP)、mbap(Modbus TCP，可流水线并发)、auto(启动时探测) 或 "
+            "serial(直连RS485串口，host为串口设备路径，port为波特率，只支持thread和bus采集方式)"
+    )
+
+    process_workers = device_property(
+        dtype="int",
+        doc="engine为process时的工作进程数，0表示CPU核数；只在创建第一个设备时生效"
+    )
+
+    bus_baudrate = device_property(
+        dtype="int",
+        doc="bus方式下网关后RS485总线的波特率，用于计算帧间静默时间"
+    )
+
+    bus_policy = device_property(
+        dtype="str",
+        doc="bus方式下的调度策略: round_robin 或 priority"
+    )
+
+    bus_priority = device_property(
+        dtype="int",
+        doc="bus方式下本设备的优先级，priority策略下数值大的先访问"
+    )
+
+    bus_response_timeout = device_property(
+        dtype="float",
+        doc="bus方式下从机响应超时时间，单位秒"
+    )
+
+    stale_timeout = device_property(
+        dtype="float",
+        doc="快照超过该时间未刷新时属性质量置为ALARM，单位秒"
+    )
+
+    poll_adaptive = device_property(
+        dtype="bool",
+        doc="是否按数值变化速率和事件订阅自动调整采集周期"
+    )
+
+    poll_min_interval = device_property(
+        dtype="float",
+        doc="自适应采集的最短周期，单位秒"
+    )
+
+    poll_max_interval = device_property(
+        dtype="float",
+        doc="自适应采集在数值平稳且无人订阅事件时的最长周期，单位秒；有订阅时最长为poll_interval"
+    )
+
+    poll_change_threshold = device_property(
+        dtype="float",
+        doc="自适应采集时希望一个周期内数值变化不超过的量，变化更快时缩短周期"
+    )
+
+    invalid_timeout = device_property(
+        dtype="float",
+        doc="快照超过该时间未刷新时属性质量置为INVALID，单位秒"
+    )
     
     temp_humidity: tuple[float] = attribute(
         name="temp_humidity",
@@ -80,10 +198,247 @@ class PK9019Server(Device):
         fget="read_channel_temps"
     )
 
+    poll_rate = attribute(
+        name="poll_rate",
+        label="采集频率",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        unit="Hz",
+        doc="当前的采集频率，自适应采集时随数值变化和事件订阅调整",
+        fget="read_poll_rate"
+    )
+
+    bus_utilization = attribute(
+        name="bus_utilization",
+        label="总线占用率",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        doc="bus方式下PK9019所在总线上一周期的占用率(0~1)",
+        fget="read_bus_utilization"
+    )
+
+    bus_cycle_time = attribute(
+        name="bus_cycle_time",
+        label="总线轮询耗时",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        unit="s",
+        doc="bus方式下PK9019所在总线上一轮访问全部从机的耗时，单位秒",
+        fget="read_bus_cycle_time"
+    )
+
+    history_size = device_property(
+        dtype="int",
+        doc=f"内存中保存的采集历史记录数，内存占用为 history_size x {len(COLUMNS) * 8} 字节"
+    )
+
+    history_window = device_property(
+        dtype="int",
+        doc="history图像属性返回的最近记录数"
+    )
+
+    store_path = device_property(
+        dtype="str",
+        doc="采集记录的磁盘存储根目录，每个设备一个子目录；为空时不保存"
+    )
+
+    metrics_port = device_property(
+        dtype="int",
+        doc="Prometheus文本格式统计的HTTP端口，0表示不启动；进程内只启动一个，由第一个配置了端口的设备启动"
+    )
+
+    metrics_host = device_property(
+        dtype="str",
+        doc="统计HTTP服务的监听地址，默认只允许本机访问"
+    )
+
+    capture_path = device_property(
+        dtype="str",
+        doc="启动时开始抓包的文件路径，记录进程内所有网关的收发帧；为空时不抓包，"
+            "也可以用StartCapture/StopCapture命令随时开始和停止"
+    )
+
+    profile_path = device_property(
+        dtype="str",
+        doc="性能分析报告(折叠栈、内存分配位置、子系统耗时)的写入目录，为空时只由StopProfiling返回"
+    )
+
+    device_group = device_property(
+        dtype="str",
+        doc="设备组名称，ReadAll可按组只返回部分设备"
+    )
+
+    request_count = attribute(
+        name="request_count",
+        label="请求数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="本设备各模块发出的Modbus请求总数",
+        fget="read_request_count"
+    )
+
+    timeout_count = attribute(
+        name="timeout_count",
+        label="超时次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="等待响应超时的请求数",
+        fget="read_timeout_count"
+    )
+
+    crc_error_count = attribute(
+        name="crc_error_count",
+        label="CRC错误次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="响应CRC校验失败的请求数",
+        fget="read_crc_error_count"
+    )
+
+    connection_error_count = attribute(
+        name="connection_error_count",
+        label="连接错误次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="连接失败或中断的请求数",
+        fget="read_connection_error_count"
+    )
+
+    exception_response_count = attribute(
+        name="exception_response_count",
+        label="异常响应次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="从机返回Modbus异常响应的请求数，各异常码的次数见统计服务",
+        fget="read_exception_response_count"
+    )
+
+    reconnect_count = attribute(
+        name="reconnect_count",
+        label="重连次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="本设备所在网关断开后重新连接的次数",
+        fget="read_reconnect_count"
+    )
+
+    request_latency_p50 = attribute(
+        name="request_latency_p50",
+        label="请求时延中位数",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        unit="s",
+        doc="由时延直方图估算的请求往返时延中位数，单位秒",
+        fget="read_request_latency_p50"
+    )
+
+    request_latency_p99 = attribute(
+        name="request_latency_p99",
+        label="请求时延P99",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        unit="s",
+        doc="由时延直方图估算的请求往返时延99分位数，单位秒",
+        fget="read_request_latency_p99"
+    )
+
+    request_latency_histogram = attribute(
+        name="request_latency_histogram",
+        label="请求时延直方图",
+        dtype=(DevLong64,),
+        access=AttrWriteType.READ,
+        max_dim_x=len(LATENCY_BUCKETS) + 1,
+        doc=f"各时延桶的请求数(非累计)，桶上限依次为 {', '.join(map(str, LATENCY_BUCKETS))} 秒和+Inf",
+        fget="read_request_latency_histogram"
+    )
+
+    cycle_overrun_count = attribute(
+        name="cycle_overrun_count",
+        label="采集超周期次数",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="采集耗时超过采集周期、跳过节拍的次数；bus方式下为所在总线的轮询",
+        fget="read_cycle_overrun_count"
+    )
+
+    cycle_jitter = attribute(
+        name="cycle_jitter",
+        label="采集抖动",
+        dtype=DevFloat,
+        access=AttrWriteType.READ,
+        unit="s",
+        doc="采集实际开始时刻落后于计划节拍的滑动平均，单位秒",
+        fget="read_cycle_jitter"
+    )
+
+    disconnect_mask = attribute(
+        name="disconnect_mask",
+        label="断线位掩码",
+        dtype=DevLong64,
+        access=AttrWriteType.READ,
+        doc="第i位表示通道i处于断线告警",
+        fget="read_disconnect_mask"
+    )
+
+    channel_alarms: tuple[int] = attribute(
+        name="channel_alarms",
+        label="通道告警",
+        dtype=(DevLong64,),
+        access=AttrWriteType.READ,
+        max_dim_x=8,
+        doc="8个通道的告警位: 1高于上限、2低于下限、4变化过快、8断线、16长时间未更新",
+        fget="read_channel_alarms"
+    )
+
+    active_alarms: tuple[str] = attribute(
+        name="active_alarms",
+        label="当前告警",
+        dtype=(str,),
+        access=AttrWriteType.READ,
+        max_dim_x=64,
+        doc="当前处于告警的通道，每项如 channel_temps[3]: hi,rate",
+        fget="read_active_alarms"
+    )
+
+    history = attribute(
+        name="history",
+        label="采集历史",
+        dtype=((float,),),
+        access=AttrWriteType.READ,
+        max_dim_x=len(COLUMNS),
+        max_dim_y=HISTORY_MAX_ROWS,
+        doc="最近history_window条采集记录，每行一条，列见history_columns",
+        fget="read_history"
+    )
+
+    history_columns = attribute(
+        name="history_columns",
+        label="采集历史列名",
+        dtype=(str,),
+        access=AttrWriteType.READ,
+        max_dim_x=len(COLUMNS),
+        doc="history和GetHistory结果中每列的含义",
+        fget="read_history_columns"
+    )
+
     def init_device(self):
-        """初始化设备"""
+        """
+        初始化设备
+
+        只做不访问网络的准备工作，创建传输、探测帧格式和启动采集交给进程共享的线程池在后台完成，
+        多个设备并行建立连接，无法连接的模块不会拖慢服务器启动和其他设备。
+        """
         Device.init_device(self)
 
+        # 设备列表(configuration.yml中的devices)中的配置优先于Tango数据库中的属性，
+        # 两者都没有设置的属性使用configuration.yml的device节和内置默认值
+        settings = get_config()
+        for key in DEVICE_DEFAULTS:
+            if getattr(self, key, None) in (None, []):
+                setattr(self, key, settings.device(key))
+        for key, value in device_overrides(self.get_name()).items():
+            setattr(self, key, value)
+
         # 获取设备属性
         self.host = self.host
         self.port = int(self.port)
@@ -91,50 +446,776 @@ class PK9019Server(Device):
         self.temp_humidity_host = self.temp_humidity_host
         self.temp_humidity_port = int(self.temp_humidity_port)
         self.temp_humidity_slave_address = int(self.temp_humidity_slave_address)
-        # 创建PK9019实例
+
+        if int(self.metrics_port) > 0:
+            try:
+                start_metrics_server(int(self.metrics_port), self.metrics_host)
+            except OSError as e:
+                log.error(f"统计服务启动失败 {self.metrics_host}:{self.metrics_port}: {str(e)}")
+
+        if self.capture_path and get_capture() is None:
+            try:
+                start_capture(self.capture_path)
+            except OSError as e:
+                log.error("抓包启动失败 %s: %s", self.capture_path, e)
+
+        self.history_buffer = HistoryBuffer(int(self.history_size))
+        if self.store_path:
+            self.sample_store = SampleStore(os.path.join(self.store_path, self.get_name().replace('/', '_')))
+        self._init_events()
+        self._init_alarms()
+        self._init_bulk()
+
+        self._setup_error = None
+        self.set_state(DevState.INIT)
+        self._setup = get_setup_executor().submit(self._setup_device)
+
+    def _setup_device(self):
+        """创建传输和采集任务，在设备初始化线程池中执行"""
+        try:
+            if self.engine == 'async':
+                self._init_async_engine()
+            elif self.engine == 'bus':
+                self._init_bus_engine()
+            elif self.engine == 'process':
+                self._init_process_engine()
+            else:
+                self._init_thread_engine()
+        except Exception as e:
+            self._setup_error = str(e)
+            self.set_state(DevState.FAULT)
+            log.error("设备 %s 初始化失败: %s", self.get_name(), e)
+            return
+
+        if self.poll_adaptive:
+            self._init_adaptive()
+        # 采集任务创建后再挂上回调，回调中用到的事件过滤、告警和历史都已就绪
+        if self.pk9019_poller is not None:
+            self.pk9019_poller.on_update = self._on_pk9019_update
+        if self.temp_humidity_poller is not None:
+            self.temp_humidity_poller.on_update = self._on_temp_humidity_update
+
+    def _init_events(self):
+        """由采集结果直接推送change/archive事件，只在超出死区或到达最长周期时推送"""
+        settings = self.events if self.events is not None else get_config().get('events', {})
+        self._event_filters = {
+            'environment_temp': EventFilter(parse_deadbands(settings.get('environment_temp'), 1)),
+            'channel_temps': EventFilter(parse_deadbands(settings.get('channel_temps'), 8)),
+            'temp_humidity': EventFilter(parse_deadbands(settings.get('temp_humidity'), 2)),
+        }
+        for name in self._event_filters:
+            self.set_change_event(name, True, False)
+            self.set_archive_event(name, True, False)
+
+    def _init_alarms(self):
+        """在进程共享的告警评估中注册本设备各属性的通道，告警状态变化时推送事件"""
+        settings = self.alarms if self.alarms is not None else get_config().get('alarms', {})
+        attributes = []
+        if self.host:
+            attributes += [('environment_temp', 1), ('channel_temps', 8)]
+        if self.temp_humidity_host:
+            attributes.append(('temp_humidity', 2))
+
+        engine = get_alarm_engine()
+        self.alarm_blocks = {}
+        for name, channels in attributes:
+            block = engine.register(f"{self.get_name()}/{name}", parse_alarm_rules(settings.get(name), channels))
+            block.on_change = self._on_alarm_change
+            self.alarm_blocks[name] = block
+        for name in ('disconnect_mask', 'channel_alarms', 'active_alarms'):
+            self.set_change_event(name, True, False)
+            self.set_archive_event(name, True, False)
+
+    def _init_bulk(self):
+        """在进程共享的批量读取中注册本设备各属性，ReadAll一次返回进程内全部设备"""
+        attributes = []
+        if self.host:
+            attributes += [('environment_temp', 1), ('channel_temps', 8)]
+        if self.temp_humidity_host:
+            attributes.append(('temp_humidity', 2))
+        registry = get_bulk_registry()
+        for name, channels in attributes:
+            registry.register(BulkSource(self.get_name(), name, channels,
+                                         functools.partial(self._bulk_value, name), self.device_group))
+
+    def _bulk_value(self, name: str):
+        """批量读取的来源，返回(数值, 时间戳, 质量)，尚未采集到数据时为None"""
+        poller = self.temp_humidity_poller if name == 'temp_humidity' else self.pk9019_poller
+        if poller is None or poller.snapshot is None:
+            return None
+        value, timestamp, quality = self._cached_value(poller)
+        if name == 'environment_temp':
+            value = [value.environment_temp]
+        elif name == 'channel_temps':
+            value = [math.nan if t == '断线' else t for t in value.channel_temps]
+        return value, timestamp, self._alarm_quality(name, quality)
+
+    def _submit_alarm(self, name: str, values, snapshot):
+        """把本次采集的数值交给告警评估"""
+        block = self.alarm_blocks.get(name) if self.alarm_blocks else None
+        if block is not None:
+            block.submit(values, snapshot.monotonic)
+
+    def _alarm_quality(self, name: str, quality: AttrQuality) -> AttrQuality:
+        """属性有通道处于告警时把VALID质量降为ALARM"""
+        block = self.alarm_blocks.get(name) if self.alarm_blocks else None
+        if quality == AttrQuality.ATTR_VALID and block is not None and block.active:
+            return AttrQuality.ATTR_ALARM
+        return quality
+
+    def _on_alarm_change(self, block):
+        """告警状态变化回调，在告警评估线程中执行"""
+        name = block.name.rsplit('/', 1)[-1]
+        log.warning("告警状态变化 %s: %s", block.name,
+                    ', '.join(f"[{i}] {','.join(alarm_names(int(bits))) or '恢复'}"
+                              for i, bits in enumerate(block.bits())))
+        timestamp = time.time()
+        if name == 'channel_temps':
+            self._push_event('disconnect_mask', block.mask(ALARM_DISCONNECT), timestamp)
+            self._push_event('channel_alarms', block.bits(), timestamp)
+        self._push_event('active_alarms', self.read_active_alarms(), timestamp)
+        # 以新的质量重新推送数值属性，订阅者无需轮询即可得知告警
+        poller = self.temp_humidity_poller if name == 'temp_humidity' else self.pk9019_poller
+        snapshot = poller.snapshot if poller is not None else None
+        if snapshot is not None:
+            value = snapshot.value
+            if name == 'environment_temp':
+                value = value.environment_temp
+            elif name == 'channel_temps':
+                value = [math.nan if t == '断线' else t for t in value.channel_temps]
+            else:
+                value = list(value)
+            quality = AttrQuality.ATTR_ALARM if block.active else AttrQuality.ATTR_VALID
+            self._push_event(name, value, snapshot.timestamp, quality)
+
+    def _init_adaptive(self):
+        """为每个采集任务创建自适应周期，初始周期为poll_interval"""
+        settings = dict(
+            min_interval=float(self.poll_min_interval),
+            max_interval=max(float(self.poll_max_interval), float(self.poll_min_interval)),
+            subscribed_interval=float(self.poll_interval),
+            change_threshold=float(self.poll_change_threshold)
+        )
+        self._subscribers = {}
+        if self.pk9019_poller is not None:
+            self.pk9019_adaptive = AdaptiveInterval(**settings)
+        if self.temp_humidity_poller is not None:
+            self.temp_humidity_adaptive = AdaptiveInterval(**settings)
+
+    def _adapt(self, poller, adaptive: AdaptiveInterval, values, snapshot, attributes: tuple):
+        """按本次采集的数值更新采集周期，在采集线程中执行"""
+        previous = adaptive.interval
+        interval = adaptive.update(values, snapshot.monotonic, self._has_subscribers(attributes))
+        if interval != previous:
+            poller.set_interval(interval)
+
+    def _has_subscribers(self, attributes: tuple) -> bool:
+        """是否有客户端订阅了这些属性的change或archive事件，结果缓存SUBSCRIBER_CHECK_INTERVAL秒"""
+        now = time.monotonic()
+        cached = self._subscribers.get(attributes)
+        if cached is not None and now - cached[0] < SUBSCRIBER_CHECK_INTERVAL:
+            return cached[1]
+        subscribed = any(self.is_there_subscriber(name, event_type)
+                         for name in attributes
+                         for event_type in (EventType.CHANGE_EVENT, EventType.ARCHIVE_EVENT))
+        self._subscribers[attributes] = (now, subscribed)
+        return subscribed
+
+    def _on_pk9019_update(self, snapshot):
+        """PK9019采集回调，在采集线程中执行"""
+        env_temp = snapshot.value.environment_temp
+        self._submit_alarm('environment_temp', [float(env_temp)], snapshot)
+        if self._event_filters['environment_temp'].update([float(env_temp)]):
+            self._push_event('environment_temp', env_temp, snapshot.timestamp,
+                             self._alarm_quality('environment_temp', AttrQuality.ATTR_VALID))
+
+        values = [math.nan if t == '断线' else t for t in snapshot.value.channel_temps]
+        self._submit_alarm('channel_temps', values, snapshot)
+        if self._event_filters['channel_temps'].update(values):
+            self._push_event('channel_temps', values, snapshot.timestamp,
+                             self._alarm_quality('channel_temps', AttrQuality.ATTR_VALID))
+
+        if self.pk9019_adaptive is not None:
+            self._adapt(self.pk9019_poller, self.pk9019_adaptive, [float(env_temp)] + values, snapshot,
+                        ('environment_temp', 'channel_temps'))
+
+        self._record_history(snapshot.timestamp)
+
+    def _on_temp_humidity_update(self, snapshot):
+        """温湿度采集回调，在采集线程中执行"""
+        self._submit_alarm('temp_humidity', snapshot.value, snapshot)
+        if self._event_filters['temp_humidity'].update(snapshot.value):
+            self._push_event('temp_humidity', list(snapshot.value), snapshot.timestamp,
+                             self._alarm_quality('temp_humidity', AttrQuality.ATTR_VALID))
+
+        if self.temp_humidity_adaptive is not None:
+            self._adapt(self.temp_humidity_poller, self.temp_humidity_adaptive, snapshot.value, snapshot,
+                        ('temp_humidity',))
+
+        # 没有PK9019模块时按温湿度采集节拍记录历史
+        if self.pk9019_poller is None:
+            self._record_history(snapshot.timestamp)
+
+    def _record_history(self, timestamp: float):
+        """将两个模块的最新快照合并为一条历史记录"""
+        pk9019 = self.pk9019_poller.snapshot if self.pk9019_poller is not None else None
+        temp_humidity = self.temp_humidity_poller.snapshot if self.temp_humidity_poller is not None else None
+        record = (
+            timestamp,
+            pk9019.value.environment_temp if pk9019 is not None else math.nan,
+            pk9019.value.channel_temps if pk9019 is not None else [math.nan] * 8,
+            *(temp_humidity.value if temp_humidity is not None else (math.nan, math.nan))
+        )
+        self.history_buffer.append(*record)
+        if self.sample_store is not None:
+            self.sample_store.append(*record)
+
+    def _push_event(self, name: str, value, timestamp: float, quality: AttrQuality = AttrQuality.ATTR_VALID):
+        """交给事件推送线程推送change和archive事件"""
+        def push():
+            self.push_change_event(name, value, timestamp, quality)
+            self.push_archive_event(name, value, timestamp, quality)
+        get_publisher().submit(push)
+
+    def _init_thread_engine(self):
+        """每个设备一个采集线程，使用阻塞的设备类"""
+        # 创建PK9019实例，同一网关的设备共享连接
         try:
-            self.pk9019_device = PK9019(
+            if self.host:
+                self.pk9019_device = PK9019(
+                    host=self.host,
+                    port=self.port,
+                    slave_address=self.slave_address,
+                    transport=SYNC_POOL.acquire(self.host, self.port,
+                                                framing=resolve_framing(self.host, self.port, self.framing))
+                )
+                log.info(f"PK9019设备初始化成功: {self.host}:{self.port}")
+            if self.temp_humidity_host:
+                self.temp_humidity_device = TempHumidity(
+                    host=self.temp_humidity_host,
+                    port=self.temp_humidity_port,
+                    slave_address=self.temp_humidity_slave_address,
+                    transport=SYNC_POOL.acquire(self.temp_humidity_host, self.temp_humidity_port,
+                                                framing=resolve_framing(self.temp_humidity_host,
+                                                                        self.temp_humidity_port, self.framing))
+                )
+                log.info(f"温度湿度设备初始化成功: {self.temp_humidity_host}:{self.temp_humidity_port}")
+            self.set_state(DevState.ON)
+        except Exception as e:
+            self.set_state(DevState.FAULT)
+            log.error(f"设备初始化失败: {str(e)}")
+            raise
+
+        # 启动后台采集，read_*方法只返回缓存的快照
+        if self.pk9019_device is not None:
+            self.pk9019_poller = AcquisitionLoop(
+                name=f"pk9019-{self.host}:{self.port}/{self.slave_address}",
+                read_func=self.pk9019_device.read_snapshot,
+                interval=float(self.poll_interval)
+            )
+            self.pk9019_poller.start()
+        if self.temp_humidity_device is not None:
+            self.temp_humidity_poller = AcquisitionLoop(
+                name=f"temp_humidity-{self.temp_humidity_host}:{self.temp_humidity_port}"
+                     f"/{self.temp_humidity_slave_address}",
+                read_func=self.temp_humidity_device.get_temp_humidity,
+                interval=float(self.poll_interval)
+            )
+            self.temp_humidity_poller.start()
+
+    def _init_async_engine(self):
+        """所有设备在进程共享的asyncio调度器中并发采集，连接在采集任务中建立"""
+        scheduler = get_scheduler()
+        deadline = float(self.poll_deadline)
+
+        if self.host:
+            self.pk9019_device = AsyncPK9019(
                 host=self.host,
                 port=self.port,
-                slave_address=self.slave_address
+                slave_address=self.slave_address,
+                transport=ASYNC_POOL.acquire(self.host, self.port, deadline,
+                                             framing=resolve_framing(self.host, self.port, self.framing))
+            )
+            self.pk9019_poller = scheduler.add_job(
+                name=f"pk9019-{self.host}:{self.port}/{self.slave_address}",
+                read_func=self.pk9019_device.read_snapshot,
+                interval=float(self.poll_interval),
+                deadline=deadline
             )
-            self.temp_humidity_device = TempHumidity(
+        if self.temp_humidity_host:
+            self.temp_humidity_device = AsyncTempHumidity(
                 host=self.temp_humidity_host,
                 port=self.temp_humidity_port,
-                slave_address=self.temp_humidity_slave_address
+                slave_address=self.temp_humidity_slave_address,
+                transport=ASYNC_POOL.acquire(self.temp_humidity_host, self.temp_humidity_port, deadline,
+                                             framing=resolve_framing(self.temp_humidity_host,
+                                                                     self.temp_humidity_port, self.framing))
             )
+            self.temp_humidity_poller = scheduler.add_job(
+                name=f"temp_humidity-{self.temp_humidity_host}:{self.temp_humidity_port}"
+                     f"/{self.temp_humidity_slave_address}",
+                read_func=self.temp_humidity_device.get_temp_humidity,
+                interval=float(self.poll_interval),
+                deadline=deadline
+            )
+        self.set_state(DevState.ON)
+        log.info(f"设备已加入异步采集: {self.get_name()}")
+
+    def _init_process_engine(self):
+        """模块按网关分片到工作进程中采集，结果通过共享内存表读取"""
+        settings = {'workers': int(self.process_workers)} if int(self.process_workers) > 0 else {}
+        supervisor = get_supervisor(**settings)
+        interval, deadline = float(self.poll_interval), float(self.poll_deadline)
+        if self.host:
+            self.pk9019_poller = supervisor.add_module(
+                PK9019_MODULE, self.host, self.port, self.slave_address, interval, deadline, self.framing)
+        if self.temp_humidity_host:
+            self.temp_humidity_poller = supervisor.add_module(
+                TEMP_HUMIDITY_MODULE, self.temp_humidity_host, self.temp_humidity_port,
+                self.temp_humidity_slave_address, interval, deadline, self.framing)
+        self.set_state(DevState.ON)
+        log.info(f"设备已加入多进程采集: {self.get_name()}")
+
+    def _init_bus_engine(self):
+        """同一网关后的所有从机由该网关的总线调度器轮流访问，共用一个连接"""
+        settings = dict(
+            interval=float(self.poll_interval),
+            baudrate=int(self.bus_baudrate),
+            response_timeout=float(self.bus_response_timeout),
+            policy=self.bus_policy
+        )
+        try:
+            if self.host:
+                self.pk9019_bus = get_bus(self.host, self.port, **settings,
+                                          framing=resolve_framing(self.host, self.port, self.framing))
+                self.pk9019_device = PK9019(
+                    host=self.host,
+                    port=self.port,
+                    slave_address=self.slave_address,
+                    transport=self.pk9019_bus.transport
+                )
+                self.pk9019_poller = self.pk9019_bus.add_slave(
+                    name=f"pk9019-{self.host}:{self.port}/{self.slave_address}",
+                    read_func=self.pk9019_device.read_snapshot,
+                    priority=int(self.bus_priority)
+                )
+            if self.temp_humidity_host:
+                self.temp_humidity_bus = get_bus(self.temp_humidity_host, self.temp_humidity_port, **settings,
+                                                 framing=resolve_framing(self.temp_humidity_host,
+                                                                         self.temp_humidity_port, self.framing))
+                self.temp_humidity_device = TempHumidity(
+                    host=self.temp_humidity_host,
+                    port=self.temp_humidity_port,
+                    slave_address=self.temp_humidity_slave_address,
+                    transport=self.temp_humidity_bus.transport
+                )
+                self.temp_humidity_poller = self.temp_humidity_bus.add_slave(
+                    name=f"temp_humidity-{self.temp_humidity_host}:{self.temp_humidity_port}"
+                         f"/{self.temp_humidity_slave_address}",
+                    read_func=self.temp_humidity_device.get_temp_humidity,
+                    priority=int(self.bus_priority)
+                )
             self.set_state(DevState.ON)
-            log.info(f"PK9019设备初始化成功: {self.host}:{self.port}")
-            log.info(f"温度湿度设备初始化成功: {self.temp_humidity_host}:{self.temp_humidity_port}")
+            log.info(f"设备已加入总线调度: {self.get_name()}")
         except Exception as e:
             self.set_state(DevState.FAULT)
             log.error(f"设备初始化失败: {str(e)}")
             raise
 
+    def delete_device(self):
+        """停止后台采集并释放共享连接"""
+        # 等待尚未完成的后台初始化，之后再释放它创建的资源
+        setup, self._setup = self._setup, None
+        if setup is not None and not setup.cancel():
+            try:
+                setup.result()
+            except Exception as e:
+                log.error("设备后台初始化失败 %s: %s", self.get_name(), e)
+        for poller in (self.pk9019_poller, self.temp_humidity_poller):
+            if poller is not None:
+                poller.on_update = None
+        for bus, poller in ((self.pk9019_bus, self.pk9019_poller),
+                            (self.temp_humidity_bus, self.temp_humidity_poller)):
+            if isinstance(poller, BusSlave):
+                release_bus(bus, poller)
+            elif isinstance(poller, PollJob):
+                get_scheduler().remove_job(poller)
+            elif isinstance(poller, SharedSlot):
+                poller.supervisor.remove_module(poller)
+            elif poller is not None:
+                poller.stop(timeout=float(self.poll_interval) + 1)
+
+        for device in (self.pk9019_device, self.temp_humidity_device):
+            if device is None:
+                continue
+            if isinstance(device, (AsyncPK9019, AsyncTempHumidity)):
+                transport = ASYNC_POOL.release(device.transport)
+                if transport is not None:
+                    get_scheduler().run_coroutine(transport.close())
+            else:
+                transport = SYNC_POOL.release(device.transport)
+                if transport is not None:
+                    transport.close()
+
+        self.pk9019_device = None
+        self.temp_humidity_device = None
+        self.pk9019_poller = None
+        self.temp_humidity_poller = None
+        self.pk9019_bus = None
+        self.temp_humidity_bus = None
+        self.pk9019_adaptive = None
+        self.temp_humidity_adaptive = None
+
+        get_bulk_registry().unregister(self.get_name())
+
+        if self.alarm_blocks:
+            engine = get_alarm_engine()
+            for block in self.alarm_blocks.values():
+                engine.unregister(block)
+        self.alarm_blocks = None
+
+        if self.sample_store is not None:
+            self.sample_store.close()
+            self.sample_store = None
+
+    def _cached_value(self, poller) -> tuple:
+        """
+        取出采集循环的最新快照
+
+        Returns:
+            tuple: (快照值, 采集时间戳, 属性质量)
+        """
+        snapshot = poller.snapshot if poller is not None else None
+        if snapshot is None:
+            raise RuntimeError(f"尚未采集到数据: {poller.error if poller is not None else '采集未启动'}")
+
+        age = snapshot.age()
+        if age > float(self.invalid_timeout):
+            quality = AttrQuality.ATTR_INVALID
+        elif age > float(self.stale_timeout):
+            quality = AttrQuality.ATTR_ALARM
+        else:
+            quality = AttrQuality.ATTR_VALID
+        return snapshot.value, snapshot.timestamp, quality
+
+    def _poller_health(self, poller) -> str:
+        """
+        判断单个采集任务的健康状况
+
+        Returns:
+            str: ok(正常)、degraded(有错误或数据过期)、down(不可用且数据已失效)
+        """
+        snapshot = poller.snapshot
+        if snapshot is None:
+            return 'down' if poller.error is not None else 'ok'
+        age = snapshot.age()
+        if age > float(self.invalid_timeout):
+            return 'down'
+        if poller.error is not None or age > float(self.stale_timeout):
+            return 'degraded'
+        return 'ok'
+
+    def dev_state(self) -> DevState:
+        """根据采集状态自动切换ON/ALARM/FAULT，设备恢复后无需重新init"""
+        pollers = [p for p in (self.pk9019_poller, self.temp_humidity_poller) if p is not None]
+        if not pollers:
+            return Device.dev_state(self)
+
+        health = [self._poller_health(p) for p in pollers]
+        if all(h == 'ok' for h in health):
+            state = DevState.ON
+        elif all(h == 'down' for h in health):
+            state = DevState.FAULT
+        else:
+            state = DevState.ALARM
+        self.set_state(state)
+        return state
+
+    def dev_status(self) -> str:
+        """设备状态说明，包含各采集任务的最近错误"""
+        state = self.dev_state()
+        lines = [f"The device is in {state} state."]
+        if self._setup is not None and not self._setup.done():
+            lines.append("正在后台建立连接")
+        elif self._setup_error is not None:
+            lines.append(f"设备初始化失败: {self._setup_error}")
+        for poller in (self.pk9019_poller, self.temp_humidity_poller):
+            if poller is not None and poller.error is not None:
+                lines.append(f"{poller.name}: {poller.error}")
+        status = "\n".join(lines)
+        self.set_status(status)
+        return status
+
+    def read_poll_rate(self) -> float:
+        """读取采集频率属性，有PK9019模块时为其采集频率"""
+        adaptive = self.pk9019_adaptive or self.temp_humidity_adaptive
+        interval = adaptive.interval if adaptive is not None else float(self.poll_interval)
+        bus = self.pk9019_bus or self.temp_humidity_bus
+        if bus is not None:
+            # bus方式下从机最快每轮访问一次
+            interval = max(interval, bus.interval)
+        return 1.0 / interval
+
+    def read_bus_utilization(self) -> float:
+        """读取总线占用率属性"""
+        if self.pk9019_bus is None:
+            raise RuntimeError("设备未使用bus采集方式")
+        return self.pk9019_bus.utilization
+
+    def read_bus_cycle_time(self) -> float:
+        """读取总线轮询耗时属性"""
+        if self.pk9019_bus is None:
+            raise RuntimeError("设备未使用bus采集方式")
+        return self.pk9019_bus.cycle_time
+
+    def _request_totals(self):
+        """本设备各模块的请求统计汇总"""
+        registry = get_registry()
+        metrics = []
+        if self.host:
+            metrics.append(registry.device(self.host, self.port, self.slave_address))
+        if self.temp_humidity_host:
+            metrics.append(registry.device(self.temp_humidity_host, self.temp_humidity_port,
+                                           self.temp_humidity_slave_address))
+        return merge_totals(metrics)
+
+    def _cycle_metrics(self) -> list:
+        """本设备各采集任务的周期统计，bus方式下为所在总线的统计"""
+        metrics = []
+        for bus, poller in ((self.pk9019_bus, self.pk9019_poller),
+                            (self.temp_humidity_bus, self.temp_humidity_poller)):
+            if bus is not None:
+                if bus.metrics not in metrics:
+                    metrics.append(bus.metrics)
+            elif getattr(poller, 'metrics', None) is not None:
+                metrics.append(poller.metrics)
+        return metrics
+
+    def read_request_count(self) -> int:
+        """读取请求数属性"""
+        return self._request_totals().requests
+
+    def read_timeout_count(self) -> int:
+        """读取超时次数属性"""
+        return self._request_totals().errors['timeout']
+
+    def read_crc_error_count(self) -> int:
+        """读取CRC错误次数属性"""
+        return self._request_totals().errors['crc_error']
+
+    def read_connection_error_count(self) -> int:
+        """读取连接错误次数属性"""
+        return self._request_totals().errors['connection_error']
+
+    def read_exception_response_count(self) -> int:
+        """读取异常响应次数属性"""
+        return sum(self._request_totals().exceptions.values())
+
+    def read_reconnect_count(self) -> int:
+        """读取重连次数属性"""
+        registry = get_registry()
+        gateways = {(self.host, self.port), (self.temp_humidity_host, self.temp_humidity_port)}
+        return sum(registry.gateway(host, port).reconnects for host, port in gateways if host)
+
+    def read_request_latency_p50(self) -> float:
+        """读取请求时延中位数属性"""
+        return self._request_totals().quantile(0.5)
+
+    def read_request_latency_p99(self) -> float:
+        """读取请求时延P99属性"""
+        return self._request_totals().quantile(0.99)
+
+    def read_request_latency_histogram(self) -> list:
+        """读取请求时延直方图属性"""
+        return self._request_totals().buckets
+
+    def read_cycle_overrun_count(self) -> int:
+        """读取采集超周期次数属性"""
+        return sum(m.overruns for m in self._cycle_metrics())
+
+    def read_cycle_jitter(self) -> float:
+        """读取采集抖动属性"""
+        return max((m.jitter for m in self._cycle_metrics()), default=0.0)
+
+    @command(
+        dtype_out=str,
+        doc_out="Prometheus文本格式的进程内全部统计"
+    )
+    def GetMetrics(self) -> str:
+        """获取进程内所有网关、从机和采集任务的统计"""
+        return get_registry().render_prometheus()
+
+    def read_disconnect_mask(self) -> int:
+        """读取断线位掩码属性"""
+        block = self.alarm_blocks.get('channel_temps') if self.alarm_blocks else None
+        if block is None:
+            raise RuntimeError("设备没有PK9019模块")
+        return block.mask(ALARM_DISCONNECT)
+
+    def read_channel_alarms(self) -> list:
+        """读取通道告警属性"""
+        block = self.alarm_blocks.get('channel_temps') if self.alarm_blocks else None
+        if block is None:
+            raise RuntimeError("设备没有PK9019模块")
+        return block.bits()
+
+    def read_active_alarms(self) -> list:
+        """读取当前告警属性"""
+        alarms = []
+        for name, block in (self.alarm_blocks or {}).items():
+            for i, bits in enumerate(block.bits()):
+                if bits:
+                    alarms.append(f"{name}[{i}]: {','.join(alarm_names(int(bits)))}")
+        return alarms
+
+    @command(
+        dtype_in=str,
+        doc_in="设备组，多个组用逗号分隔，为空表示本服务器进程内的全部设备",
+        dtype_out=DevVarDoubleStringArray,
+        doc_out="数值部分 [通道数N, 设备数D, 数值xN, 时间戳xN, 质量xN, 设备序号xN]，"
+                "字符串部分 [设备名称xD, 通道名称xN]；可用server.bulk.unpack_bulk解析"
+    )
+    def ReadAll(self, argin):
+        """一次返回进程内全部(或指定组)设备各通道的最新数值、时间戳和质量"""
+        return pack_bulk(get_bulk_registry().read(argin))
+
+    @command(
+        dtype_in=(float,),
+        doc_in="[duration, interval, frames]: 分析时长(秒，0表示直到StopProfiling)、"
+               f"采样间隔(秒，默认{DEFAULT_SAMPLE_INTERVAL})、tracemalloc栈深度(默认{DEFAULT_TRACE_FRAMES}，0不跟踪内存)，"
+               "可省略后面的值"
+    )
+    def StartProfiling(self, argin):
+        """开始采样分析、内存分配跟踪和子系统计时，不需要重启服务器"""
+        if len(argin) > 3:
+            raise ValueError(f"参数应为[duration, interval, frames]，实际 {len(argin)} 个值")
+        settings = list(argin) + [0.0, DEFAULT_SAMPLE_INTERVAL, DEFAULT_TRACE_FRAMES][len(argin):]
+        get_profiler().start(duration=float(settings[0]), interval=float(settings[1]),
+                             trace_frames=int(settings[2]), output_dir=self.profile_path)
+
+    @command(
+        dtype_out=str,
+        doc_out="子系统耗时、内存分配位置，以及折叠栈(配置了profile_path时为写入的文件)；"
+                "窗口已自动结束时返回其报告"
+    )
+    def StopProfiling(self) -> str:
+        """停止性能分析并返回报告"""
+        return get_profiler().stop().summary()
+
+    @command(
+        dtype_in=str,
+        doc_in="抓包文件路径，已存在时覆盖",
+        dtype_out=str,
+        doc_out="抓包文件路径"
+    )
+    def StartCapture(self, path: str) -> str:
+        """开始抓包，记录进程内所有网关的收发帧，已在抓包时先停止之前的"""
+        return start_capture(path).path
+
+    @command(
+        dtype_out=str,
+        doc_out="抓包文件路径和记录数，未在抓包时为空"
+    )
+    def StopCapture(self) -> str:
+        """停止抓包并写完文件"""
+        capture = get_capture()
+        if capture is None:
+            return ""
+        stop_capture()
+        return f"{capture.path}: {capture.records} 条记录，丢弃 {capture.dropped} 条"
+
+    @timed('tango')
+    def read_history(self):
+        """读取采集历史属性"""
+        return self.history_buffer.latest(min(int(self.history_window), HISTORY_MAX_ROWS))
+
+    def read_history_columns(self) -> list:
+        """读取采集历史列名属性"""
+        return list(COLUMNS)
+
+    @command(
+        dtype_in=float,
+        doc_in="起始时间戳(秒，time.time())，返回晚于该时刻的记录",
+        dtype_out=(float,),
+        doc_out=f"按行展开的采集记录，每行{len(COLUMNS)}个值，列见history_columns"
+    )
+    def GetHistory(self, since: float):
+        """获取指定时刻之后的全部采集历史"""
+        return self.history_buffer.since(since).ravel()
+
+    @command(
+        dtype_in=(float,),
+        doc_in="[start, end, buckets]: 时间范围(秒，time.time())和时间桶数量",
+        dtype_out=(float,),
+        doc_out="按行展开的聚合结果，每个非空桶一行: 桶起始时间戳，"
+                "之后每个数值列依次为min、max、mean、last"
+    )
+    def GetHistoryAggregate(self, argin):
+        """按等宽时间桶聚合采集历史"""
+        start, end, buckets = self._parse_range(argin)
+        return aggregate(self.history_buffer.between(start, end), start, end, buckets).ravel()
+
+    @command(
+        dtype_in=(float,),
+        doc_in="[start, end, points]: 时间范围(秒，time.time())和每列保留的点数",
+        dtype_out=(float,),
+        doc_out="LTTB降采样结果: 先是形状为(k, 11)的时间戳，再是同形状的数值，均按行展开"
+    )
+    def GetHistoryLTTB(self, argin):
+        """按LTTB算法降采样采集历史，保留峰谷形状"""
+        start, end, points = self._parse_range(argin)
+        timestamps, values = lttb(self.history_buffer.between(start, end), points)
+        return np.concatenate((timestamps.ravel(), values.ravel()))
+
+    @command(
+        dtype_in=(float,),
+        doc_in="[start, end]: 时间范围(秒，time.time())",
+        dtype_out=(float,),
+        doc_out=f"磁盘存储中时间戳在(start, end]内的记录，按行展开，每行{len(COLUMNS)}个值"
+    )
+    def QueryRange(self, argin):
+        """从磁盘存储查询时间范围内的采集记录"""
+        if self.sample_store is None:
+            raise RuntimeError("未配置store_path，没有磁盘存储")
+        if len(argin) != 2:
+            raise ValueError(f"参数应为[start, end]，实际 {len(argin)} 个值")
+        return self.sample_store.read_range(float(argin[0]), float(argin[1]), QUERY_MAX_ROWS).ravel()
+
+    @staticmethod
+    def _parse_range(argin):
+        if len(argin) != 3:
+            raise ValueError(f"参数应为[start, end, count]，实际 {len(argin)} 个值")
+        start, end, count = argin
+        return float(start), float(end), int(count)
+
+    @timed('tango')
     def read_environment_temp(self) -> float:
         """读取环境温度属性"""
         try:
-            return self.pk9019_device.get_environment_temp()
+            snapshot, timestamp, quality = self._cached_value(self.pk9019_poller)
+            return snapshot.environment_temp, timestamp, self._alarm_quality('environment_temp', quality)
         except Exception as e:
-            log.error(f"读取环境温度失败: {str(e)}")
-            self.set_state(DevState.FAULT)
+            log.error("读取环境温度失败 %s: %s", self.get_name(), e)
             raise
 
+    @timed('tango')
     def read_channel_temps(self) -> list[float]:
         """读取通道温度属性"""
         try:
-            temps = self.pk9019_device.get_all_temps()
-            # 将'断线'转换为0.0
-            return [0.0 if temp == '断线' else temp for temp in temps]
+            snapshot, timestamp, quality = self._cached_value(self.pk9019_poller)
+            # 断线通道为NaN，不再以0.0冒充有效读数；断线告警见disconnect_mask
+            temps = [math.nan if temp == '断线' else temp for temp in snapshot.channel_temps]
+            return temps, timestamp, self._alarm_quality('channel_temps', quality)
         except Exception as e:
-            log.error(f"读取通道温度失败: {str(e)}")
-            self.set_state(DevState.FAULT)
+            log.error("读取通道温度失败 %s: %s", self.get_name(), e)
             raise
         
+    @timed('tango')
     def read_temp_humidity(self) -> tuple[float]:
         """读取温度湿度属性"""
         try:
-            return self.temp_humidity_device.get_temp_humidity()
+            value, timestamp, quality = self._cached_value(self.temp_humidity_poller)
+            return value, timestamp, self._alarm_quality('temp_humidity', quality)
         except Exception as e:
-            log.error(f"读取温度湿度失败: {str(e)}")
-            self.set_state(DevState.FAULT)  
\ No newline at end of file
+            log.error("读取温度湿度失败 %s: %s", self.get_name(), e)
+            raise
\ No newline at end of file
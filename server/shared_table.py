@@ -0,0 +1,187 @@
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+# 每个槽位的列: 采集时刻、单调时钟时刻、状态，之后是模块的数值(PK9019为环境温度+8个通道)
+TABLE_COLUMNS = ('timestamp', 'monotonic', 'status') + tuple(f'value_{i}' for i in range(9))
+TIMESTAMP, MONOTONIC, STATUS = 0, 1, 2
+VALUES = slice(3, len(TABLE_COLUMNS))
+VALUE_COUNT = len(TABLE_COLUMNS) - 3
+
+# 槽位状态
+STATUS_EMPTY = 0.0  # 尚未采集
+STATUS_OK = 1.0  # 最近一次采集成功
+STATUS_ERROR = 2.0  # 最近一次采集失败，数值为上一次成功的结果
+STATUS_STALE = 3.0  # 读取时槽位一直处于写入中(写者在写入途中退出)，数据不可用
+
+
+class SharedSnapshotTable:
+    """
+    跨进程共享的采集快照表
+
+    一块multiprocessing.shared_memory，依次存放每个槽位的序列号(uint64)、
+    每个工作进程的心跳时刻(float64)、每个槽位的数据(float64 x len(TABLE_COLUMNS))、
+    每个槽位的代数和已释放的代数(uint64)。
+    每个槽位只有一个写者(拥有该模块的工作进程)，用seqlock保护: 写者写入前后
+    各把序列号加1，序列号为奇数表示正在写入；读者在读取前后序列号相同且为偶数时
+    才接受结果，否则重试。读者不加锁，也不与写进程通信。
+    槽位的代数由监管进程在移除模块时加1，写者只写入自己所属代数的槽位，
+    原写者确认释放(release)后槽位才能重新分配，保证同一时刻只有一个写者。
+    """
+
+    def __init__(self, slots: int, workers: int, name: Optional[str] = None, create: bool = True):
+        """
+        创建或连接共享表
+
+        Args:
+            slots: 槽位数，每个采集模块占一个
+            workers: 工作进程数
+            name: 共享内存名称，连接已有的表时必须指定
+            create: True时创建新的共享内存，False时连接name指定的共享内存
+        """
+        self.slots = slots
+        self.workers = workers
+        size = slots * 8 + workers * 8 + slots * len(TABLE_COLUMNS) * 8 + slots * 16
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.name = self.shm.name
+        buffer = self.shm.buf
+        self._seqs = np.ndarray((slots,), np.uint64, buffer, 0)
+        self._heartbeats = np.ndarray((workers,), np.float64, buffer, slots * 8)
+        self._data = np.ndarray((slots, len(TABLE_COLUMNS)), np.float64, buffer, (slots + workers) * 8)
+        offset = (slots + workers + slots * len(TABLE_COLUMNS)) * 8
+        self._generations = np.ndarray((slots,), np.uint64, buffer, offset)
+        self._released = np.ndarray((slots,), np.uint64, buffer, offset + slots * 8)
+        if create:
+            self._seqs[:] = 0
+            self._heartbeats[:] = 0.0
+            self._data[:] = np.nan
+            self._data[:, STATUS] = STATUS_EMPTY
+            self._generations[:] = 0
+            self._released[:] = 0
+
+    def write(self, slot: int, generation: int, timestamp: float, monotonic: float,
+              values: Sequence[float]) -> bool:
+        """
+        写入一次成功的采集结果，values不足VALUE_COUNT个时其余为NaN
+
+        Args:
+            generation: 写者所属的槽位代数，与当前代数不同(模块已移除)时不写入
+
+        Returns:
+            bool: 是否写入
+        """
+        if int(self._generations[slot]) != generation:
+            return False
+        row = self._data[slot]
+        self._seqs[slot] += 1
+        row[TIMESTAMP] = timestamp
+        row[MONOTONIC] = monotonic
+        row[STATUS] = STATUS_OK
+        row[VALUES] = np.nan
+        row[VALUES.start:VALUES.start + len(values)] = values
+        self._seqs[slot] += 1
+        return True
+
+    def mark_error(self, slot: int, generation: int):
+        """标记最近一次采集失败，保留上一次的数值；代数不同时不写入"""
+        if int(self._generations[slot]) != generation:
+            return
+        self._seqs[slot] += 1
+        self._data[slot, STATUS] = STATUS_ERROR
+        self._seqs[slot] += 1
+
+    def clear(self, slot: int):
+        """
+        清空槽位，供重新分配
+
+        只能在槽位没有写者时调用(已释放或写者进程已退出)；
+        写者在写入途中退出留下的奇数序列号在这里恢复为偶数。
+        """
+        seq = int(self._seqs[slot]) | 1
+        self._seqs[slot] = seq
+        self._data[slot] = np.nan
+        self._data[slot, STATUS] = STATUS_EMPTY
+        self._seqs[slot] = seq + 1
+
+    def recover(self, slot: int):
+        """
+        写者进程退出后恢复槽位
+
+        序列号为奇数(写入中断)时数据可能不完整，标记为采集失败并恢复为偶数序列号。
+        只能在原写者已退出、新写者尚未启动时调用。
+        """
+        seq = int(self._seqs[slot])
+        if seq & 1:
+            self._data[slot, STATUS] = STATUS_ERROR
+            self._seqs[slot] = seq + 1
+
+    def generation(self, slot: int) -> int:
+        """槽位当前的代数，分配给模块时写入ModuleSpec"""
+        return int(self._generations[slot])
+
+    def retire(self, slot: int):
+        """模块移除时由监管进程调用，原写者之后的写入被忽略"""
+        self._generations[slot] += 1
+
+    def release(self, slot: int):
+        """原写者确认不再写入该槽位"""
+        self._released[slot] = self._generations[slot]
+
+    def released(self, slot: int) -> bool:
+        """槽位是否已没有写者，可以重新分配"""
+        return int(self._released[slot]) == int(self._generations[slot])
+
+    def read(self, slot: int, max_wait: float = 0.05) -> Tuple[int, np.ndarray]:
+        """
+        一致地读取一个槽位
+
+        Args:
+            max_wait: 槽位一直处于写入中时最多等待的时间，单位秒
+
+        Returns:
+            Tuple[int, np.ndarray]: (序列号, 槽位数据的拷贝)；超过max_wait仍读不到一致的数据时
+                数值为NaN、状态为STATUS_STALE
+        """
+        spins = 0
+        deadline = None
+        while True:
+            before = int(self._seqs[slot])
+            if not before & 1:
+                row = self._data[slot].copy()
+                if int(self._seqs[slot]) == before:
+                    return before, row
+            spins += 1
+            if spins % 100 == 0:
+                # 写者被调度出去时让出CPU
+                time.sleep(0)
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + max_wait
+                elif now >= deadline:
+                    # 写者在写入途中退出，不再无限等待
+                    row = np.full(len(TABLE_COLUMNS), np.nan)
+                    row[STATUS] = STATUS_STALE
+                    return before, row
+
+    def sequences(self) -> np.ndarray:
+        """所有槽位序列号的拷贝，用于发现有更新的槽位"""
+        return self._seqs.copy()
+
+    def heartbeat(self, worker: int):
+        """工作进程报告存活"""
+        self._heartbeats[worker] = time.monotonic()
+
+    def last_heartbeat(self, worker: int) -> float:
+        """工作进程最近一次心跳的time.monotonic()时刻，0表示尚未报告"""
+        return float(self._heartbeats[worker])
+
+    def close(self):
+        """断开共享内存，本进程中的数组视图随之失效"""
+        self._seqs = self._heartbeats = self._data = self._generations = self._released = None
+        self.shm.close()
+
+    def unlink(self):
+        """删除共享内存，由创建者在所有进程断开后调用"""
+        self.shm.unlink()
@@ -0,0 +1,289 @@
+import atexit
+import datetime
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from server.history import COLUMNS, TIMESTAMP, encode_record
+
+log = logging.getLogger(__name__)
+
+# 每条记录的字节数，记录与HistoryBuffer的列一致，按行连续存放
+RECORD_SIZE = len(COLUMNS) * 8
+# 稀疏时间索引的间隔: 每INDEX_STRIDE条记录取一个时间戳
+INDEX_STRIDE = 1024
+# 查询时每次从映射文件中拷贝出的记录数
+CHUNK_ROWS = 65536
+SEGMENT_SUFFIX = '.dat'
+
+
+def segment_name(timestamp: float) -> str:
+    """记录所属的日分段文件名(本地日期)，如2024-05-01.dat"""
+    return datetime.date.fromtimestamp(timestamp).isoformat() + SEGMENT_SUFFIX
+
+
+def _next_midnight(timestamp: float) -> float:
+    # timestamp所在本地日期的下一个零点
+    day = datetime.date.fromtimestamp(timestamp) + datetime.timedelta(days=1)
+    return datetime.datetime.combine(day, datetime.time()).timestamp()
+
+
+class _Segment:
+    """
+    一个只读的日分段文件
+
+    文件按记录内存映射，稀疏索引常驻内存；正在写入的分段每次查询前按文件大小扩展映射，
+    末尾未写完整的记录被忽略。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.records: Optional[np.memmap] = None
+        self.index = np.empty(0)  # 第i项为第i*INDEX_STRIDE条记录的时间戳
+
+    def refresh(self) -> int:
+        """按当前文件大小更新映射和稀疏索引，返回记录数"""
+        rows = os.path.getsize(self.path) // RECORD_SIZE
+        if rows != self.rows:
+            self.records = np.memmap(self.path, dtype=np.float64, mode='r', shape=(rows, len(COLUMNS))) \
+                if rows else None
+            if rows:
+                # 只读取新增部分的索引点，每个索引点只触及一个页面
+                known = len(self.index) if rows > self.rows else 0
+                self.index = np.concatenate((
+                    self.index[:known],
+                    self.records[known * INDEX_STRIDE::INDEX_STRIDE, TIMESTAMP]))
+            else:
+                self.index = np.empty(0)
+            self.rows = rows
+        return rows
+
+    def search(self, timestamp: float) -> int:
+        """
+        第一条时间戳晚于timestamp的记录位置，O(log n)
+
+        先在稀疏索引中二分定位块，再只在这一块(INDEX_STRIDE条记录)中二分。
+        """
+        block = np.searchsorted(self.index, timestamp, side='right')
+        if block == 0:
+            return 0
+        lo = (block - 1) * INDEX_STRIDE
+        hi = min(block * INDEX_STRIDE, self.rows)
+        return lo + int(np.searchsorted(self.records[lo:hi, TIMESTAMP], timestamp, side='right'))
+
+
+class SampleStore:
+    """
+    只追加的磁盘采集记录存储
+
+    每个设备一个目录，按本地日期分为日分段文件，文件内容为定长的float64记录
+    (列与HistoryBuffer相同，每条RECORD_SIZE字节)，没有文件头，可直接用
+    np.memmap或np.fromfile读取。写入由共享的StoreWriter线程批量完成，
+    采集线程只把记录放入队列；查询通过内存映射和稀疏时间索引定位，
+    按块流式返回，不把整个文件读入内存。
+    """
+
+    def __init__(self, directory: str, writer: Optional['StoreWriter'] = None):
+        """
+        初始化存储
+
+        Args:
+            directory: 存储目录，不存在时创建
+            writer: 批量写入线程，默认使用进程内共享的写入线程
+        """
+        self.directory = directory
+        self.writer = writer
+        self._file = None
+        self._segment_end = -math.inf  # 当前写入分段的结束时刻(下一个本地零点)
+        self._lock = threading.Lock()
+        self._segments: Dict[str, _Segment] = {}
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, timestamp: float, environment_temp: float, channels: Sequence,
+               temperature: float = math.nan, humidity: float = math.nan):
+        """
+        提交一条记录，参数与HistoryBuffer.append相同；实际写入在写入线程中批量完成
+        """
+        row = encode_record(np.empty(len(COLUMNS)), timestamp, environment_temp, channels,
+                            temperature, humidity)
+        (self.writer or get_writer()).submit(self, row)
+
+    def write(self, records: np.ndarray):
+        """
+        把一批记录直接写入分段文件，跨零点的批次按日期拆分
+
+        Args:
+            records: 按时间排序的记录，形状为(n, len(COLUMNS))
+        """
+        with self._lock:
+            if self._closed:
+                return
+            while len(records):
+                if records[0, TIMESTAMP] >= self._segment_end:
+                    self._open_segment(records[0, TIMESTAMP])
+                split = int(np.searchsorted(records[:, TIMESTAMP], self._segment_end, side='left'))
+                self._file.write(np.ascontiguousarray(records[:split]).tobytes())
+                records = records[split:]
+            self._file.flush()
+
+    def _open_segment(self, timestamp: float):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, segment_name(timestamp))
+        # 进程异常退出时可能残留不完整的记录，截断到整条记录
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            if size % RECORD_SIZE:
+                log.warning(f"分段文件末尾有不完整的记录，已截断: {path}")
+                os.truncate(path, size - size % RECORD_SIZE)
+        self._file = open(path, 'ab')
+        self._segment_end = _next_midnight(timestamp)
+
+    def close(self):
+        """写出队列中的记录并关闭当前分段文件"""
+        (self.writer or get_writer()).flush()
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def segments(self) -> List[str]:
+        """按日期排序的分段文件路径"""
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def query(self, start: float, end: float, chunk_rows: int = CHUNK_ROWS) -> Iterator[np.ndarray]:
+        """
+        流式取出时间戳在(start, end]内的记录
+
+        Args:
+            start: 起始时间戳(不含)
+            end: 结束时间戳(含)
+            chunk_rows: 每块的最大记录数
+
+        Yields:
+            np.ndarray: 按时间排序的记录块，形状为(k, len(COLUMNS))，是映射文件的拷贝
+        """
+        if end <= start:
+            return
+        first, last = segment_name(start), segment_name(end)
+        for path in self.segments():
+            name = os.path.basename(path)
+            if not first <= name <= last:
+                continue
+            segment = self._segment(path)
+            with self._lock:
+                if not segment.refresh():
+                    continue
+                lo, hi = segment.search(start), segment.search(end)
+                records = segment.records
+            for offset in range(lo, hi, chunk_rows):
+                yield np.array(records[offset:min(offset + chunk_rows, hi)])
+
+    def _segment(self, path: str) -> _Segment:
+        with self._lock:
+            segment = self._segments.get(path)
+            if segment is None:
+                segment = self._segments[path] = _Segment(path)
+            return segment
+
+    def read_range(self, start: float, end: float, max_rows: Optional[int] = None) -> np.ndarray:
+        """
+        取出时间戳在(start, end]内的全部记录
+
+        Args:
+            start: 起始时间戳(不含)
+            end: 结束时间戳(含)
+            max_rows: 最多返回的记录数，超出时抛出ValueError
+
+        Returns:
+            np.ndarray: 按时间排序的记录，形状为(n, len(COLUMNS))
+        """
+        chunks = []
+        rows = 0
+        for chunk in self.query(start, end):
+            rows += len(chunk)
+            if max_rows is not None and rows > max_rows:
+                raise ValueError(f"查询结果超过 {max_rows} 条，请缩小时间范围或使用导出工具")
+            chunks.append(chunk)
+        if not chunks:
+            return np.empty((0, len(COLUMNS)))
+        return np.concatenate(chunks)
+
+
+class StoreWriter:
+    """
+    磁盘存储的批量写入线程
+
+    所有SampleStore共享一个线程，每flush_interval秒把队列中的记录按存储分组，
+    每个存储一次write调用写出，采集线程不接触文件；进程正常退出时写出剩余记录。
+    """
+
+    def __init__(self, flush_interval: float = 1.0, maxsize: int = 1000000):
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, store: SampleStore, row: np.ndarray):
+        """提交一条记录，队列满时丢弃"""
+        self._start()
+        try:
+            self._queue.put_nowait((store, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """立即写出队列中的全部记录"""
+        with self._flush_lock:
+            batches: Dict[SampleStore, List[np.ndarray]] = {}
+            while True:
+                try:
+                    store, row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.setdefault(store, []).append(row)
+            for store, rows in batches.items():
+                try:
+                    store.write(np.stack(rows))
+                except Exception as e:
+                    log.error(f"写入采集记录失败 {store.directory}: {str(e)}")
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="store-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+_writer: Optional[StoreWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> StoreWriter:
+    """获取进程内共享的批量写入线程"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = StoreWriter()
+        return _writer
+
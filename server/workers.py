@@ -0,0 +1,439 @@
+import atexit
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from device.async_device import AsyncPK9019, AsyncTempHumidity
+from device.framing import FRAMING_RTU, create_async_transport
+from device.pk9019 import PK9019Snapshot
+from device.pool import TransportPool
+from server.acquisition import Snapshot
+from server.async_engine import get_scheduler
+from server.shared_table import (MONOTONIC, STATUS, STATUS_EMPTY, STATUS_ERROR, STATUS_STALE, TIMESTAMP, VALUES,
+                                 SharedSnapshotTable)
+
+log = logging.getLogger(__name__)
+
+# 采集模块类型
+PK9019_MODULE = 'pk9019'
+TEMP_HUMIDITY_MODULE = 'temp_humidity'
+
+
+@dataclass(frozen=True)
+class ModuleSpec:
+    """工作进程中一个采集模块的配置"""
+    slot: int
+    kind: str  # PK9019_MODULE或TEMP_HUMIDITY_MODULE
+    host: str
+    port: int
+    slave_address: int
+    interval: float
+    deadline: float
+    framing: str = FRAMING_RTU
+    generation: int = 0  # 分配时槽位的代数，模块移除后旧代数的写入被共享表忽略
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}-{self.host}:{self.port}/{self.slave_address}"
+
+
+def encode_value(kind: str, value) -> List[float]:
+    """把模块的采集结果转换为共享表中的数值，断线通道为NaN"""
+    if kind == PK9019_MODULE:
+        return [float(value.environment_temp)] + [math.nan if t == '断线' else float(t)
+                                                  for t in value.channel_temps]
+    return [float(v) for v in value]
+
+
+def decode_value(kind: str, values: np.ndarray):
+    """把共享表中的数值还原为与设备类相同的采集结果"""
+    if kind == PK9019_MODULE:
+        return PK9019Snapshot(
+            environment_temp=float(values[0]),
+            channel_temps=['断线' if v != v else float(v) for v in values[1:9]])
+    return float(values[0]), float(values[1])
+
+
+def _worker_main(worker: int, table_name: str, slots: int, workers: int,
+                 specs: Sequence[ModuleSpec], commands, heartbeat_interval: float):
+    # 工作进程入口: 在进程内的asyncio调度器中采集本分片的模块，结果写入共享表
+    table = SharedSnapshotTable(slots, workers, name=table_name, create=False)
+    scheduler = get_scheduler()
+    pool = TransportPool(create_async_transport)
+    modules = {}
+
+    def add(spec: ModuleSpec):
+        transport = pool.acquire(spec.host, spec.port, spec.deadline, framing=spec.framing)
+        if spec.kind == PK9019_MODULE:
+            device = AsyncPK9019(spec.host, spec.port, spec.slave_address, transport=transport)
+            read = device.read_snapshot
+        else:
+            device = AsyncTempHumidity(spec.host, spec.port, spec.slave_address, transport=transport)
+            read = device.get_temp_humidity
+
+        async def read_func():
+            try:
+                return await read()
+            except BaseException:
+                # 包括超过截止时间被取消
+                table.mark_error(spec.slot, spec.generation)
+                raise
+
+        job = scheduler.add_job(spec.name, read_func, spec.interval, spec.deadline)
+        job.on_update = lambda snapshot: table.write(spec.slot, spec.generation, snapshot.timestamp,
+                                                     snapshot.monotonic, encode_value(spec.kind, snapshot.value))
+        modules[spec.slot] = (job, transport)
+
+    def remove(slot: int):
+        job, transport = modules.pop(slot, (None, None))
+        if job is not None:
+            scheduler.remove_job(job)
+            transport = pool.release(transport)
+            if transport is not None:
+                scheduler.run_coroutine(transport.close())
+        # 写入都在事件循环中执行，确认排在取消任务之后，此后本进程不再写入该槽位
+        scheduler.run_coroutine(_release(table, slot))
+
+    for spec in specs:
+        add(spec)
+
+    parent = multiprocessing.parent_process()
+    while parent is None or parent.is_alive():
+        # 事件循环能及时执行协程才报告存活，卡死的工作进程由监管线程重启
+        try:
+            scheduler.run_coroutine(_noop()).result(heartbeat_interval)
+            table.heartbeat(worker)
+        except Exception:
+            pass
+        try:
+            command = commands.get(timeout=heartbeat_interval)
+        except queue.Empty:
+            continue
+        if command is None:
+            break
+        op, arg = command
+        if op == 'add':
+            add(arg)
+        elif op == 'remove':
+            remove(arg)
+        elif op == 'interval':
+            slot, interval = arg
+            if slot in modules:
+                modules[slot][0].set_interval(interval)
+
+    scheduler.stop(timeout=1.0)
+    table.close()
+
+
+async def _noop():
+    pass
+
+
+async def _release(table: SharedSnapshotTable, slot: int):
+    table.release(slot)
+
+
+class SharedSlot:
+    """
+    前端进程中一个采集模块的视图
+
+    与AcquisitionLoop、PollJob一样对外提供snapshot、error和on_update，
+    snapshot直接从共享表读取，PK9019Server读取属性时不区分采集方式。
+    """
+
+    def __init__(self, supervisor: 'ShardSupervisor', spec: ModuleSpec, worker: int):
+        self.supervisor = supervisor
+        self.spec = spec
+        self.worker = worker
+        self.name = spec.name
+        self.on_update: Optional[Callable[[Snapshot], None]] = None
+        self._cache: Optional[tuple] = None  # (序列号, 快照)
+
+    def read(self):
+        """
+        从共享表一致地读取本模块
+
+        Returns:
+            tuple: (快照，尚未采集时为None, 槽位状态)
+        """
+        seq, row = self.supervisor.table.read(self.spec.slot)
+        cache = self._cache
+        if row[STATUS] == STATUS_STALE:
+            return (cache[1] if cache is not None else None), STATUS_STALE
+        if cache is not None and cache[0] == seq:
+            return cache[1], row[STATUS]
+        snapshot = None
+        # 从未采集成功的槽位时间戳为NaN
+        if row[STATUS] != STATUS_EMPTY and row[TIMESTAMP] == row[TIMESTAMP]:
+            snapshot = Snapshot(value=decode_value(self.spec.kind, row[VALUES]),
+                                timestamp=float(row[TIMESTAMP]), monotonic=float(row[MONOTONIC]))
+        self._cache = (seq, snapshot)
+        return snapshot, row[STATUS]
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self.read()[0]
+
+    @property
+    def interval(self) -> float:
+        return self.spec.interval
+
+    def set_interval(self, interval: float):
+        """修改采集周期，由工作进程中的采集任务生效"""
+        self.supervisor.set_interval(self, interval)
+
+    @property
+    def error(self) -> Optional[str]:
+        if not self.supervisor.worker_alive(self.worker):
+            return f"工作进程 {self.worker} 未运行"
+        status = self.read()[1]
+        if status == STATUS_ERROR:
+            return "采集失败"
+        if status == STATUS_STALE:
+            return "共享表槽位写入中断"
+        return None
+
+
+class ShardSupervisor:
+    """
+    多进程采集的分片监管器
+
+    采集模块按网关host:port分片到固定数量的工作进程，同一网关的模块总在同一个进程中，
+    共享一个连接。工作进程把采集结果写入SharedSnapshotTable，前端进程直接读表；
+    监管线程按心跳重启退出或卡死的工作进程，并把表中有更新的槽位分发给on_update回调。
+    移除的模块的槽位先隔离，原工作进程确认释放(或已退出)后才重新分配。
+    """
+
+    def __init__(self, workers: int = 2, slots: int = 1024, heartbeat_timeout: float = 10.0,
+                 watch_interval: float = 0.05):
+        """
+        初始化监管器
+
+        Args:
+            workers: 工作进程数
+            slots: 共享表槽位数，即最多的采集模块数
+            heartbeat_timeout: 超过该时间(秒)没有心跳的工作进程被重启
+            watch_interval: 检查共享表更新的间隔，单位秒
+        """
+        self.workers = workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.watch_interval = watch_interval
+        self.table = SharedSnapshotTable(slots, workers)
+        self.restarts = [0] * workers
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._commands: List[Optional[multiprocessing.Queue]] = [None] * workers
+        self._started = [0.0] * workers  # 工作进程启动时刻，用于启动阶段的心跳宽限
+        self._specs: Dict[int, ModuleSpec] = {}
+        self._slots: Dict[int, SharedSlot] = {}
+        # 空闲槽位按先进先出分配，刚释放的槽位最晚被重用
+        self._free = deque(range(slots))
+        self._quarantine: Dict[int, int] = {}  # 等待工作进程确认释放的槽位 -> 工作进程
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def worker_of(self, host: str, port: int) -> int:
+        """网关所属的工作进程编号"""
+        return zlib.crc32(f"{host}:{port}".encode()) % self.workers
+
+    def worker_alive(self, worker: int) -> bool:
+        process = self._processes[worker]
+        return process is not None and process.is_alive()
+
+    def start(self):
+        """启动所有工作进程和监管线程"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            for worker in range(self.workers):
+                self._spawn(worker)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shard-supervisor", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        log.info(f"多进程采集已启动: {self.workers} 个工作进程")
+
+    def stop(self, timeout: float = 2.0):
+        """停止所有工作进程并删除共享表"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        thread.join(timeout)
+        for worker in range(self.workers):
+            self._terminate(worker, timeout)
+        self.table.close()
+        self.table.unlink()
+        log.info("多进程采集已停止")
+
+    def add_module(self, kind: str, host: str, port: int, slave_address: int, interval: float,
+                   deadline: float, framing: str = FRAMING_RTU) -> SharedSlot:
+        """
+        添加采集模块，监管器未启动时自动启动
+
+        Returns:
+            SharedSlot: 模块在前端的视图
+        """
+        self.start()
+        with self._lock:
+            self._reclaim()
+            if not self._free:
+                raise RuntimeError(f"共享表槽位已用完({self.table.slots})")
+            index = self._free.popleft()
+            spec = ModuleSpec(index, kind, host, port, slave_address, interval, deadline, framing,
+                              self.table.generation(index))
+            worker = self.worker_of(host, port)
+            self.table.clear(spec.slot)
+            self._specs[spec.slot] = spec
+            slot = self._slots[spec.slot] = SharedSlot(self, spec, worker)
+            self._send(worker, ('add', spec))
+        return slot
+
+    def remove_module(self, slot: SharedSlot):
+        """移除采集模块并释放槽位"""
+        with self._lock:
+            if self._specs.pop(slot.spec.slot, None) is None:
+                return
+            self._slots.pop(slot.spec.slot, None)
+            self.table.retire(slot.spec.slot)
+            self._quarantine[slot.spec.slot] = slot.worker
+            self._send(slot.worker, ('remove', slot.spec.slot))
+
+    def _reclaim(self):
+        # 工作进程已确认释放的槽位回到空闲列表
+        for index in [i for i in self._quarantine if self.table.released(i)]:
+            del self._quarantine[index]
+            self._free.append(index)
+
+    def set_interval(self, slot: SharedSlot, interval: float):
+        """修改采集模块的周期，工作进程重启后沿用新周期"""
+        with self._lock:
+            spec = self._specs.get(slot.spec.slot)
+            if spec is None:
+                return
+            slot.spec = self._specs[spec.slot] = replace(spec, interval=interval)
+            self._send(slot.worker, ('interval', (spec.slot, interval)))
+
+    def _send(self, worker: int, command):
+        commands = self._commands[worker]
+        if commands is not None:
+            commands.put(command)
+
+    def _spawn(self, worker: int):
+        # 重启时使用新的命令队列，避免被杀死的进程留下损坏的队列
+        specs = [spec for spec in self._specs.values() if self.worker_of(spec.host, spec.port) == worker]
+        commands = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker, self.table.name, self.table.slots, self.workers, specs, commands,
+                  self.heartbeat_timeout / 4),
+            name=f"acquisition-worker-{worker}",
+            daemon=True)
+        process.start()
+        self._processes[worker] = process
+        self._commands[worker] = commands
+        self._started[worker] = time.monotonic()
+
+    def _terminate(self, worker: int, timeout: float):
+        process, commands = self._processes[worker], self._commands[worker]
+        if process is None:
+            return
+        if process.is_alive() and commands is not None:
+            commands.put(None)
+            process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout)
+        self._processes[worker] = None
+        self._commands[worker] = None
+
+    def _supervise(self):
+        now = time.monotonic()
+        for worker in range(self.workers):
+            process = self._processes[worker]
+            if process is not None and process.is_alive():
+                beat = max(self.table.last_heartbeat(worker), self._started[worker])
+                if now - beat <= self.heartbeat_timeout:
+                    if now - self._started[worker] > 60.0:
+                        # 稳定运行后重新计算退避
+                        self.restarts[worker] = 0
+                    continue
+                log.error(f"工作进程 {worker} 超过 {self.heartbeat_timeout}s 没有心跳，重启")
+            else:
+                # 连续崩溃时按指数退避重启，避免反复拉起
+                delay = min(2.0 ** min(self.restarts[worker], 5), 30.0)
+                if now - self._started[worker] < delay:
+                    continue
+                exitcode = process.exitcode if process is not None else None
+                log.error(f"工作进程 {worker} 已退出(exitcode={exitcode})，重启")
+            with self._lock:
+                self._terminate(worker, 1.0)
+                self._recover(worker)
+                self.restarts[worker] += 1
+                self._spawn(worker)
+
+    def _recover(self, worker: int):
+        # 工作进程已退出，恢复它在写入途中留下的槽位，它没来得及确认的槽位视为已释放
+        for spec in self._specs.values():
+            if self.worker_of(spec.host, spec.port) == worker:
+                self.table.recover(spec.slot)
+        for index, owner in self._quarantine.items():
+            if owner == worker:
+                self.table.recover(index)
+                self.table.release(index)
+
+    def _dispatch(self, last: np.ndarray) -> np.ndarray:
+        # 向量化比较序列号，只为有新的成功采集的槽位调用回调
+        seqs = self.table.sequences()
+        for index in np.flatnonzero((seqs != last) & (seqs % 2 == 0)):
+            slot = self._slots.get(int(index))
+            if slot is None or slot.on_update is None:
+                continue
+            snapshot, status = slot.read()
+            if snapshot is None or status in (STATUS_ERROR, STATUS_STALE):
+                continue
+            try:
+                slot.on_update(snapshot)
+            except Exception as e:
+                log.error(f"快照回调失败 {slot.name}: {str(e)}")
+        return seqs
+
+    def _run(self):
+        last = self.table.sequences()
+        next_check = time.monotonic()
+        while not self._stop.wait(self.watch_interval):
+            last = self._dispatch(last)
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + 1.0
+                self._supervise()
+
+
+_supervisor: Optional[ShardSupervisor] = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor(**settings) -> ShardSupervisor:
+    """
+    获取进程内共享的分片监管器，不存在时以settings创建
+
+    Args:
+        settings: 传给ShardSupervisor的参数，只在创建时生效
+    """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            settings.setdefault('workers', os.cpu_count() or 1)
+            _supervisor = ShardSupervisor(**settings)
+        return _supervisor
@@ -0,0 +1,292 @@
+"""
+采集和服务热路径的基准测试
+
+以test/simulator.py为目标，测量：
+- CRC16、请求帧构建、响应帧校验和解析的每秒次数
+- 单个设备往返时延的分位数
+- 全部模块完成一轮采集的耗时随模块数的变化
+- 读取缓存快照与每次直接读取设备的时延(加--tango时通过DeviceProxy读取Tango属性)
+
+结果保存为JSON，可与之前的结果对比：
+    python test/benchmark.py --output benchmark.json
+    python test/benchmark.py --output new.json --compare benchmark.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+if __name__ == '__main__':
+    # 作为脚本运行时把项目根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from device.async_device import AsyncPK9019, AsyncRtuOverTcpTransport
+from device.pk9019 import PK9019
+from device.transport import (RtuOverTcpTransport, calculate_crc, check_frame, crc16, pack_read_request,
+                              unpack_registers)
+from server.acquisition import AcquisitionLoop
+from simulator import FaultConfig, Simulator
+
+# 每个模拟网关后的PK9019从机数
+SLAVES_PER_GATEWAY = 8
+
+
+def rate(func: Callable[[], None], duration: float) -> float:
+    """在duration秒内反复调用func，返回每秒调用次数"""
+    count = 0
+    batch = 1000
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        count += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return count / elapsed
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """时延分位数，单位毫秒"""
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def bench_codec(duration: float) -> Dict[str, float]:
+    """CRC和帧编解码吞吐，单位次/秒"""
+    request = bytearray(8)
+    body = bytes((1, 0x03, 18)) + bytes(range(18))
+    response = body + calculate_crc(body)
+    short = bytes(6)
+
+    def decode():
+        check_frame(response, 1, 0x03)
+        unpack_registers(response, 9)
+
+    return {
+        'crc16_6_bytes_per_s': rate(lambda: crc16(short), duration),
+        'crc16_21_bytes_per_s': rate(lambda: crc16(body), duration),
+        'encode_request_per_s': rate(lambda: pack_read_request(request, 1, 0x0001, 9), duration),
+        'decode_response_per_s': rate(decode, duration),
+    }
+
+
+def bench_round_trip(latency: float, requests: int) -> Dict[str, float]:
+    """单个设备的往返时延"""
+    simulator = Simulator(pk9019=[1], faults=FaultConfig(latency=latency)).start_in_thread()
+    try:
+        transport = RtuOverTcpTransport('127.0.0.1', simulator.port, timeout=2.0)
+        transport.connect()
+        for _ in range(min(100, requests)):
+            transport.read_holding_registers(1, 0x0001, 9)
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            transport.read_holding_registers(1, 0x0001, 9)
+            samples.append(time.perf_counter() - start)
+        transport.close()
+        return percentiles(samples)
+    finally:
+        simulator.stop()
+
+
+async def _fleet_cycles(ports: List[int], modules: int, cycles: int) -> List[float]:
+    transports = {port: AsyncRtuOverTcpTransport('127.0.0.1', port, timeout=2.0) for port in ports}
+    devices = [AsyncPK9019('127.0.0.1', port, slave, transport=transports[port])
+               for port in ports for slave in range(1, SLAVES_PER_GATEWAY + 1)][:modules]
+    await asyncio.gather(*(device.read_snapshot() for device in devices))
+    samples = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        await asyncio.gather(*(device.read_snapshot() for device in devices))
+        samples.append(time.perf_counter() - start)
+    for transport in transports.values():
+        await transport.close()
+    return samples
+
+
+def bench_fleet(module_counts: Sequence[int], latency: float, cycles: int) -> Dict[str, Dict[str, float]]:
+    """
+    全部模块完成一轮采集的耗时
+
+    每个模拟网关后SLAVES_PER_GATEWAY个从机，同一网关的请求串行，不同网关并发，
+    与async采集方式相同。
+    """
+    gateways = -(-max(module_counts) // SLAVES_PER_GATEWAY)
+    simulators = [Simulator(pk9019=range(1, SLAVES_PER_GATEWAY + 1), faults=FaultConfig(latency=latency))
+                  .start_in_thread() for _ in range(gateways)]
+    try:
+        results = {}
+        for modules in module_counts:
+            ports = [s.port for s in simulators[:-(-modules // SLAVES_PER_GATEWAY)]]
+            samples = asyncio.run(_fleet_cycles(ports, modules, cycles))
+            results[str(modules)] = percentiles(samples)
+        return results
+    finally:
+        for simulator in simulators:
+            simulator.stop()
+
+
+def bench_cached_read(latency: float, reads: int) -> Dict[str, Dict[str, float]]:
+    """读取后台采集的缓存快照与每次直接读取设备的时延"""
+    simulator = Simulator(pk9019=[1], faults=FaultConfig(latency=latency)).start_in_thread()
+    try:
+        device = PK9019('127.0.0.1', simulator.port, slave_address=1)
+        device.transport.connect()
+        loop = AcquisitionLoop('benchmark', device.read_snapshot, interval=0.1)
+        loop.start()
+        while loop.snapshot is None:
+            time.sleep(0.01)
+
+        cached, direct = [], []
+        for _ in range(reads):
+            start = time.perf_counter()
+            loop.snapshot.value.channel_temps
+            cached.append(time.perf_counter() - start)
+        for _ in range(reads):
+            start = time.perf_counter()
+            device.read_snapshot().channel_temps
+            direct.append(time.perf_counter() - start)
+        loop.stop(timeout=1.0)
+        device.transport.close()
+        return {'cached': percentiles(cached), 'direct': percentiles(direct)}
+    finally:
+        simulator.stop()
+
+
+def bench_tango_read(latency: float, reads: int) -> Dict[str, Dict[str, float]]:
+    """
+    通过DeviceProxy读取Tango属性的时延
+
+    cached为读取由后台采集刷新的channel_temps属性，direct为同一进程中直接读取设备，
+    即属性读取不使用缓存时每次读取的代价。
+    """
+    from tango.test_context import DeviceTestContext
+    from server.server_pk9019 import PK9019Server
+
+    simulator = Simulator(pk9019=[1], faults=FaultConfig(latency=latency)).start_in_thread()
+    try:
+        properties = {'host': '127.0.0.1', 'port': simulator.port, 'slave_address': 1,
+                      'temp_humidity_host': '', 'poll_interval': 0.1}
+        with DeviceTestContext(PK9019Server, properties=properties, process=True) as proxy:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                try:
+                    proxy.read_attribute('channel_temps')
+                    break
+                except Exception:
+                    time.sleep(0.1)
+            cached = []
+            for _ in range(reads):
+                start = time.perf_counter()
+                proxy.read_attribute('channel_temps')
+                cached.append(time.perf_counter() - start)
+
+        device = PK9019('127.0.0.1', simulator.port, slave_address=1)
+        device.transport.connect()
+        direct = []
+        for _ in range(reads):
+            start = time.perf_counter()
+            device.read_snapshot()
+            direct.append(time.perf_counter() - start)
+        device.transport.close()
+        return {'cached': percentiles(cached), 'direct': percentiles(direct)}
+    finally:
+        simulator.stop()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not key == 'count':
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict):
+    """打印与基准结果的对比，吞吐(_per_s)越大越好，时延(_ms)越小越好"""
+    old = _flatten(baseline['results'])
+    print(f"\n与 {baseline.get('revision')} 对比:")
+    for name, value in _flatten(current['results']).items():
+        if name not in old or not old[name]:
+            continue
+        change = value / old[name] - 1
+        better = change > 0 if name.endswith('_per_s') else change < 0
+        mark = '' if abs(change) < 0.05 else ('  更好' if better else '  变差')
+        print(f"  {name:55s} {old[name]:12.6g} -> {value:12.6g} ({change:+.1%}){mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PK9019采集基准测试")
+    parser.add_argument('--output', default='benchmark.json', help="结果JSON文件")
+    parser.add_argument('--compare', default=None, help="与之前保存的结果JSON对比")
+    parser.add_argument('--duration', type=float, default=1.0, help="每项吞吐测试的时长（秒）")
+    parser.add_argument('--requests', type=int, default=2000, help="往返时延测试的请求数")
+    parser.add_argument('--latency', type=float, default=0.0, help="模拟器的响应延迟（秒）")
+    parser.add_argument('--modules', default='1,8,32,128,256', help="全部模块采集测试的模块数")
+    parser.add_argument('--cycles', type=int, default=20, help="全部模块采集测试的轮数")
+    parser.add_argument('--tango', action='store_true', help="同时测试Tango属性读取（需要PyTango）")
+    args = parser.parse_args(argv)
+
+    # 基准测试不输出设备通信的调试日志
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    print("CRC和帧编解码...")
+    results['codec'] = bench_codec(args.duration)
+    print("单设备往返时延...")
+    results['round_trip'] = bench_round_trip(args.latency, args.requests)
+    print("全部模块采集一轮耗时...")
+    results['fleet_cycle'] = bench_fleet([int(m) for m in args.modules.split(',')], args.latency, args.cycles)
+    print("缓存与直接读取时延...")
+    results['read'] = bench_cached_read(args.latency, min(args.requests, 1000))
+    if args.tango:
+        print("Tango属性读取时延...")
+        results['tango_read'] = bench_tango_read(args.latency, min(args.requests, 1000))
+
+    report = {
+        'revision': git_revision(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'settings': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
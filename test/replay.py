@@ -0,0 +1,254 @@
+"""
+抓包回放服务器
+
+把传输抓包(device/capture.py)中记录的应答按RTU over TCP重新提供出来，
+PK9019Server和解码器可以离线按现场的真实流量联调和压测。抓包中的每个网关对应一个监听端口，
+收到请求时按(从机地址, 请求帧)找到记录中相同的请求，返回当时的响应、超时不响应或断开连接：
+- speed为1时按真实时间回放: 回放开始t秒后的请求得到抓包中第t秒前最近一次的结果，响应延迟与现场相同
+- speed为N时按N倍速回放，时间轴和响应延迟都缩短为1/N
+- speed为0时尽快回放: 每个请求依次取下一条记录，不等待
+
+用法：
+    python test/replay.py capture.pkcap --port 4197 --speed 10 --loop
+
+在测试代码中使用：
+    servers = create_replay_servers('capture.pkcap', speed=0)
+    for server in servers.values():
+        server.start_in_thread()
+"""
+import argparse
+import asyncio
+import bisect
+import collections
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+if __name__ == '__main__':
+    # 作为脚本运行时把项目根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from device.capture import DISCONNECT, REQUEST, RESPONSE, TIMEOUT, CaptureRecord, read_capture
+from simulator import Simulator, _GatewayProtocol
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Exchange:
+    """抓包中的一次请求及其结果"""
+    offset: float  # 请求时刻距抓包开始的时间，单位秒
+    slave_address: int
+    request: bytes
+    kind: int  # RESPONSE、TIMEOUT或DISCONNECT
+    response: bytes  # kind为RESPONSE时的响应帧
+    latency: float  # 从请求到结果的时间，单位秒
+
+
+def pair_exchanges(records: Iterable[CaptureRecord]) -> Dict[str, List[Exchange]]:
+    """
+    把抓包记录按网关配对为请求-结果
+
+    同一网关同一从机的结果按顺序对应最早的未完成请求(Modbus TCP流水线时也成立)，
+    没有结果的请求被忽略。
+
+    Returns:
+        Dict[str, List[Exchange]]: 网关"host:port" -> 按请求时刻排序的交互
+    """
+    pending: Dict[Tuple[str, int], collections.deque] = collections.defaultdict(collections.deque)
+    exchanges: Dict[str, List[Exchange]] = collections.defaultdict(list)
+    start = None
+    for record in records:
+        if start is None:
+            start = record.monotonic
+        key = (record.gateway, record.slave_address)
+        if record.kind == REQUEST:
+            pending[key].append(record)
+        elif record.kind in (RESPONSE, TIMEOUT, DISCONNECT) and pending[key]:
+            request = pending[key].popleft()
+            exchanges[record.gateway].append(Exchange(
+                offset=request.monotonic - start,
+                slave_address=record.slave_address,
+                request=request.data,
+                kind=record.kind,
+                response=record.data if record.kind == RESPONSE else b'',
+                latency=record.monotonic - request.monotonic))
+            if record.kind == DISCONNECT:
+                # 连接断开时其余在途请求也随之失败
+                for other in [k for k in pending if k[0] == record.gateway]:
+                    pending[other].clear()
+    for items in exchanges.values():
+        items.sort(key=lambda exchange: exchange.offset)
+    return dict(exchanges)
+
+
+@dataclass
+class ReplayStats:
+    """回放统计"""
+    requests: int = 0
+    responses: int = 0
+    timeouts: int = 0
+    drops: int = 0
+    unmatched: int = 0  # 抓包中没有相同请求，不响应
+
+
+class _ReplayProtocol(_GatewayProtocol):
+    # 按8字节切分请求的逻辑沿用模拟器，应答改为查抓包
+
+    def handle(self, request: bytes):
+        server = self.simulator
+        server.replay_stats.requests += 1
+        exchange = server.lookup(request)
+        if exchange is None:
+            server.replay_stats.unmatched += 1
+            return
+        if exchange.kind == TIMEOUT:
+            server.replay_stats.timeouts += 1
+            return
+        if exchange.kind == DISCONNECT:
+            server.replay_stats.drops += 1
+            self.transport.abort()
+            return
+        server.replay_stats.responses += 1
+        delay = exchange.latency / server.speed if server.speed > 0 else 0.0
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.respond, exchange.response)
+        else:
+            self.respond(exchange.response)
+
+
+class ReplayServer(Simulator):
+    """
+    回放一个网关的抓包
+
+    启动、停止与Simulator相同，可以await start()，也可以start_in_thread()。
+    """
+
+    def __init__(self, exchanges: List[Exchange], host: str = '127.0.0.1', port: int = 0,
+                 speed: float = 1.0, loop: bool = False):
+        """
+        初始化回放服务器
+
+        Args:
+            exchanges: 一个网关按请求时刻排序的交互
+            host: 监听地址
+            port: 监听端口，0表示由系统分配
+            speed: 回放倍速，1为真实时间，0为尽快回放
+            loop: 回放到抓包末尾后是否从头开始；否则一直返回最后的结果
+        """
+        super().__init__(host, port, pk9019=())
+        if speed < 0:
+            raise ValueError(f"回放倍速不能为负: {speed}")
+        self.speed = speed
+        self.loop_replay = loop
+        self.replay_stats = ReplayStats()
+        self.duration = exchanges[-1].offset if exchanges else 0.0
+        self.exchange_count = len(exchanges)
+        self._offsets: Dict[Tuple[int, bytes], List[float]] = collections.defaultdict(list)
+        self._exchanges: Dict[Tuple[int, bytes], List[Exchange]] = collections.defaultdict(list)
+        for exchange in exchanges:
+            key = (exchange.slave_address, exchange.request)
+            self._offsets[key].append(exchange.offset)
+            self._exchanges[key].append(exchange)
+        self._cursors: Dict[Tuple[int, bytes], int] = collections.defaultdict(int)
+        self._started = time.monotonic()
+
+    async def start(self):
+        await super().start()
+        self._started = time.monotonic()
+
+    def _create_protocol(self) -> asyncio.Protocol:
+        return _ReplayProtocol(self)
+
+    def position(self) -> float:
+        """当前回放到抓包中的时刻，单位秒"""
+        position = (time.monotonic() - self._started) * self.speed
+        if self.loop_replay and self.duration > 0:
+            position %= self.duration
+        return position
+
+    def lookup(self, request: bytes) -> Optional[Exchange]:
+        """
+        查找请求在当前回放时刻的结果
+
+        Returns:
+            Optional[Exchange]: 抓包中没有相同请求时为None
+        """
+        key = (request[0], request)
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            return None
+        if self.speed == 0:
+            index = self._cursors[key]
+            if index >= len(exchanges):
+                index = 0 if self.loop_replay else len(exchanges) - 1
+            self._cursors[key] = index + 1
+            return exchanges[index]
+        index = bisect.bisect_right(self._offsets[key], self.position()) - 1
+        return exchanges[max(index, 0)]
+
+
+def create_replay_servers(path: str, host: str = '127.0.0.1', port: int = 0, speed: float = 1.0,
+                          loop: bool = False) -> Dict[str, ReplayServer]:
+    """
+    为抓包中的每个网关创建回放服务器
+
+    Args:
+        path: 抓包文件路径
+        host: 监听地址
+        port: 第一个网关的监听端口，之后的网关依次递增；0表示由系统分配
+        speed: 回放倍速，1为真实时间，0为尽快回放
+        loop: 是否循环回放
+
+    Returns:
+        Dict[str, ReplayServer]: 抓包中的网关"host:port" -> 回放服务器
+    """
+    exchanges = pair_exchanges(read_capture(path))
+    return {gateway: ReplayServer(items, host, port + i if port else 0, speed, loop)
+            for i, (gateway, items) in enumerate(sorted(exchanges.items()))}
+
+
+async def _serve(args):
+    servers = create_replay_servers(args.capture, args.host, args.port, args.speed, args.loop)
+    if not servers:
+        log.error(f"抓包中没有完整的请求-响应: {args.capture}")
+        return
+    for gateway, server in servers.items():
+        await server.start()
+        log.info(f"回放 {gateway} -> {server.host}:{server.port}，"
+                 f"{server.exchange_count} 次交互，时长 {server.duration:.1f}s")
+    try:
+        while True:
+            await asyncio.sleep(args.report)
+            for gateway, server in servers.items():
+                stats = server.replay_stats
+                log.info(f"{gateway} 回放到 {server.position():.1f}s 请求 {stats.requests} "
+                         f"响应 {stats.responses} 无响应 {stats.timeouts} 断开 {stats.drops} "
+                         f"未匹配 {stats.unmatched}")
+    finally:
+        for server in servers.values():
+            await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按RTU over TCP回放PK9019传输抓包")
+    parser.add_argument('capture', help="抓包文件")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=4197, help="第一个网关的监听端口，其余依次递增；0为自动分配")
+    parser.add_argument('--speed', type=float, default=1.0, help="回放倍速，1为真实时间，0为尽快回放")
+    parser.add_argument('--loop', action='store_true', help="到末尾后从头循环回放")
+    parser.add_argument('--report', type=float, default=10.0, help="统计输出间隔（秒）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
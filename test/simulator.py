@@ -0,0 +1,473 @@
+"""
+RTU over TCP设备模拟器
+
+在本机模拟一个或多个串口转TCP网关，每个网关后挂若干PK9019和温湿度模块从机，
+按真实设备的RTU帧(带CRC)应答功能码03请求，可配置延迟、抖动、断线通道、
+异常响应、TCP分段/合并和断开连接，用于联调、压测和故障测试。
+
+用法：
+    python test/simulator.py --port 4197 --pk9019 1-8 --temp-humidity 20 --latency 0.005 --jitter 0.002
+
+在测试代码中使用：
+    simulator = Simulator(pk9019=[1, 2], temp_humidity=[20])
+    simulator.start_in_thread()
+    device = PK9019('127.0.0.1', simulator.port, slave_address=1)
+    ...
+    simulator.stop()
+
+SerialSimulator在伪终端(pty)上模拟直连RS485串口的从机，启动后从device属性读取串口路径。
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import tty
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+if __name__ == '__main__':
+    # 作为脚本运行时把项目根目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from device.transport import calculate_crc, crc16
+
+log = logging.getLogger(__name__)
+
+# 断线通道的寄存器值
+DISCONNECTED = 0x5555
+# 请求帧长度: 从机地址 + 功能码 + 起始地址 + 数量 + CRC
+REQUEST_SIZE = 8
+
+
+@dataclass
+class FaultConfig:
+    """
+    故障注入配置，概率均为每个请求独立判定
+
+    延迟为从收到完整请求到开始发送响应的时间，实际延迟在latency ± jitter内均匀分布。
+    """
+    latency: float = 0.0  # 响应延迟，单位秒
+    jitter: float = 0.0  # 延迟抖动，单位秒
+    exception_rate: float = 0.0  # 返回异常响应的概率
+    exception_code: int = 0x04  # 异常码，默认从机设备故障
+    timeout_rate: float = 0.0  # 不响应的概率
+    split_rate: float = 0.0  # 响应拆成多个TCP分段发送的概率
+    split_delay: float = 0.001  # 分段之间的间隔，单位秒
+    merge_rate: float = 0.0  # 上一次的响应与本次响应合并在一个分段中发送的概率(模拟迟到的响应)
+    drop_rate: float = 0.0  # 收到请求后直接断开连接的概率
+    corrupt_rate: float = 0.0  # 响应CRC错误的概率
+
+
+class SimulatedSlave:
+    """模拟从机的寄存器表，寄存器值由read_registers按当前时刻生成"""
+
+    def __init__(self, address: int, registers: int = 16):
+        self.address = address
+        self.registers = registers
+
+    def read_registers(self, start: int, count: int, now: float) -> Optional[List[int]]:
+        """
+        读取寄存器
+
+        Returns:
+            Optional[List[int]]: 寄存器值，地址越界时返回None
+        """
+        if start + count > self.registers:
+            return None
+        return [self.register(address, now) & 0xFFFF for address in range(start, start + count)]
+
+    def register(self, address: int, now: float) -> int:
+        return 0
+
+
+class SimulatedPK9019(SimulatedSlave):
+    """
+    模拟PK9019: 0x0001为环境温度(不缩放)，0x0002~0x0009为8个通道温度(x10)
+
+    通道温度围绕base按正弦缓慢变化，disconnected中的通道固定返回0x5555。
+    """
+
+    def __init__(self, address: int, base: float = 25.0, amplitude: float = 2.0, period: float = 60.0,
+                 disconnected: Iterable[int] = ()):
+        super().__init__(address, registers=0x000A)
+        self.base = base
+        self.amplitude = amplitude
+        self.period = period
+        self.disconnected = set(disconnected)
+
+    def register(self, address: int, now: float) -> int:
+        if address == 0x0001:
+            return int(round(self.base))
+        if 0x0002 <= address <= 0x0009:
+            channel = address - 0x0002
+            if channel in self.disconnected:
+                return DISCONNECTED
+            phase = 2 * math.pi * (now / self.period + channel / 8)
+            return int(round((self.base + channel + self.amplitude * math.sin(phase)) * 10))
+        return 0
+
+
+class SimulatedTempHumidity(SimulatedSlave):
+    """模拟温湿度模块: 0x0000为温度(x10)，0x0001为湿度(x10)"""
+
+    def __init__(self, address: int, temperature: float = 22.5, humidity: float = 45.0):
+        super().__init__(address, registers=2)
+        self.temperature = temperature
+        self.humidity = humidity
+
+    def register(self, address: int, now: float) -> int:
+        return int(round((self.temperature if address == 0 else self.humidity) * 10))
+
+
+@dataclass
+class SimulatorStats:
+    """模拟器统计"""
+    requests: int = 0
+    responses: int = 0
+    exceptions: int = 0
+    timeouts: int = 0
+    drops: int = 0
+    crc_errors: int = 0  # 收到的CRC错误请求
+    connections: int = 0
+
+
+class _GatewayProtocol(asyncio.Protocol):
+    # 一个客户端连接: 按8字节切分请求，校验CRC后交给从机应答
+
+    def __init__(self, simulator: 'Simulator'):
+        self.simulator = simulator
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.last_response = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.simulator.stats.connections += 1
+        self.simulator._connections.add(self)
+
+    def connection_lost(self, exc):
+        self.simulator._connections.discard(self)
+        self.transport = None
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= REQUEST_SIZE:
+            request = bytes(self.buffer[:REQUEST_SIZE])
+            del self.buffer[:REQUEST_SIZE]
+            self.handle(request)
+
+    def handle(self, request: bytes):
+        simulator = self.simulator
+        faults = simulator.faults
+        stats = simulator.stats
+        if crc16(request[:6]) != struct.unpack_from('<H', request, 6)[0]:
+            # 真实从机丢弃CRC错误的帧；请求流已错位，清空缓冲区重新同步
+            stats.crc_errors += 1
+            self.buffer.clear()
+            return
+        stats.requests += 1
+        slave_address, function_code, start, count = struct.unpack_from('>BBHH', request)
+        slave = simulator.slaves.get(slave_address)
+        if slave is None:
+            stats.timeouts += 1
+            return
+
+        rng = simulator.random
+        if rng.random() < faults.drop_rate:
+            stats.drops += 1
+            self.transport.abort()
+            return
+        if rng.random() < faults.timeout_rate:
+            stats.timeouts += 1
+            return
+
+        if function_code != 0x03:
+            body = bytes((slave_address, function_code | 0x80, 0x01))
+        elif rng.random() < faults.exception_rate:
+            body = bytes((slave_address, 0x83, faults.exception_code))
+        else:
+            values = slave.read_registers(start, count, time.time())
+            if values is None:
+                body = bytes((slave_address, 0x83, 0x02))
+            else:
+                body = struct.pack(f'>BBB{count}H', slave_address, 0x03, count * 2, *values)
+        if body[1] & 0x80:
+            stats.exceptions += 1
+        response = body + calculate_crc(body)
+        if rng.random() < faults.corrupt_rate:
+            response = response[:-1] + bytes((response[-1] ^ 0xFF,))
+
+        delay = max(0.0, faults.latency + rng.uniform(-faults.jitter, faults.jitter))
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.respond, response)
+        else:
+            self.respond(response)
+
+    def respond(self, response: bytes):
+        if self.transport is None or self.transport.is_closing():
+            return
+        faults = self.simulator.faults
+        rng = self.simulator.random
+        self.simulator.stats.responses += 1
+        payload = response
+        if self.last_response and rng.random() < faults.merge_rate:
+            payload = self.last_response + response
+        self.last_response = response
+
+        if len(payload) > 1 and rng.random() < faults.split_rate:
+            cut = rng.randint(1, len(payload) - 1)
+            self.transport.write(payload[:cut])
+            asyncio.get_running_loop().call_later(faults.split_delay, self._write_rest, payload[cut:])
+        else:
+            self.transport.write(payload)
+
+    def _write_rest(self, data: bytes):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(data)
+
+
+class Simulator:
+    """
+    模拟一个RTU over TCP网关及其后的从机
+
+    可以在已有的事件循环中await start()，也可以用start_in_thread()在后台线程中运行。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, pk9019: Sequence[int] = (1,),
+                 temp_humidity: Sequence[int] = (), faults: Optional[FaultConfig] = None,
+                 disconnected: Iterable[int] = (), seed: Optional[int] = None):
+        """
+        初始化模拟器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示由系统分配，启动后从port属性读取
+            pk9019: PK9019从机地址
+            temp_humidity: 温湿度模块从机地址
+            faults: 故障注入配置
+            disconnected: 所有PK9019中固定断线的通道
+            seed: 随机数种子，便于复现
+        """
+        self.host = host
+        self.port = port
+        self.faults = faults or FaultConfig()
+        self.stats = SimulatorStats()
+        self.random = random.Random(seed)
+        self.slaves: Dict[int, SimulatedSlave] = {}
+        for address in pk9019:
+            self.slaves[address] = SimulatedPK9019(address, base=20.0 + address, disconnected=disconnected)
+        for address in temp_humidity:
+            self.slaves[address] = SimulatedTempHumidity(address)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+        self._thread: Optional[threading.Thread] = None
+
+    async def start(self):
+        """在当前事件循环中开始监听"""
+        self.loop = asyncio.get_running_loop()
+        self._server = await self.loop.create_server(self._create_protocol, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info(f"模拟器已启动 {self.host}:{self.port}，从机: {sorted(self.slaves)}")
+
+    def _create_protocol(self) -> asyncio.Protocol:
+        return _GatewayProtocol(self)
+
+    async def close(self):
+        """停止监听并断开所有连接"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for connection in list(self._connections):
+            if connection.transport is not None:
+                connection.transport.abort()
+
+    def drop_connections(self):
+        """断开当前所有客户端连接，模拟网关重启，可在任意线程调用"""
+        def drop():
+            for connection in list(self._connections):
+                if connection.transport is not None:
+                    connection.transport.abort()
+        self.loop.call_soon_threadsafe(drop)
+
+    def start_in_thread(self) -> 'Simulator':
+        """在后台线程的事件循环中运行，返回时已开始监听"""
+        ready = threading.Event()
+        error: List[BaseException] = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except BaseException as e:
+                error.append(e)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name=f"simulator-{self.port}", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if error:
+            raise error[0]
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        """停止start_in_thread启动的模拟器"""
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class _PtyTransport:
+    # 伪终端主端的写入接口，代替asyncio.Transport供_GatewayProtocol使用
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def write(self, data: bytes):
+        os.write(self.fd, data)
+
+    def is_closing(self) -> bool:
+        return False
+
+    def abort(self):
+        # 串口没有连接可断开，丢弃本次请求即可
+        pass
+
+
+class _SerialProtocol(_GatewayProtocol):
+    # 记录每个请求到达的时刻，用于检查帧间静默时间
+
+    def handle(self, request: bytes):
+        self.simulator.request_times.append(time.monotonic())
+        super().handle(request)
+
+
+class SerialSimulator(Simulator):
+    """
+    在伪终端(pty)上模拟RS485串口及其后的从机
+
+    伪终端的从端即串口，路径在启动后从device属性读取，交给SerialRtuTransport打开；
+    应答逻辑和故障注入与Simulator相同(断开连接的故障按不响应处理)。
+    """
+
+    def __init__(self, pk9019: Sequence[int] = (1,), temp_humidity: Sequence[int] = (),
+                 faults: Optional[FaultConfig] = None, disconnected: Iterable[int] = (),
+                 seed: Optional[int] = None):
+        super().__init__(pk9019=pk9019, temp_humidity=temp_humidity, faults=faults,
+                         disconnected=disconnected, seed=seed)
+        self.device = ''
+        # 各请求到达的时刻(time.monotonic())
+        self.request_times: List[float] = []
+        self._master = -1
+        self._slave = -1
+        self._protocol: Optional[_SerialProtocol] = None
+
+    async def start(self):
+        """创建伪终端并在当前事件循环中读取请求"""
+        self.loop = asyncio.get_running_loop()
+        self._master, self._slave = os.openpty()
+        # 保持从端打开，串口被关闭重开时主端不会读到EIO
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.device = os.ttyname(self._slave)
+        self._protocol = _SerialProtocol(self)
+        self._protocol.connection_made(_PtyTransport(self._master))
+        self.loop.add_reader(self._master, self._on_readable)
+        log.info(f"串口模拟器已启动 {self.device}，从机: {sorted(self.slaves)}")
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        self._protocol.data_received(data)
+
+    async def close(self):
+        """关闭伪终端"""
+        if self._master >= 0:
+            self.loop.remove_reader(self._master)
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = -1
+
+
+def parse_addresses(value: str) -> List[int]:
+    """解析从机地址列表，如 '1-4,7'"""
+    addresses = []
+    for part in filter(None, value.split(',')):
+        if '-' in part:
+            first, last = part.split('-')
+            addresses.extend(range(int(first), int(last) + 1))
+        else:
+            addresses.append(int(part))
+    return addresses
+
+
+async def _serve(args):
+    faults = FaultConfig(
+        latency=args.latency, jitter=args.jitter, exception_rate=args.exception_rate,
+        timeout_rate=args.timeout_rate, split_rate=args.split_rate, merge_rate=args.merge_rate,
+        drop_rate=args.drop_rate, corrupt_rate=args.corrupt_rate)
+    simulators = [
+        Simulator(args.host, args.port + i if args.port else 0, parse_addresses(args.pk9019),
+                  parse_addresses(args.temp_humidity), faults, parse_addresses(args.disconnected), args.seed)
+        for i in range(args.gateways)]
+    for simulator in simulators:
+        await simulator.start()
+    try:
+        while True:
+            await asyncio.sleep(args.report)
+            for simulator in simulators:
+                stats = simulator.stats
+                log.info(f"{simulator.host}:{simulator.port} 请求 {stats.requests} 响应 {stats.responses} "
+                         f"异常 {stats.exceptions} 无响应 {stats.timeouts} 断开 {stats.drops}")
+    finally:
+        for simulator in simulators:
+            await simulator.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PK9019/温湿度模块 RTU over TCP 模拟器")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=4197, help="监听端口，多个网关时依次递增；0为自动分配")
+    parser.add_argument('--gateways', type=int, default=1, help="模拟的网关数")
+    parser.add_argument('--pk9019', default='1', help="每个网关后的PK9019从机地址，如 1-8")
+    parser.add_argument('--temp-humidity', default='', help="每个网关后的温湿度模块从机地址")
+    parser.add_argument('--disconnected', default='', help="断线的通道，如 3,7")
+    parser.add_argument('--latency', type=float, default=0.0, help="响应延迟（秒）")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟抖动（秒）")
+    parser.add_argument('--exception-rate', type=float, default=0.0, help="异常响应概率")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="不响应概率")
+    parser.add_argument('--split-rate', type=float, default=0.0, help="响应分段发送概率")
+    parser.add_argument('--merge-rate', type=float, default=0.0, help="与上一次响应合并发送概率")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="断开连接概率")
+    parser.add_argument('--corrupt-rate', type=float, default=0.0, help="CRC错误概率")
+    parser.add_argument('--seed', type=int, default=None, help="随机数种子")
+    parser.add_argument('--report', type=float, default=10.0, help="统计输出间隔（秒）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
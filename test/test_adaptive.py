@@ -0,0 +1,44 @@
+import math
+import time
+
+from server.acquisition import AcquisitionLoop
+from server.adaptive import AdaptiveInterval
+
+
+def test_backs_off_when_steady_and_speeds_up_on_change():
+    adaptive = AdaptiveInterval(min_interval=0.1, max_interval=10.0, subscribed_interval=1.0,
+                                change_threshold=0.2)
+    now, value = 0.0, 20.0
+    for _ in range(20):
+        now += adaptive.interval
+        adaptive.update([value, math.nan], now, subscribed=False)
+    assert adaptive.interval == 10.0
+
+    # 1℃/s的变化: 0.2℃对应0.2s
+    now += adaptive.interval
+    value += adaptive.interval
+    assert adaptive.update([value, math.nan], now, subscribed=False) == 0.2
+
+    # 有订阅时最长为subscribed_interval
+    for _ in range(20):
+        now += adaptive.interval
+        adaptive.update([value, math.nan], now, subscribed=True)
+    assert adaptive.interval == 1.0
+
+
+def test_disconnected_channel_ignored():
+    adaptive = AdaptiveInterval(0.1, 10.0, 1.0, 0.2)
+    adaptive.update([20.0, 30.0], 0.0, subscribed=False)
+    adaptive.update([20.0, math.nan], 1.0, subscribed=False)
+    assert adaptive.rate == 0.0
+
+
+def test_shorter_interval_takes_effect_immediately():
+    reads = []
+    loop = AcquisitionLoop('adaptive', lambda: reads.append(time.monotonic()), interval=10.0)
+    loop.start()
+    time.sleep(0.1)
+    loop.set_interval(0.05)
+    time.sleep(0.3)
+    loop.stop(timeout=1.0)
+    assert len(reads) >= 5
@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from server.alarms import (ALARM_DISCONNECT, ALARM_HI, ALARM_RATE, ALARM_STALE, AlarmEngine, AlarmRule,
+                           alarm_names, parse_alarm_rules)
+
+
+def test_parse_rules():
+    rules = parse_alarm_rules({'hi': [80, 80, None], 'lo': -10, 'disconnect': False}, 3)
+    assert [rule.hi for rule in rules[:2]] == [80.0, 80.0]
+    assert math.isnan(rules[2].hi)
+    assert all(rule.lo == -10.0 and not rule.disconnect for rule in rules)
+    with pytest.raises(ValueError):
+        parse_alarm_rules({'hi': [1, 2]}, 3)
+    with pytest.raises(ValueError):
+        parse_alarm_rules({'high': 1}, 3)
+
+
+def test_hysteresis_and_delay():
+    engine = AlarmEngine()
+    block = engine.register('a', [AlarmRule(hi=80.0, hysteresis=2.0, delay=1.0)])
+    changed = []
+    block.on_change = changed.append
+
+    block.submit([81.0], 0.0)
+    assert engine.evaluate(0.0) == [] and not block.active
+    # 持续不足delay时回落，重新计时
+    block.submit([79.0], 0.5)
+    engine.evaluate(0.5)
+    block.submit([81.0], 1.0)
+    engine.evaluate(1.0)
+    assert not block.active
+    block.submit([81.0], 2.0)
+    assert engine.evaluate(2.0) == [block]
+    assert block.bits()[0] == ALARM_HI
+
+    # 回差内不恢复，回到78以下并持续delay后恢复
+    block.submit([79.0], 3.0)
+    engine.evaluate(5.0)
+    assert block.active
+    block.submit([77.0], 6.0)
+    engine.evaluate(6.0)
+    assert block.active
+    assert engine.evaluate(7.0) == [block]
+    assert not block.active
+
+
+def test_all_devices_in_one_pass():
+    engine = AlarmEngine(capacity=4)
+    rules = parse_alarm_rules({'rate': 1.0, 'stale': 5.0}, 8)
+    blocks = [engine.register(f'dev{i}', rules) for i in range(100)]
+    assert engine.capacity >= 800
+
+    for i, block in enumerate(blocks):
+        block.submit([20.0] * 8, 0.0)
+    blocks[3].submit([20.0, math.nan] + [20.0] * 6, 1.0)
+    blocks[7].submit([25.0] + [20.0] * 7, 1.0)
+    changed = engine.evaluate(1.0)
+    assert changed == [blocks[3], blocks[7]]
+    assert engine.evaluations == 1
+    assert blocks[3].mask(ALARM_DISCONNECT) == 0b10
+    assert alarm_names(int(blocks[7].bits()[0])) == ['rate']
+    assert blocks[7].bits()[0] == ALARM_RATE
+
+    # 其余设备超过stale时间未更新
+    changed = engine.evaluate(5.5)
+    assert len(changed) == 98
+    assert blocks[0].bits()[0] == ALARM_STALE
+
+    # 释放的位置给新注册的设备，告警状态不继承
+    engine.unregister(blocks[3])
+    block = engine.register('new', rules)
+    assert block.offset == blocks[3].offset
+    assert not block.active
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from device.async_device import AsyncTempHumidity
+from server.async_engine import AsyncPollScheduler
+from simulator import Simulator
+
+
+@pytest.fixture
+def simulator():
+    simulator = Simulator(temp_humidity=[20], seed=0).start_in_thread()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = AsyncPollScheduler()
+    yield scheduler
+    scheduler.stop(1.0)
+
+
+@pytest.fixture
+def make_device(simulator, scheduler):
+    devices = []
+
+    def make_device(slave_address, timeout=1.0) -> AsyncTempHumidity:
+        device = AsyncTempHumidity('127.0.0.1', simulator.port, slave_address=slave_address, timeout=timeout)
+        devices.append(device)
+        return device
+
+    yield make_device
+    # 连接属于调度器的事件循环，在其中关闭
+    for device in devices:
+        scheduler.run_coroutine(device.close()).result(1.0)
+
+
+def _collect(job):
+    # 记录on_update收到的快照
+    snapshots = []
+    job.on_update = snapshots.append
+    return snapshots
+
+
+def _wait(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_slow_job_cut_off_without_delaying_others(scheduler, make_device):
+    fast = make_device(20)
+    # 未知从机不响应，收发超时远大于截止时间
+    slow = make_device(9, timeout=5.0)
+    slow_job = scheduler.add_job('slow', slow.get_temp_humidity, interval=0.05, deadline=0.3)
+    fast_job = scheduler.add_job('fast', fast.get_temp_humidity, interval=0.05)
+    snapshots = _collect(fast_job)
+
+    _wait(lambda: slow_job.error is not None, timeout=1.0)
+    assert slow_job.error == "采集超过截止时间 0.3s"
+    assert slow_job.snapshot is None
+    time.sleep(0.5)
+    # 慢任务每次都等到截止时间，快任务仍按自己的周期采集
+    assert len(snapshots) >= 10
+    gaps = [b.monotonic - a.monotonic for a, b in zip(snapshots, snapshots[1:])]
+    assert max(gaps) < 0.2
+    assert fast_job.error is None
+
+
+def test_on_update_receives_new_snapshot(scheduler, make_device):
+    device = make_device(20)
+    job = scheduler.add_job('temp-humidity', device.get_temp_humidity, interval=0.05)
+    updated = threading.Event()
+    snapshots = []
+
+    def on_update(snapshot):
+        snapshots.append(snapshot)
+        if len(snapshots) >= 3:
+            updated.set()
+
+    job.on_update = on_update
+    assert updated.wait(2.0)
+    # 每次采集成功得到新的快照，回调的参数就是任务当前的快照
+    assert all(snapshot.value == (22.5, 45.0) for snapshot in snapshots)
+    assert snapshots[1].monotonic > snapshots[0].monotonic
+    assert len({id(snapshot) for snapshot in snapshots}) == len(snapshots)
+    assert job.snapshot.monotonic >= snapshots[-1].monotonic
+
+
+def test_set_interval_takes_effect(scheduler, make_device):
+    device = make_device(20)
+    job = scheduler.add_job('temp-humidity', device.get_temp_humidity, interval=30.0)
+    _wait(lambda: job.snapshot is not None)
+    snapshots = _collect(job)
+    time.sleep(0.2)
+    assert snapshots == []
+
+    # 缩短周期立即生效，不必等完旧的30秒
+    job.set_interval(0.05)
+    _wait(lambda: len(snapshots) >= 5, timeout=1.0)
+
+    # 延长周期在当前节拍之后生效
+    job.set_interval(30.0)
+    time.sleep(0.1)
+    count = len(snapshots)
+    time.sleep(0.3)
+    assert len(snapshots) == count
@@ -0,0 +1,53 @@
+import math
+
+import numpy as np
+
+from server.bulk import (QUALITY_ALARM, QUALITY_INVALID, QUALITY_VALID, BulkRegistry, BulkSource, pack_bulk,
+                         unpack_bulk)
+
+
+def constant(values, timestamp=100.0, quality=QUALITY_VALID):
+    return lambda: (values, timestamp, quality)
+
+
+def fleet() -> BulkRegistry:
+    registry = BulkRegistry()
+    registry.register(BulkSource('lact/pk9019/1', 'environment_temp', 1, constant([21.0]), 'hall'))
+    registry.register(BulkSource('lact/pk9019/1', 'channel_temps', 8,
+                                 constant([20.0 + i for i in range(8)], quality=QUALITY_ALARM), 'hall'))
+    registry.register(BulkSource('lact/pk9019/2', 'temp_humidity', 2, lambda: None, 'lab'))
+    return registry
+
+
+def test_read_all_devices():
+    snapshot = fleet().read()
+    assert snapshot.devices == ['lact/pk9019/1', 'lact/pk9019/2']
+    assert len(snapshot.values) == 11
+    assert snapshot.channels[0] == 'environment_temp' and snapshot.channels[4] == 'channel_temps[3]'
+    assert snapshot.labels()[-1] == 'lact/pk9019/2/temp_humidity[1]'
+    assert list(snapshot.device_index) == [0] * 9 + [1] * 2
+    assert snapshot.values[4] == 23.0
+    assert list(snapshot.quality[:2]) == [QUALITY_VALID, QUALITY_ALARM]
+    # 尚未采集到数据的通道为NaN、时间戳0、INVALID
+    assert math.isnan(snapshot.values[-1]) and snapshot.timestamps[-1] == 0.0
+    assert snapshot.quality[-1] == QUALITY_INVALID
+
+
+def test_group_filter_and_unregister():
+    registry = fleet()
+    assert registry.read('lab').devices == ['lact/pk9019/2']
+    assert len(registry.read('hall, lab').values) == 11
+    assert len(registry.read('none').values) == 0
+    registry.unregister('lact/pk9019/1')
+    assert registry.read().devices == ['lact/pk9019/2']
+
+
+def test_pack_roundtrip():
+    snapshot = fleet().read()
+    doubles, strings = pack_bulk(snapshot)
+    assert len(doubles) == 2 + 4 * 11 and len(strings) == 2 + 11
+    unpacked = unpack_bulk(doubles, strings)
+    np.testing.assert_array_equal(unpacked.values, snapshot.values)
+    np.testing.assert_array_equal(unpacked.quality, snapshot.quality)
+    np.testing.assert_array_equal(unpacked.device_index, snapshot.device_index)
+    assert unpacked.labels() == snapshot.labels()
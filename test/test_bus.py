@@ -0,0 +1,53 @@
+from device.pk9019 import PK9019
+from server.bus import BusScheduler, BusSlave
+from simulator import Simulator
+
+
+def _add_slaves(bus, port, addresses, updates):
+    # 直接加入从机，不启动调度线程，由测试调用poll_cycle
+    for address in addresses:
+        device = PK9019('127.0.0.1', port, slave_address=address, transport=bus.transport)
+        slave = BusSlave(f"pk9019-{address}", device.read_snapshot)
+        slave.on_update = lambda snapshot, a=address: updates.__setitem__(a, updates.get(a, 0) + 1)
+        bus.slaves.append(slave)
+
+
+def test_dead_slave_does_not_delay_others():
+    simulator = Simulator(pk9019=[1, 2, 3], seed=0).start_in_thread()
+    bus = BusScheduler('127.0.0.1', simulator.port, interval=0.05, response_timeout=0.2)
+    try:
+        assert bus.transport.connect()
+        updates = {}
+        _add_slaves(bus, simulator.port, (1, 2, 3, 9), updates)
+
+        cycles = 12
+        for _ in range(cycles):
+            bus.poll_cycle()
+        # 无响应的从机按退避跳过，其余从机每轮都被访问，连接不断开
+        assert [updates.get(a, 0) for a in (1, 2, 3)] == [cycles] * 3
+        assert 9 not in updates
+        dead = next(s for s in bus.slaves if s.name == "pk9019-9")
+        assert dead.failures > 0
+        assert all(s.failures == 0 and s.error is None for s in bus.slaves if s is not dead)
+        assert simulator.stats.connections == 1
+    finally:
+        bus.stop()
+        simulator.stop()
+
+
+def test_gateway_failure_does_not_back_off_slaves():
+    simulator = Simulator(pk9019=[1], seed=0).start_in_thread()
+    port = simulator.port
+    simulator.stop()
+    bus = BusScheduler('127.0.0.1', port, interval=0.05, response_timeout=0.2)
+    try:
+        updates = {}
+        _add_slaves(bus, port, (1,), updates)
+        for _ in range(3):
+            bus.poll_cycle()
+        # 网关不可达是连接级错误，记录错误但不推迟该从机
+        slave = bus.slaves[0]
+        assert slave.error is not None
+        assert slave.failures == 0 and slave.skip_cycles == 0
+    finally:
+        bus.stop()
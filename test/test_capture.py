@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from device.capture import REQUEST, RESPONSE, TIMEOUT, read_capture, start_capture, stop_capture
+from device.exceptions import FrameTimeoutError
+from device.pk9019 import PK9019
+from device.transport import RtuOverTcpTransport
+from replay import ReplayServer, create_replay_servers, pair_exchanges
+from simulator import FaultConfig, Simulator
+
+
+@pytest.fixture
+def capture_file(tmp_path):
+    """从模拟器抓取10次正常读取和1次超时"""
+    path = str(tmp_path / 'pk9019.pkcap')
+    simulator = Simulator(pk9019=[1], disconnected=[3], seed=0).start_in_thread()
+    start_capture(path, flush_interval=0.05)
+    try:
+        transport = RtuOverTcpTransport('127.0.0.1', simulator.port, timeout=0.2)
+        assert transport.connect()
+        device = PK9019('127.0.0.1', simulator.port, slave_address=1, transport=transport)
+        for _ in range(10):
+            device.read_snapshot()
+            time.sleep(0.01)
+        simulator.faults = FaultConfig(timeout_rate=1.0)
+        with pytest.raises(FrameTimeoutError):
+            transport.read_holding_registers(1, 1, 9)
+        transport.close()
+    finally:
+        stop_capture()
+        simulator.stop()
+    return path, simulator.port
+
+
+def test_capture_records(capture_file):
+    path, port = capture_file
+    records = list(read_capture(path))
+    assert [r.kind for r in records].count(REQUEST) == 11
+    assert [r.kind for r in records].count(RESPONSE) == 10
+    assert records[-1].kind == TIMEOUT
+    assert {r.gateway for r in records} == {f'127.0.0.1:{port}'}
+    assert all(b.monotonic >= a.monotonic for a, b in zip(records, records[1:]))
+
+    exchanges = pair_exchanges(records)[f'127.0.0.1:{port}']
+    assert len(exchanges) == 11
+    assert all(e.latency >= 0 for e in exchanges)
+
+
+def test_replay_as_fast_as_possible(capture_file):
+    path, _ = capture_file
+    server = next(iter(create_replay_servers(path, speed=0).values())).start_in_thread()
+    try:
+        transport = RtuOverTcpTransport('127.0.0.1', server.port, timeout=0.2)
+        assert transport.connect()
+        device = PK9019('127.0.0.1', server.port, slave_address=1, transport=transport)
+        for _ in range(10):
+            snapshot = device.read_snapshot()
+            assert snapshot.channel_temps[3] == '断线'
+        # 第11次为抓包中的超时
+        with pytest.raises(FrameTimeoutError):
+            device.read_snapshot()
+        assert server.replay_stats.responses == 10
+        assert server.replay_stats.timeouts == 1
+    finally:
+        server.stop()
+
+
+def test_replay_position_follows_speed(capture_file):
+    path, port = capture_file
+    exchanges = pair_exchanges(read_capture(path))[f'127.0.0.1:{port}']
+    server = ReplayServer(exchanges, speed=1000.0)
+    server._started -= 0.5
+    # 0.5s x 1000倍已超过抓包时长，返回最后一次的结果
+    assert server.lookup(exchanges[-1].request) is exchanges[-1]
+    server = ReplayServer(exchanges, speed=1.0)
+    assert server.lookup(exchanges[0].request) is exchanges[0]
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import device.framing as framing
+from config.config import CONFIG_ENV, ConfigError, get_config, load_config, set_config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'site.yml'
+    path.write_text(
+        "tango:\n"
+        "  server_name: PK9019\n"
+        "  instance_name: TEST\n"
+        "device:\n"
+        "  host: 10.0.0.1\n"
+        "  port: 4197\n"
+        "  poll_interval: 2\n"
+        "devices:\n"
+        "  - name: lact/pk9019/1\n"
+        "    slave_address: 2\n",
+        encoding='utf-8')
+    return str(path)
+
+
+def test_typed_access_and_defaults(config_file):
+    config = load_config(config_file)
+    assert config.instance_name == 'TEST'
+    assert config.device('host') == '10.0.0.1'
+    assert config.device('poll_interval') == 2.0 and isinstance(config.device('poll_interval'), float)
+    # 未配置的项取内置默认值
+    assert config.device('framing') == 'rtu'
+    assert config.device('temp_humidity_host') == ''
+    assert config.devices[0]['slave_address'] == 2
+    assert config.get('events', {}) == {}
+
+
+def test_validation_reports_all_errors(tmp_path):
+    path = tmp_path / 'bad.yml'
+    path.write_text(
+        "device:\n"
+        "  port: '4197'\n"
+        "  engine: threads\n"
+        "  poll_adaptive: 1\n"
+        "devices:\n"
+        "  - host: 10.0.0.2\n",
+        encoding='utf-8')
+    with pytest.raises(ConfigError) as info:
+        load_config(str(path))
+    message = str(info.value)
+    for text in ('device.port', 'device.engine', 'device.poll_adaptive', 'devices[0]'):
+        assert text in message
+    with pytest.raises(ConfigError):
+        load_config(str(tmp_path / 'missing.yml'))
+
+
+def test_env_var_and_cache(config_file, monkeypatch):
+    monkeypatch.setenv(CONFIG_ENV, config_file)
+    set_config(None)
+    try:
+        config = get_config()
+        assert config.path == config_file
+        # 之后的调用返回缓存，不再读取文件
+        os.remove(config_file)
+        assert get_config() is config
+    finally:
+        set_config(None)
+
+
+def test_import_has_no_side_effects(tmp_path):
+    # 没有配置文件的目录中导入也不会读取文件或退出
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + sys.path))
+    env.pop(CONFIG_ENV, None)
+    result = subprocess.run([sys.executable, '-c', 'import config.config, server.fleet'],
+                            cwd=str(tmp_path), env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_framing_detection_parallel_and_cached(monkeypatch):
+    calls = []
+
+    def slow_detect(host, port):
+        calls.append((host, port))
+        time.sleep(0.2)
+        return framing.FRAMING_MBAP
+
+    monkeypatch.setattr(framing, 'detect_framing', slow_detect)
+    monkeypatch.setattr(framing, '_detected', {})
+    results = []
+    gateways = [('10.0.0.%d' % i, 502) for i in range(5)] * 2
+    threads = [threading.Thread(target=lambda g=g: results.append(framing.resolve_framing(*g, 'auto')))
+               for g in gateways]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 不同网关并行探测，同一网关只探测一次
+    assert time.monotonic() - started < 0.6
+    assert sorted(calls) == sorted(set(gateways))
+    assert results == [framing.FRAMING_MBAP] * 10
+    assert framing.resolve_framing('10.0.0.9', 502, 'rtu') == framing.FRAMING_RTU
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+import pytest
+
+from server.downsample import AGGREGATES, VALUE_COLUMNS, aggregate, lttb
+from server.history import COLUMNS, TIMESTAMP, VALUES
+
+
+def _records(timestamps, values) -> np.ndarray:
+    # values为(n, len(VALUE_COLUMNS))
+    records = np.full((len(timestamps), len(COLUMNS)), np.nan)
+    records[:, TIMESTAMP] = timestamps
+    records[:, VALUES] = values
+    return records
+
+
+def _reference_lttb(x, y, points):
+    # 逐点实现的LTTB，用于核对向量化版本选中的点
+    n = len(x)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected, a = [0], 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        areas = [abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+def test_aggregate_matches_reference():
+    rng = np.random.default_rng(0)
+    timestamps = np.sort(rng.uniform(0, 100, 500))
+    values = rng.normal(20, 5, (500, len(VALUE_COLUMNS)))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    result = aggregate(_records(timestamps, values), 0, 100, 10)
+
+    assert result.shape == (10, 1 + len(VALUE_COLUMNS) * len(AGGREGATES))
+    assert list(result[:, 0]) == [10.0 * i for i in range(10)]
+    stats = result[:, 1:].reshape(10, len(VALUE_COLUMNS), len(AGGREGATES))
+    for bucket in range(10):
+        rows = (timestamps >= bucket * 10) & (timestamps < bucket * 10 + 10)
+        expected = values[rows]
+        np.testing.assert_allclose(stats[bucket, :, 0], np.nanmin(expected, axis=0))
+        np.testing.assert_allclose(stats[bucket, :, 1], np.nanmax(expected, axis=0))
+        np.testing.assert_allclose(stats[bucket, :, 2], np.nanmean(expected, axis=0))
+        np.testing.assert_array_equal(stats[bucket, :, 3], expected[-1])
+
+
+def test_aggregate_empty_and_disconnected_buckets():
+    values = np.full((4, len(VALUE_COLUMNS)), 1.0)
+    values[:2, 0] = np.nan
+    result = aggregate(_records([1.0, 2.0, 75.0, 76.0], values), 0, 100, 4)
+    # 空桶不输出，整桶断线的列为NaN
+    assert list(result[:, 0]) == [0.0, 75.0]
+    assert all(math.isnan(v) for v in result[0, 1:5])
+    assert list(result[1, 1:5]) == [1.0, 1.0, 1.0, 1.0]
+
+    assert aggregate(_records([], np.empty((0, len(VALUE_COLUMNS)))), 0, 10, 5).shape[0] == 0
+    with pytest.raises(ValueError):
+        aggregate(_records([1.0], values[:1]), 10, 10, 5)
+    with pytest.raises(ValueError):
+        aggregate(_records([1.0], values[:1]), 0, 10, 0)
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(1)
+    n, points = 1000, 50
+    x = np.arange(n, dtype=float)
+    values = np.cumsum(rng.normal(0, 1, (n, len(VALUE_COLUMNS))), axis=0)
+    values[500, 3] = 1000.0
+    timestamps, selected = lttb(_records(x, values), points)
+
+    assert timestamps.shape == selected.shape == (points, len(VALUE_COLUMNS))
+    for column in range(len(VALUE_COLUMNS)):
+        expected = _reference_lttb(x, values[:, column], points)
+        assert list(timestamps[:, column]) == list(x[expected])
+        assert list(selected[:, column]) == list(values[expected, column])
+    # 尖峰被保留
+    assert 1000.0 in selected[:, 3]
+
+
+def test_lttb_small_input_and_gaps():
+    values = np.arange(5 * len(VALUE_COLUMNS), dtype=float).reshape(5, len(VALUE_COLUMNS))
+    timestamps, selected = lttb(_records(np.arange(5.0), values), 10)
+    assert selected.shape == (5, len(VALUE_COLUMNS))
+    np.testing.assert_array_equal(selected, values)
+    with pytest.raises(ValueError):
+        lttb(_records(np.arange(5.0), values), 2)
+
+    # 断线的列仍能选出点，不因NaN出错
+    values = np.ones((100, len(VALUE_COLUMNS)))
+    values[:, 1] = np.nan
+    values[20:40, 2] = np.nan
+    timestamps, selected = lttb(_records(np.arange(100.0), values), 10)
+    assert np.isnan(selected[:, 1]).all()
+    assert timestamps[0, 2] == 0 and timestamps[-1, 2] == 99
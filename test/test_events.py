@@ -0,0 +1,58 @@
+import math
+
+import pytest
+
+from server.events import Deadband, EventFilter, parse_deadbands
+
+
+def test_parse_deadbands():
+    deadbands = parse_deadbands({'abs_change': [0.5, 1.0], 'max_period': 10}, 2)
+    assert deadbands == [Deadband(0.5, 0.0, 10.0), Deadband(1.0, 0.0, 10.0)]
+    assert parse_deadbands(None, 3) == [Deadband()] * 3
+    # 通道数不符、不是数值、未知的项、不是字典
+    with pytest.raises(ValueError):
+        parse_deadbands({'abs_change': [0.5, 0.5, 0.5]}, 2)
+    with pytest.raises(ValueError):
+        parse_deadbands({'abs_change': '0.5, 0.5'}, 2)
+    with pytest.raises(ValueError):
+        parse_deadbands({'abs_change': ['0.5', 'x']}, 2)
+    with pytest.raises(ValueError):
+        parse_deadbands({'abs': 0.5}, 2)
+    with pytest.raises(ValueError):
+        parse_deadbands('abs_change: 0.5', 2)
+
+
+def test_absolute_deadband_suppresses_small_change():
+    events = EventFilter([Deadband(abs_change=0.5)] * 2)
+    assert events.update([20.0, 30.0], 0.0)
+    assert not events.update([20.4, 29.7], 1.0)
+    # 比较的基准是上次推送的值，小变化累积超过死区后推送
+    assert events.update([20.5, 29.7], 2.0)
+    assert not events.update([20.9, 29.7], 3.0)
+
+
+def test_relative_deadband():
+    events = EventFilter([Deadband(rel_change=0.01)])
+    assert events.update([100.0], 0.0)
+    assert not events.update([100.5], 1.0)
+    assert events.update([101.0], 2.0)
+
+
+def test_max_period_forces_push():
+    events = EventFilter([Deadband(abs_change=1.0, max_period=10.0)])
+    assert events.update([20.0], 0.0)
+    assert not events.update([20.0], 9.9)
+    # 无变化也在max_period后推送，并从推送时刻重新计时
+    assert events.update([20.0], 10.0)
+    assert not events.update([20.1], 19.0)
+    assert events.update([20.1], 20.0)
+
+
+def test_disconnect_always_pushed():
+    events = EventFilter([Deadband(abs_change=100.0)] * 2)
+    assert events.update([20.0, 30.0], 0.0)
+    # 断线('断线'转换为NaN)和恢复不受死区限制
+    assert events.update([math.nan, 30.0], 1.0)
+    assert not events.update([math.nan, 30.0], 2.0)
+    assert events.update([20.0, 30.0], 3.0)
+    assert not events.update([20.0, 30.0], 4.0)
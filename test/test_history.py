@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from server.history import (CHANNELS, COLUMNS, DISCONNECT_MASK, ENVIRONMENT_TEMP, HUMIDITY, TIMESTAMP,
+                            HistoryBuffer)
+
+
+def _fill(buffer: HistoryBuffer, count: int, start: float = 1000.0):
+    for i in range(count):
+        buffer.append(start + i, float(i), [float(i)] * 8, humidity=45.0)
+
+
+def test_empty_and_capacity():
+    with pytest.raises(ValueError):
+        HistoryBuffer(0)
+    buffer = HistoryBuffer(4)
+    assert len(buffer) == 0
+    assert buffer.latest().shape == (0, len(COLUMNS))
+    assert buffer.since(0).shape == (0, len(COLUMNS))
+    assert buffer.nbytes == 4 * len(COLUMNS) * 8
+
+
+def test_wraparound():
+    buffer = HistoryBuffer(5)
+    _fill(buffer, 3)
+    assert list(buffer.latest()[:, TIMESTAMP]) == [1000, 1001, 1002]
+
+    # 写满后覆盖最早的记录，查询结果仍按时间排序
+    _fill(buffer, 5, start=1003)
+    assert len(buffer) == 5
+    assert list(buffer.latest()[:, TIMESTAMP]) == [1003, 1004, 1005, 1006, 1007]
+    assert list(buffer.latest(2)[:, TIMESTAMP]) == [1006, 1007]
+    assert list(buffer.latest(4)[:, TIMESTAMP]) == [1004, 1005, 1006, 1007]
+    assert list(buffer.latest(100)[:, TIMESTAMP]) == [1003, 1004, 1005, 1006, 1007]
+
+    # 起点分别落在较早的一段和较新的一段
+    assert list(buffer.since(1003.5)[:, TIMESTAMP]) == [1004, 1005, 1006, 1007]
+    assert list(buffer.since(1006)[:, TIMESTAMP]) == [1007]
+    assert list(buffer.since(0)[:, TIMESTAMP]) == [1003, 1004, 1005, 1006, 1007]
+    assert len(buffer.since(1007)) == 0
+    assert list(buffer.between(1003, 1005)[:, TIMESTAMP]) == [1004, 1005]
+
+    records = buffer.latest()
+    assert list(records[:, ENVIRONMENT_TEMP]) == [0, 1, 2, 3, 4]
+    assert (records[:, HUMIDITY] == 45.0).all()
+
+
+def test_results_are_copies():
+    buffer = HistoryBuffer(3)
+    _fill(buffer, 4)
+    for records in (buffer.latest(), buffer.latest(1), buffer.since(1001.5), buffer.since(1002.5)):
+        before = records.copy()
+        _fill(buffer, 3, start=2000)
+        np.testing.assert_array_equal(records, before)
+
+
+def test_disconnected_channels():
+    buffer = HistoryBuffer(2)
+    buffer.append(1000.0, 21.0, [20.0, '断线', 22.0, math.nan, 24.0, 25.0, 26.0, 27.0])
+    record = buffer.latest()[0]
+    channels = record[CHANNELS]
+    assert math.isnan(channels[1]) and math.isnan(channels[3]) and channels[2] == 22.0
+    assert record[DISCONNECT_MASK] == 0b1010
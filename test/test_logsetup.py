@@ -0,0 +1,41 @@
+import logging
+
+from server.logsetup import RateLimitFilter, setup_logging, stop_logging
+
+
+def make_record(message: str, level: int = logging.ERROR) -> logging.LogRecord:
+    return logging.LogRecord('device.pk9019', level, __file__, 0, message, None, None)
+
+
+def test_rate_limit():
+    limiter = RateLimitFilter(interval=0.2)
+    assert limiter.filter(make_record("设备不可用 10.0.0.1:4197"))
+    assert not any(limiter.filter(make_record("设备不可用 10.0.0.1:4197")) for _ in range(50))
+    # 内容不同的日志不受影响
+    assert limiter.filter(make_record("设备不可用 10.0.0.2:4197"))
+    assert limiter.filter(make_record("调试", logging.DEBUG))
+    assert limiter.filter(make_record("调试", logging.DEBUG))
+
+    limiter._seen[('device.pk9019', logging.ERROR, "设备不可用 10.0.0.1:4197")][0] -= 1.0
+    record = make_record("设备不可用 10.0.0.1:4197")
+    assert limiter.filter(record)
+    assert "重复50次" in record.getMessage()
+
+
+def test_queue_to_rotating_file(tmp_path):
+    path = tmp_path / 'pk9019.log'
+    setup_logging({'root': {'level': 'INFO', 'file': str(path), 'max_bytes': 2000, 'backup_count': 2}})
+    try:
+        log = logging.getLogger('test.logsetup')
+        for i in range(200):
+            log.info("第%d条", i)
+        log.debug("不应输出")
+    finally:
+        stop_logging()
+    logging.getLogger().handlers.clear()
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ['pk9019.log', 'pk9019.log.1', 'pk9019.log.2']
+    content = path.read_text(encoding='utf-8')
+    assert "第199条" in content
+    assert "不应输出" not in content
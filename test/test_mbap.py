@@ -0,0 +1,184 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from device.exceptions import ExceptionResponse, FrameError, FrameTimeoutError
+from device.mbap import (AsyncMbapTransport, MbapTransport, _Transaction, check_response, pack_mbap_request,
+                         parse_mbap_header)
+
+DEAD_UNIT = 9
+LATE_UNIT = 8
+EXCEPTION_UNIT = 7
+
+
+class MbapGateway:
+    """
+    测试用的Modbus TCP网关
+
+    寄存器值为 unit*100 + 地址；攒够hold个请求后按相反顺序应答，
+    DEAD_UNIT不应答，LATE_UNIT延迟late秒应答，EXCEPTION_UNIT返回异常响应。
+    """
+
+    def __init__(self, hold: int = 1, late: float = 0.0):
+        self.hold = hold
+        self.late = late
+        self.connections = 0
+        self.max_held = 0
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.port = self._server.getsockname()[1]
+        self._conns = []
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self._conns.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        send_lock = threading.Lock()
+        held = []
+
+        def send(data):
+            with send_lock:
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+
+        with conn:
+            while True:
+                request = b''
+                while len(request) < 12:
+                    try:
+                        chunk = conn.recv(12 - len(request))
+                    except OSError:
+                        return
+                    if not chunk:
+                        return
+                    request += chunk
+                transaction_id, _, _, unit, function, start, count = struct.unpack('>HHHBBHH', request)
+                if unit == DEAD_UNIT:
+                    continue
+                if unit == EXCEPTION_UNIT:
+                    pdu = struct.pack('>BBB', unit, function | 0x80, 0x02)
+                else:
+                    values = [unit * 100 + start + i for i in range(count)]
+                    pdu = struct.pack(f'>BBB{count}H', unit, function, count * 2, *values)
+                response = struct.pack('>HHH', transaction_id, 0, len(pdu)) + pdu
+                if unit == LATE_UNIT:
+                    timer = threading.Timer(self.late, send, (response,))
+                    timer.daemon = True
+                    timer.start()
+                    continue
+                held.append(response)
+                self.max_held = max(self.max_held, len(held))
+                if len(held) >= self.hold:
+                    send(b''.join(reversed(held)))
+                    held.clear()
+
+    def stop(self):
+        # 唤醒阻塞在accept上的线程
+        self._server.shutdown(socket.SHUT_RDWR)
+        self._server.close()
+        self._thread.join(1.0)
+        for conn in self._conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def gateway():
+    gateway = MbapGateway(hold=4, late=0.4)
+    yield gateway
+    gateway.stop()
+
+
+def test_frame_helpers():
+    request = pack_mbap_request(0x1234, 5, 0x03, struct.pack('>HH', 1, 9))
+    assert request.hex() == '123400000006050300010009'
+    assert parse_mbap_header(request) == (0x1234, 6)
+    with pytest.raises(FrameError):
+        parse_mbap_header(bytes.fromhex('123400010006'))
+    with pytest.raises(FrameError):
+        parse_mbap_header(bytes.fromhex('123400000001'))
+
+    check_response(bytes.fromhex('0503020001'), 5, 0x03)
+    with pytest.raises(FrameError):
+        check_response(bytes.fromhex('0603020001'), 5, 0x03)
+    with pytest.raises(ExceptionResponse) as error:
+        check_response(bytes.fromhex('058302'), 5, 0x03)
+    assert error.value.exception_code == 0x02
+
+
+def test_transaction_id_wraps_and_skips_pending():
+    transport = MbapTransport('127.0.0.1', 1)
+    transport._transaction_id = 0xFFFE
+    assert transport._allocate(_Transaction()) == 0xFFFF
+    # 回绕后跳过仍在途的事务标识
+    transport._pending[0] = _Transaction()
+    assert transport._allocate(_Transaction()) == 1
+
+
+def test_pipelined_out_of_order(gateway):
+    transport = MbapTransport('127.0.0.1', gateway.port, timeout=2.0)
+    assert transport.connect()
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda unit: transport.read_holding_registers(unit, 10, 2), (1, 2, 3, 4)))
+    # 网关攒够4个请求后倒序应答，各请求按事务标识取回自己的响应
+    assert results == [(110, 111), (210, 211), (310, 311), (410, 411)]
+    assert gateway.max_held == 4
+    transport.close()
+
+
+def test_timeout_keeps_connection():
+    gateway = MbapGateway(hold=1, late=0.4)
+    try:
+        transport = MbapTransport('127.0.0.1', gateway.port, timeout=0.2)
+        assert transport.connect()
+        with pytest.raises(FrameTimeoutError):
+            transport.read_holding_registers(LATE_UNIT, 0, 2)
+        with pytest.raises(FrameTimeoutError):
+            transport.read_holding_registers(DEAD_UNIT, 0, 2)
+        with pytest.raises(ExceptionResponse):
+            transport.read_holding_registers(EXCEPTION_UNIT, 0, 2)
+        # 迟到的响应按事务标识丢弃，不会交给之后的请求
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            assert transport.read_holding_registers(1, 0, 2) == (100, 101)
+        assert gateway.connections == 1
+        assert transport.connection.breaker.failures == 0
+        transport.close()
+    finally:
+        gateway.stop()
+
+
+def test_async_pipelined_out_of_order(gateway):
+    async def run():
+        transport = AsyncMbapTransport('127.0.0.1', gateway.port, timeout=2.0)
+        results = await asyncio.gather(*(transport.read_holding_registers(unit, 10, 2) for unit in (1, 2, 3, 4)))
+        assert list(results) == [(110, 111), (210, 211), (310, 311), (410, 411)]
+
+        transport.timeout = 0.2
+        with pytest.raises(FrameTimeoutError):
+            await asyncio.gather(transport.read_holding_registers(LATE_UNIT, 0, 2),
+                                 *(transport.read_holding_registers(unit, 0, 2) for unit in (1, 2, 3, 4)))
+        await asyncio.sleep(0.3)
+        assert await asyncio.gather(*(transport.read_holding_registers(unit, 20, 1) for unit in (1, 2, 3, 4))) == \
+            [(120,), (220,), (320,), (420,)]
+        await transport.close()
+
+    asyncio.run(run())
+    assert gateway.max_held == 4 and gateway.connections == 1
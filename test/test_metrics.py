@@ -0,0 +1,63 @@
+import urllib.request
+
+import pytest
+
+from device.exceptions import ExceptionResponse, FrameTimeoutError
+from device.metrics import LATENCY_BUCKETS, MetricsRegistry, RequestMetrics, get_registry
+from device.transport import RtuOverTcpTransport
+from server.prometheus import MetricsServer
+from simulator import FaultConfig, Simulator
+
+
+def test_histogram_quantile():
+    metrics = RequestMetrics()
+    for _ in range(90):
+        metrics.observe(0.002)
+    for _ in range(10):
+        metrics.observe(0.2)
+    metrics.observe(1.0, FrameTimeoutError("timeout"))
+    totals = metrics.totals()
+    assert totals.requests == 101
+    assert totals.responses == 100
+    assert totals.errors['timeout'] == 1
+    assert 0.001 < totals.quantile(0.5) <= 0.0025
+    assert 0.1 < totals.quantile(0.99) <= 0.25
+    assert len(totals.buckets) == len(LATENCY_BUCKETS) + 1
+
+
+def test_transport_metrics():
+    simulator = Simulator(pk9019=[1], temp_humidity=[20], seed=0).start_in_thread()
+    try:
+        transport = RtuOverTcpTransport('127.0.0.1', simulator.port, timeout=0.3)
+        assert transport.connect()
+        for _ in range(5):
+            transport.read_holding_registers(20, 0, 2)
+        with pytest.raises(ExceptionResponse):
+            transport.read_holding_registers(20, 0, 10)
+        simulator.faults = FaultConfig(timeout_rate=1.0)
+        with pytest.raises(FrameTimeoutError):
+            transport.read_holding_registers(20, 0, 2)
+        transport.close()
+    finally:
+        simulator.stop()
+
+    totals = get_registry().device('127.0.0.1', simulator.port, 20).totals()
+    assert totals.requests == 7
+    assert totals.responses == 6
+    assert totals.exceptions == {0x02: 1}
+    assert totals.errors['timeout'] == 1
+
+
+def test_prometheus_endpoint():
+    registry = MetricsRegistry()
+    registry.device('10.0.0.1', 502, 3).observe(0.004)
+    registry.cycle('pk9019-10.0.0.1:502/3').observe(0.001, 0.01, True)
+    server = MetricsServer(0, registry=registry).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        server.stop()
+    assert 'pk9019_requests_total{gateway="10.0.0.1:502",slave="3"} 1' in text
+    assert 'pk9019_request_latency_seconds_bucket{gateway="10.0.0.1:502",slave="3",le="0.005"} 1' in text
+    assert 'pk9019_poll_overruns_total{poller="pk9019-10.0.0.1:502/3"} 1' in text
@@ -1,3 +1,5 @@
+import argparse
+
 from pymodbus.server import StartTcpServer
 from pymodbus.datastore import ModbusSequentialDataBlock
 from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
@@ -6,7 +8,7 @@ from pymodbus.device import ModbusDeviceIdentification
 
 def run_modbus_server(host="localhost", port=502):
     """
-    启动 Modbus TCP 服务端
+    启动 Modbus TCP 服务端（MBAP帧，对应设备配置 framing: "mbap"；RTU over TCP请使用 test/simulator.py）
     :param host: 服务端 IP 地址（默认 localhost）
     :param port: 服务端端口（默认 502）
     """
@@ -38,9 +40,10 @@ def run_modbus_server(host="localhost", port=502):
 
 
 if __name__ == "__main__":
-    # 配置参数
-    host = "10.2.101.14"  # 服务端 IP 地址
-    port = 4198          # 服务端端口
+    parser = argparse.ArgumentParser(description="启动 Modbus TCP 服务端")
+    parser.add_argument('--host', default='localhost', help="服务端 IP 地址")
+    parser.add_argument('--port', type=int, default=4198, help="服务端端口")
+    args = parser.parse_args()
 
     # 启动 Modbus TCP 服务端
-    run_modbus_server(host, port)
\ No newline at end of file
+    run_modbus_server(args.host, args.port)
@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from device.pool import TransportPool
+
+
+class FakeTransport:
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+
+def test_refcount():
+    pool = TransportPool(FakeTransport)
+    a = pool.acquire('10.0.0.1', 502)
+    b = pool.acquire('10.0.0.1', '502')
+    assert a is b and len(pool) == 1
+    assert pool.release(a) is None
+    assert pool.release(b) is a and len(pool) == 0
+    assert pool.acquire('10.0.0.1', 502) is not a
+
+
+def test_factory_runs_outside_lock():
+    started = threading.Event()
+    proceed = threading.Event()
+    calls = []
+
+    def factory(host, port, timeout):
+        calls.append(host)
+        if host == 'slow':
+            # 模拟创建时探测帧格式
+            started.set()
+            proceed.wait(5)
+        return FakeTransport(host, port, timeout)
+
+    pool = TransportPool(factory)
+    with ThreadPoolExecutor(4) as executor:
+        slow = [executor.submit(pool.acquire, 'slow', 502) for _ in range(3)]
+        assert started.wait(5)
+        # 慢网关创建期间其他网关不被阻塞
+        fast = pool.acquire('fast', 502)
+        assert fast.host == 'fast' and not any(f.done() for f in slow)
+        proceed.set()
+        transports = [f.result(5) for f in slow]
+    assert all(t is transports[0] for t in transports)
+    assert calls.count('slow') == 1
+    for transport in transports[:2]:
+        assert pool.release(transport) is None
+    assert pool.release(transports[2]) is transports[0]
+
+
+def test_factory_error():
+    def factory(host, port, timeout):
+        time.sleep(0.05)
+        raise OSError("探测失败")
+
+    pool = TransportPool(factory)
+    with ThreadPoolExecutor(2) as executor:
+        results = [executor.submit(pool.acquire, 'gw', 502) for _ in range(2)]
+        for result in results:
+            with pytest.raises(OSError):
+                result.result(5)
+    # 失败后不留下占位，之后可以重新创建
+    pool.factory = FakeTransport
+    assert pool.acquire('gw', 502).host == 'gw'
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from device.metrics import get_registry
+from device.temp_humidity import decode_temp_humidity
+from server.profiling import Profiler, SamplingProfiler
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy worker")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 10
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.startswith('busy_worker;')]
+    assert busy and 'busy_loop (test_profiling.py:' in busy[0]
+    stack, count = busy[0].rsplit(' ', 1)
+    assert int(count) > 0
+
+
+def test_profiler_window(tmp_path):
+    profiler = Profiler()
+    profiler.start(interval=0.002, output_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        profiler.start()
+    data = [bytearray(1024) for _ in range(100)]
+    for _ in range(50):
+        decode_temp_humidity((225, 450))
+    report = profiler.stop()
+    del data
+
+    assert not get_registry().timers.enabled
+    assert 'decode' in report.timers and '50 次' in report.timers
+    assert 'transport' in report.timers
+    assert 'test_profiling.py' in report.allocations
+    assert len(report.files) == 3
+    assert all((tmp_path / p).exists() for p in report.files)
+    # 已停止时返回上一次的报告
+    assert profiler.stop() is report
+
+
+def test_profiler_auto_stop():
+    profiler = Profiler()
+    profiler.start(duration=0.1, trace_frames=0)
+    time.sleep(0.3)
+    assert not profiler.running
+    assert profiler.report is not None and profiler.report.allocations == ''
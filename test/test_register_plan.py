@@ -0,0 +1,60 @@
+import pytest
+
+from device.pk9019 import SNAPSHOT_POINTS, PK9019
+from device.register_plan import MAX_REGISTERS_PER_READ, RegisterPoint, plan_reads
+
+
+def _spans(blocks):
+    return [(block.start, block.count) for block in blocks]
+
+
+def test_snapshot_is_one_request():
+    blocks = plan_reads(SNAPSHOT_POINTS)
+    assert _spans(blocks) == [(0x0001, 9)]
+    values = blocks[0].extract(list(range(1, 10)))
+    assert list(values['environment_temp']) == [1]
+    assert list(values['channel_temps']) == list(range(2, 10))
+
+
+def test_adjacent_overlapping_and_gaps():
+    points = [RegisterPoint('c', 20, 2), RegisterPoint('a', 0, 4), RegisterPoint('b', 2, 4),
+              RegisterPoint('d', 6, 1)]
+    # 输入无序，相邻和重叠的合并，间隔的分开
+    assert _spans(plan_reads(points)) == [(0, 7), (20, 2)]
+    assert _spans(plan_reads(points, max_gap=13)) == [(0, 22)]
+    assert _spans(plan_reads(points, max_gap=12)) == [(0, 7), (20, 2)]
+
+    block = plan_reads(points, max_gap=13)[0]
+    values = block.extract(list(range(22)))
+    assert list(values['b']) == [2, 3, 4, 5] and list(values['c']) == [20, 21]
+    assert plan_reads([]) == []
+
+
+def test_max_count():
+    points = [RegisterPoint(f'p{i}', i * 10, 10) for i in range(30)]
+    blocks = plan_reads(points)
+    assert _spans(blocks) == [(0, 120), (120, 120), (240, 60)]
+    assert all(block.count <= MAX_REGISTERS_PER_READ for block in blocks)
+    assert sum(len(block.points) for block in blocks) == 30
+    with pytest.raises(ValueError):
+        plan_reads([RegisterPoint('big', 0, MAX_REGISTERS_PER_READ + 1)])
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.requests = []
+
+    def start(self):
+        pass
+
+    def read_holding_registers(self, slave_address, start, count):
+        self.requests.append((slave_address, start, count))
+        return tuple(range(start, start + count))
+
+
+def test_device_reads_coalesced_blocks():
+    transport = RecordingTransport()
+    device = PK9019('127.0.0.1', slave_address=5, transport=transport)
+    values = device.read_points([RegisterPoint('x', 100, 2), *SNAPSHOT_POINTS])
+    assert transport.requests == [(5, 0x0001, 9), (5, 100, 2)]
+    assert list(values['x']) == [100, 101] and list(values['environment_temp']) == [1]
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from device.exceptions import FrameTimeoutError
+from device.framing import create_transport
+from device.pk9019 import PK9019
+from device.serial_rtu import SerialRtuTransport, rtu_silent_interval
+from device.temp_humidity import TempHumidity
+from simulator import FaultConfig, SerialSimulator
+
+
+@pytest.fixture
+def simulator():
+    simulator = SerialSimulator(pk9019=[1, 2], temp_humidity=[20], disconnected=[3], seed=0).start_in_thread()
+    yield simulator
+    simulator.stop()
+
+
+def connect(simulator, baudrate=19200, timeout=0.5) -> SerialRtuTransport:
+    transport = create_transport(simulator.device, baudrate, timeout, framing='serial')
+    assert isinstance(transport, SerialRtuTransport)
+    assert transport.connect()
+    return transport
+
+
+def test_devices_over_serial(simulator):
+    transport = connect(simulator)
+    device = PK9019(simulator.device, 19200, slave_address=1, transport=transport)
+    snapshot = device.read_snapshot()
+    assert snapshot.environment_temp == 21
+    assert snapshot.channel_temps[3] == '断线'
+    humidity = TempHumidity(simulator.device, 19200, slave_address=20, transport=transport)
+    assert humidity.get_temp_humidity() == (22.5, 45.0)
+    transport.close()
+
+
+def test_silent_interval_from_baudrate(simulator):
+    # 1200波特、8E1时3.5字符为32ms，帧间隔不短于它，也不额外等待
+    transport = connect(simulator, baudrate=1200)
+    gap = rtu_silent_interval(1200)
+    assert transport.silent_interval == pytest.approx(gap)
+    for _ in range(6):
+        assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+    intervals = [b - a for a, b in zip(simulator.request_times, simulator.request_times[1:])]
+    assert min(intervals) >= gap * 0.95
+    assert sum(intervals) / len(intervals) < gap + 0.02
+    transport.close()
+
+
+def test_timeout_keeps_port_open(simulator):
+    transport = connect(simulator, timeout=0.1)
+    simulator.faults = FaultConfig(timeout_rate=1.0)
+    started = time.monotonic()
+    with pytest.raises(FrameTimeoutError):
+        transport.read_holding_registers(20, 0, 2)
+    assert time.monotonic() - started < 0.5
+    # 从机无响应不关闭串口，下一次请求直接成功
+    assert transport.connected
+    simulator.faults = FaultConfig()
+    assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+    assert transport.connection.reconnects == 0
+    transport.close()
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from device.exceptions import QueueTimeoutError
+from device.serializer import RequestSerializer
+
+
+def test_single_flight():
+    serializer = RequestSerializer()
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        release.wait(5)
+        return (225, 450)
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(serializer.submit, ('20', 0, 2), read) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result(5) for f in futures]
+    # 相同的并发请求只执行一次，所有调用者得到同一结果
+    assert calls == [1]
+    assert all(result == (225, 450) for result in results)
+
+    # 完成后不再合并，下一次请求重新执行
+    assert serializer.submit(('20', 0, 2), read) == (225, 450)
+    assert calls == [1, 1]
+
+
+def test_shared_error():
+    serializer = RequestSerializer()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise OSError("通信中断")
+
+    with ThreadPoolExecutor(3) as executor:
+        futures = [executor.submit(serializer.submit, 'key', fail) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        for future in futures:
+            with pytest.raises(OSError):
+                future.result(5)
+
+
+def _run_concurrently(serializer, count, hold):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(hold)
+        with lock:
+            active.pop()
+
+    with ThreadPoolExecutor(count) as executor:
+        futures = [executor.submit(serializer.submit, i, request) for i in range(count)]
+        for future in futures:
+            future.result(5)
+    return max(peak)
+
+
+def test_serialized_and_concurrency():
+    # 不同的请求串行占用连接，MBAP可按concurrency并发
+    assert _run_concurrently(RequestSerializer(), 6, 0.02) == 1
+    assert _run_concurrently(RequestSerializer(concurrency=3), 6, 0.05) == 3
+
+
+def test_queue_timeout():
+    serializer = RequestSerializer(max_wait=0.1)
+    release = threading.Event()
+    with ThreadPoolExecutor(2) as executor:
+        slow = executor.submit(serializer.submit, 'slow', lambda: release.wait(5))
+        time.sleep(0.05)
+        queued = executor.submit(serializer.submit, 'other', lambda: 'done')
+        with pytest.raises(QueueTimeoutError):
+            queued.result(5)
+        release.set()
+        assert slow.result(5) is True
+    # 超时的请求已出队，不会阻塞之后的请求
+    assert serializer.submit('other', lambda: 'done') == 'done'
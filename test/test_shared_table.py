@@ -0,0 +1,106 @@
+import math
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from server.shared_table import STATUS, STATUS_EMPTY, STATUS_ERROR, STATUS_OK, STATUS_STALE, VALUES, SharedSnapshotTable
+
+
+def _writer(name: str, rounds: int):
+    # 另一个进程中的写者，每次写入的数值全部相同，读者读到不同的数值即为撕裂
+    table = SharedSnapshotTable(4, 1, name=name, create=False)
+    try:
+        for i in range(1, rounds + 1):
+            table.write(0, 0, float(i), float(i), [float(i)] * 9)
+    finally:
+        table.close()
+
+
+@pytest.fixture
+def table():
+    table = SharedSnapshotTable(4, 1)
+    yield table
+    table.close()
+    table.unlink()
+
+
+def test_write_and_read(table):
+    seq, row = table.read(0)
+    assert seq == 0 and row[STATUS] == STATUS_EMPTY
+    assert table.write(0, 0, 100.0, 1.0, [1.0, 2.0])
+    seq, row = table.read(0)
+    assert seq == 2 and row[STATUS] == STATUS_OK
+    assert list(row[VALUES][:2]) == [1.0, 2.0] and math.isnan(row[VALUES][2])
+
+    table.mark_error(0, 0)
+    seq, row = table.read(0)
+    # 采集失败保留上一次的数值
+    assert seq == 4 and row[STATUS] == STATUS_ERROR and row[VALUES][0] == 1.0
+
+
+def test_attach_by_name(table):
+    other = SharedSnapshotTable(4, 1, name=table.name, create=False)
+    try:
+        other.write(1, 0, 100.0, 1.0, [5.0])
+        other.heartbeat(0)
+        assert table.read(1)[1][VALUES][0] == 5.0
+        assert table.last_heartbeat(0) > 0
+    finally:
+        other.close()
+
+
+def test_retired_generation_is_ignored(table):
+    generation = table.generation(0)
+    table.write(0, generation, 100.0, 1.0, [1.0])
+    table.retire(0)
+    assert not table.released(0)
+    # 模块移除后原写者的写入被忽略
+    seq = table.sequences()[0]
+    assert not table.write(0, generation, 101.0, 2.0, [2.0])
+    table.mark_error(0, generation)
+    assert table.sequences()[0] == seq
+    table.release(0)
+    assert table.released(0)
+
+    table.clear(0)
+    assert table.write(0, table.generation(0), 102.0, 3.0, [3.0])
+    assert table.read(0)[1][VALUES][0] == 3.0
+
+
+def test_interrupted_write(table):
+    table.write(0, 0, 100.0, 1.0, [1.0])
+    # 模拟写者在写入途中退出，序列号停留在奇数
+    table._seqs[0] += 1
+    seq, row = table.read(0, max_wait=0.01)
+    assert seq & 1 and row[STATUS] == STATUS_STALE and np.isnan(row[VALUES]).all()
+
+    table.recover(0)
+    seq, row = table.read(0)
+    assert not seq & 1 and row[STATUS] == STATUS_ERROR and row[VALUES][0] == 1.0
+
+    table._seqs[1] = 7
+    table.clear(1)
+    seq, row = table.read(1)
+    assert seq == 8 and row[STATUS] == STATUS_EMPTY
+
+
+def test_concurrent_reader_sees_whole_rows(table):
+    process = multiprocessing.get_context('spawn').Process(target=_writer, args=(table.name, 200000))
+    process.start()
+    try:
+        reads = 0
+        last = 0.0
+        while process.is_alive() or reads == 0:
+            seq, row = table.read(0)
+            assert not seq & 1
+            if row[STATUS] == STATUS_OK:
+                values = row[VALUES]
+                assert (values == row[0]).all() and row[1] == row[0]
+                assert row[0] >= last
+                last = row[0]
+            reads += 1
+    finally:
+        process.join(30)
+    assert process.exitcode == 0
+    assert table.read(0)[1][0] == 200000.0
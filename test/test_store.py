@@ -0,0 +1,89 @@
+import datetime
+import math
+import os
+
+import numpy as np
+import pytest
+
+from server.history import CHANNELS, COLUMNS, DISCONNECT_MASK, TIMESTAMP, encode_record
+from server.store import INDEX_STRIDE, RECORD_SIZE, SampleStore, StoreWriter, segment_name
+
+
+def _midnight() -> float:
+    # 本地时间某一天的零点，分段按本地日期划分
+    return datetime.datetime(2024, 5, 2).timestamp()
+
+
+def _records(timestamps) -> np.ndarray:
+    rows = np.empty((len(timestamps), len(COLUMNS)))
+    for row, timestamp in zip(rows, timestamps):
+        encode_record(row, timestamp, 21.0, [timestamp % 100] * 7 + ['断线'], 22.5, 45.0)
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SampleStore(str(tmp_path / 'device'), writer=StoreWriter())
+    yield store
+    store.close()
+
+
+def test_segment_rollover(store):
+    midnight = _midnight()
+    # 跨零点的一批记录拆分到两个日分段
+    timestamps = midnight - 5 + np.arange(10)
+    store.write(_records(timestamps))
+    names = [os.path.basename(path) for path in store.segments()]
+    assert names == [segment_name(midnight - 1), segment_name(midnight)]
+    sizes = [os.path.getsize(path) // RECORD_SIZE for path in store.segments()]
+    assert sizes == [5, 5]
+
+    records = store.read_range(midnight - 10, midnight + 10)
+    assert list(records[:, TIMESTAMP]) == list(timestamps)
+    assert np.isnan(records[0, CHANNELS.stop - 1]) and records[0, DISCONNECT_MASK] == 1 << 7
+
+
+def test_range_query(store):
+    start = _midnight() + 3600
+    timestamps = start + np.arange(3 * INDEX_STRIDE + 10) * 0.5
+    # 分多批写入，查询时按文件大小扩展映射和索引
+    for batch in np.array_split(timestamps, 4):
+        store.write(_records(batch))
+        store.read_range(start - 1, start + 1)
+
+    # 范围为(start, end]，边界落在稀疏索引的块内和块边界上
+    for lo, hi in [(10, 20), (INDEX_STRIDE - 1, INDEX_STRIDE + 1), (0, len(timestamps) - 1)]:
+        records = store.read_range(timestamps[lo], timestamps[hi])
+        assert list(records[:, TIMESTAMP]) == list(timestamps[lo + 1:hi + 1])
+    assert len(store.read_range(start - 10, start - 1)) == 0
+    assert len(store.read_range(timestamps[-1], timestamps[-1] + 10)) == 0
+
+    chunks = list(store.query(timestamps[0] - 1, timestamps[-1], chunk_rows=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 1000, len(timestamps) - 3000]
+    with pytest.raises(ValueError):
+        store.read_range(timestamps[0] - 1, timestamps[-1], max_rows=100)
+
+
+def test_writer_and_truncated_record(tmp_path):
+    writer = StoreWriter()
+    directory = str(tmp_path / 'device')
+    store = SampleStore(directory, writer=writer)
+    timestamp = _midnight() + 60
+    for i in range(3):
+        store.append(timestamp + i, 21.0, [20.0] * 8, math.nan, math.nan)
+    assert store.read_range(timestamp - 1, timestamp + 10).shape == (0, len(COLUMNS))
+    writer.flush()
+    assert len(store.read_range(timestamp - 1, timestamp + 10)) == 3
+    store.close()
+
+    # 异常退出残留的半条记录在重新打开分段时截断
+    path = store.segments()[0]
+    with open(path, 'ab') as f:
+        f.write(b'\0' * (RECORD_SIZE // 2))
+    store = SampleStore(directory, writer=writer)
+    assert len(store.read_range(timestamp - 1, timestamp + 10)) == 3
+    store.write(_records([timestamp + 5]))
+    assert os.path.getsize(path) == 4 * RECORD_SIZE
+    assert list(store.read_range(timestamp - 1, timestamp + 10)[:, TIMESTAMP]) == \
+        [timestamp, timestamp + 1, timestamp + 2, timestamp + 5]
+    store.close()
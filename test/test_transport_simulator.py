@@ -0,0 +1,268 @@
+import asyncio
+import time
+
+import pytest
+
+import device.framing as framing
+from device.async_device import AsyncRtuOverTcpTransport
+from device.exceptions import (CircuitOpenError, ExceptionResponse, FrameTimeoutError, SlaveUnavailableError,
+                               TransportConnectionError, TransportError)
+from device.pk9019 import PK9019
+from device.temp_humidity import TEMP_HUMIDITY_COUNT, TEMP_HUMIDITY_START, TempHumidity
+from device.transport import RtuOverTcpTransport
+from simulator import FaultConfig, Simulator
+
+
+@pytest.fixture
+def simulator():
+    simulator = Simulator(pk9019=[1, 2], temp_humidity=[20], disconnected=[3], seed=0).start_in_thread()
+    yield simulator
+    simulator.stop()
+
+
+def connect(simulator, timeout=1.0) -> RtuOverTcpTransport:
+    transport = RtuOverTcpTransport('127.0.0.1', simulator.port, timeout)
+    assert transport.connect()
+    return transport
+
+
+def test_pk9019_snapshot(simulator):
+    device = PK9019('127.0.0.1', simulator.port, slave_address=1, transport=connect(simulator))
+    snapshot = device.read_snapshot()
+    assert snapshot.environment_temp == 21
+    assert snapshot.channel_temps[3] == '断线'
+    assert all(15.0 < t < 35.0 for i, t in enumerate(snapshot.channel_temps) if i != 3)
+
+
+def test_temp_humidity(simulator):
+    device = TempHumidity('127.0.0.1', simulator.port, slave_address=20, transport=connect(simulator))
+    assert device.get_temp_humidity() == (22.5, 45.0)
+
+
+def test_exception_response(simulator):
+    transport = connect(simulator)
+    with pytest.raises(ExceptionResponse) as error:
+        transport.read_holding_registers(20, 0, 10)
+    assert error.value.exception_code == 0x02
+    # 异常响应后连接仍然可用
+    assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+
+
+def test_split_segments(simulator):
+    simulator.faults = FaultConfig(split_rate=1.0, latency=0.001)
+    transport = connect(simulator)
+    for _ in range(20):
+        assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+
+
+def test_reconnect_after_drop(simulator):
+    transport = connect(simulator, timeout=0.5)
+    transport.connection.backoff_initial = 0.05
+    assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+
+    simulator.drop_connections()
+    time.sleep(0.1)
+    with pytest.raises(Exception):
+        transport.read_holding_registers(20, 0, 2)
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+            break
+        except Exception:
+            time.sleep(0.05)
+    else:
+        pytest.fail("断开后没有自动重连")
+    assert transport.connection.reconnects == 1
+
+
+def test_dead_slave_does_not_affect_gateway(simulator):
+    transport = connect(simulator, timeout=0.2)
+    failures = []
+    for _ in range(6):
+        with pytest.raises((FrameTimeoutError, SlaveUnavailableError)):
+            transport.read_holding_registers(9, 1, 9)
+        for address in (1, 2):
+            try:
+                transport.read_holding_registers(address, 1, 9)
+            except Exception as e:
+                failures.append(e)
+    assert failures == []
+    # 连接始终没有断开，无响应的从机断路后快速失败
+    assert simulator.stats.connections == 1
+    assert transport.connection.breaker.failures == 0
+    started = time.monotonic()
+    with pytest.raises(SlaveUnavailableError):
+        transport.read_holding_registers(9, 1, 9)
+    assert time.monotonic() - started < 0.05
+
+
+def test_late_response_skipped(simulator):
+    transport = connect(simulator, timeout=0.2)
+    simulator.faults = FaultConfig(latency=0.25)
+    with pytest.raises(FrameTimeoutError):
+        transport.read_holding_registers(1, 1, 9)
+    # 从机1迟到的响应先于本次响应到达，按从机地址丢弃
+    simulator.faults = FaultConfig(latency=0.1)
+    assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+    assert simulator.stats.connections == 1
+
+
+def test_async_dead_slave_and_gateway_backoff(simulator):
+    async def run():
+        transport = AsyncRtuOverTcpTransport('127.0.0.1', simulator.port, timeout=0.2)
+        # 无响应的从机达到阈值后快速失败，连接级断路器不受影响
+        for _ in range(transport.connection.failure_threshold):
+            with pytest.raises(FrameTimeoutError):
+                await transport.read_holding_registers(3, 0, 2)
+        with pytest.raises(SlaveUnavailableError):
+            await transport.read_holding_registers(3, 0, 2)
+        assert await transport.read_holding_registers(20, 0, 2) == (225, 450)
+        assert transport.connection.breaker.failures == 0
+        await transport.close()
+
+        unreachable = AsyncRtuOverTcpTransport('127.0.0.1', 1, timeout=0.2)
+        for _ in range(unreachable.connection.failure_threshold):
+            with pytest.raises(TransportConnectionError):
+                await unreachable.read_holding_registers(1, 0, 2)
+        # 断路器断开后，重试时间之前不再重连
+        with pytest.raises(CircuitOpenError):
+            await unreachable.read_holding_registers(1, 0, 2)
+
+    asyncio.run(run())
+
+
+def test_async_follower_not_cancelled_with_leader(simulator):
+    simulator.faults = FaultConfig(latency=0.3)
+
+    async def main():
+        transport = AsyncRtuOverTcpTransport('127.0.0.1', simulator.port, 1.0)
+        read = lambda: transport.read_holding_registers(20, TEMP_HUMIDITY_START, TEMP_HUMIDITY_COUNT)
+        leader = asyncio.ensure_future(read())
+        await asyncio.sleep(0.05)
+        # 相同的请求共享发起者的传输
+        follower = asyncio.ensure_future(read())
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # 等待者收到普通的读取失败，而不是被取消
+        with pytest.raises(TransportError):
+            await follower
+        assert not follower.cancelled()
+        simulator.faults = FaultConfig()
+        assert await read() == (225, 450)
+        await transport.close()
+
+    asyncio.run(main())
+
+def _read_until(read, deadline: float):
+    # 反复读取直到成功，返回期间失败的次数
+    failures = 0
+    while time.monotonic() < deadline:
+        try:
+            return read(), failures
+        except Exception:
+            failures += 1
+            time.sleep(0.01)
+    pytest.fail("网关恢复后读取仍然失败")
+
+
+def test_recover_after_long_outage():
+    simulator = Simulator(pk9019=[1], temp_humidity=[20], seed=0).start_in_thread()
+    port = simulator.port
+    transport = connect(simulator, timeout=0.2)
+    transport.connection.backoff_initial = 0.02
+    transport.connection.backoff_max = 0.1
+    assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+
+    # 网关停机远长于退避时间，期间持续读取，断路器反复断开和试探
+    simulator.stop()
+    # 停机前的连续失败已使断路器断开，后台线程在重连
+    for _ in range(transport.connection.failure_threshold):
+        transport.connection.mark_failed("网关停机")
+    assert transport.connection.breaker.state == 'open'
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        with pytest.raises(Exception):
+            transport.read_holding_registers(20, 0, 2)
+        time.sleep(0.001)
+
+    simulator = Simulator(port=port, pk9019=[1], temp_humidity=[20], seed=0).start_in_thread()
+    try:
+        value, _ = _read_until(lambda: transport.read_holding_registers(20, 0, 2), time.monotonic() + 3)
+        assert value == (225, 450)
+        # 恢复后不再停留在半开状态
+        for _ in range(20):
+            assert transport.read_holding_registers(20, 0, 2) == (225, 450)
+        assert transport.connection.breaker.state == 'closed'
+    finally:
+        transport.close()
+        simulator.stop()
+
+
+def test_async_recover_after_long_outage():
+    simulator = Simulator(pk9019=[1], temp_humidity=[20], seed=0).start_in_thread()
+    port = simulator.port
+
+    async def read_until(transport, deadline):
+        while time.monotonic() < deadline:
+            try:
+                return await transport.read_holding_registers(20, 0, 2)
+            except Exception:
+                await asyncio.sleep(0.01)
+        pytest.fail("网关恢复后读取仍然失败")
+
+    async def run():
+        nonlocal simulator
+        transport = AsyncRtuOverTcpTransport('127.0.0.1', port, timeout=0.2)
+        transport.connection.backoff_initial = 0.02
+        transport.connection.backoff_max = 0.1
+        assert await transport.read_holding_registers(20, 0, 2) == (225, 450)
+
+        simulator.stop()
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            with pytest.raises(Exception):
+                await transport.read_holding_registers(20, 0, 2)
+            await asyncio.sleep(0.01)
+        assert transport.connection.breaker.state != 'closed'
+
+        simulator = Simulator(port=port, pk9019=[1], temp_humidity=[20], seed=0).start_in_thread()
+        assert await read_until(transport, time.monotonic() + 3) == (225, 450)
+        for _ in range(20):
+            assert await transport.read_holding_registers(20, 0, 2) == (225, 450)
+        assert transport.connection.breaker.state == 'closed'
+        await transport.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        simulator.stop()
+
+
+def test_auto_framing_probes_again_after_gateway_comes_up(monkeypatch):
+    monkeypatch.setattr(framing, '_detected', {})
+    simulator = Simulator(temp_humidity=[20], seed=0).start_in_thread()
+    port = simulator.port
+    simulator.stop()
+
+    # 网关无法连接时不缓存探测结果，得到帧格式待定的传输
+    transport = framing.create_transport('127.0.0.1', port, 1.0, framing='auto')
+    assert isinstance(transport, framing.AutoFramingTransport)
+    assert ('127.0.0.1', port) not in framing._detected
+    with pytest.raises(TransportConnectionError):
+        transport.read_holding_registers(20, TEMP_HUMIDITY_START, TEMP_HUMIDITY_COUNT)
+    assert ('127.0.0.1', port) not in framing._detected
+
+    simulator = Simulator(port=port, temp_humidity=[20], seed=0).start_in_thread()
+    try:
+        # 网关恢复后重新探测: RTU over TCP网关不响应MBAP探测帧
+        assert transport.read_holding_registers(20, TEMP_HUMIDITY_START, TEMP_HUMIDITY_COUNT) == (225, 450)
+        assert framing._detected[('127.0.0.1', port)] == framing.FRAMING_RTU
+        assert isinstance(transport.transport, RtuOverTcpTransport)
+        assert transport.connection is transport.transport.connection
+    finally:
+        transport.close()
+        simulator.stop()